@@ -0,0 +1,168 @@
+"""
+End-to-end input latency: from the update call to the event being readable
+
+With the uinput backend (Linux), the /dev/input/eventN node of the gamepad is read with libevdev,
+and the kernel timestamps of the events (CLOCK_MONOTONIC) are compared to the time of the update calls.
+With the loopback backend, the time at which the backend receives each report is used instead.
+Each frame moves the left joystick X axis to a distinct value, which identifies the frame in the read events.
+
+Usage: python benchmark/input_latency.py [--backend auto|uinput|loopback] [--frames N] [--interval S] [--ds4]
+                                         [--modes update skip_unchanged instrumented coalesced]
+"""
+
+import argparse
+import os
+import platform
+import select
+import threading
+import time
+
+import vgamepad as vg
+import vgamepad.instrument as instrument
+
+
+MODES = ('update', 'skip_unchanged', 'instrumented', 'coalesced')
+
+
+def axis_value(gamepad, i):
+    """
+    :return: the left joystick X value of frame i (distinct for consecutive frames, and far from the previous one)
+    """
+    if isinstance(gamepad, vg.VDS4Gamepad):
+        return i * 37 % 256
+    return i * 997 % 65536 - 32768  # jumps larger than the fuzz of the X360 axes
+
+
+class EvdevReader:
+    """
+    Reads the left joystick X events of a gamepad from its event node, in a background thread
+    """
+
+    def __init__(self, devnode):
+        import libevdev
+        self.events = []  # (value, kernel timestamp in ns)
+        self.dropped = 0  # SYN_DROPPED: the kernel buffer overflowed, events were lost
+        self._dropped_exception = libevdev.EventsDroppedException
+        self._code = libevdev.EV_ABS.ABS_X
+        self._file = open(devnode, 'rb')
+        os.set_blocking(self._file.fileno(), False)
+        self._device = libevdev.Device(self._file)  # timestamps use CLOCK_MONOTONIC
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not select.select([self._file], [], [], 0.05)[0]:
+                continue
+            try:
+                for e in self._device.events():
+                    if e.code == self._code:
+                        self.events.append((e.value, e.sec * 1000000000 + e.usec * 1000))
+            except self._dropped_exception:
+                self.dropped += 1
+                for _ in self._device.sync():
+                    pass  # the state after the drop, not timed events
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._file.close()
+
+
+def loopback_events(gamepad):
+    """
+    :return: the left joystick X values written to a loopback backend, with their write time in ns
+    """
+    report_type = type(gamepad.report)
+    field = 'bThumbLX' if isinstance(gamepad, vg.VDS4Gamepad) else 'sThumbLX'
+    return [(getattr(report_type.from_buffer_copy(data), field), t) for t, data in gamepad.backend.frames]
+
+
+def measure(gamepad_class, backend, mode, nb_frames, interval):
+    """
+    :param gamepad_class: vg.VX360Gamepad or vg.VDS4Gamepad
+    :param backend: 'uinput' or 'loopback'
+    :param mode: one of MODES
+    :param nb_frames: number of frames
+    :param interval: time between two frames, in seconds
+    :return: (list of latencies in ns (frames that were not read are missing), number of SYN_DROPPED)
+    """
+    if backend == 'uinput':
+        clock = lambda: time.clock_gettime_ns(time.CLOCK_MONOTONIC)
+        gamepad = gamepad_class(backend='uinput')
+        if not gamepad.wait_ready(timeout=5.0):
+            raise RuntimeError("The event node of the gamepad is not ready.")
+        reader = EvdevReader(gamepad.backend.uinput.devnode)
+    else:
+        clock = time.perf_counter_ns  # time base of LoopbackBackend.frames
+        gamepad = gamepad_class(backend=vg.LoopbackBackend(max_frames=nb_frames + 16))
+        reader = None
+
+    if mode == 'skip_unchanged':
+        gamepad.skip_unchanged = True
+    elif mode == 'instrumented':
+        instrument.enable()
+    elif mode == 'coalesced':
+        gamepad.enable_coalescing(rate=2.0 / interval)
+    send = gamepad.submit if mode == 'coalesced' else gamepad.update
+
+    y_value = 128 if isinstance(gamepad, vg.VDS4Gamepad) else 0  # neutral
+    sent = {}  # axis value -> time of the call
+    try:
+        for i in range(1, nb_frames + 1):
+            value = axis_value(gamepad, i)
+            gamepad.left_joystick(x_value=value, y_value=y_value)
+            sent[value] = clock()
+            send()
+            time.sleep(interval)
+        gamepad.disable_coalescing()
+        time.sleep(0.1)  # last events
+    finally:
+        instrument.disable()
+        if reader is not None:
+            reader.close()
+            events, dropped = reader.events, reader.dropped
+        else:
+            events, dropped = loopback_events(gamepad), 0
+        gamepad.close()
+    return [t - sent[value] for value, t in events if value in sent and t >= sent[value]], dropped
+
+
+def summary(name, latencies, dropped, nb_frames):
+    if dropped:
+        print(f"{name}: events dropped by the kernel {dropped} times, the missing frames are not measured")
+    if not latencies:
+        print(f"{name}: no event read")
+        return
+    latencies = sorted(latencies)
+    n = len(latencies)
+    print(f"{name}: n={n}/{nb_frames}, "
+          f"p50={latencies[n // 2] / 1e3:.1f}us, "
+          f"p99={latencies[min(n - 1, n * 99 // 100)] / 1e3:.1f}us, "
+          f"max={latencies[-1] / 1e3:.1f}us")
+
+
+def default_backend():
+    if platform.system() == 'Linux' and os.access('/dev/uinput', os.W_OK):
+        return 'uinput'
+    return 'loopback'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', choices=('auto', 'uinput', 'loopback'), default='auto')
+    parser.add_argument('--frames', type=int, default=1000, help="number of frames per mode")
+    parser.add_argument('--interval', type=float, default=0.002, help="time between two frames, in seconds")
+    parser.add_argument('--ds4', action='store_true', help="measure VDS4Gamepad instead of VX360Gamepad")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    backend = default_backend() if args.backend == 'auto' else args.backend
+    cls = vg.VDS4Gamepad if args.ds4 else vg.VX360Gamepad
+    if cls is vg.VDS4Gamepad and args.frames > 256:
+        args.frames = 256  # distinct axis values
+    print(f"Measuring {cls.__name__} input latency with the {backend} backend "
+          f"({args.frames} frames every {args.interval * 1e3:.1f}ms)")
+    for mode in args.modes:
+        summary(f"{backend}/{mode}", *measure(cls, backend, mode, args.frames, args.interval), args.frames)
@@ -0,0 +1,59 @@
+"""
+Benchmark of virtual gamepad creation and destruction
+
+Usage: python benchmark/pad_creation.py [--pads N] [--rounds R] [--ds4]
+"""
+
+import argparse
+import time
+
+import vgamepad as vg
+
+
+def bench_creation(gamepad_class, nb_pads, nb_rounds):
+    """
+    Creates and destroys nb_pads gamepads, nb_rounds times
+
+    :param gamepad_class: vg.VX360Gamepad or vg.VDS4Gamepad
+    :param nb_pads: number of gamepads alive at the same time
+    :param nb_rounds: number of creation/destruction rounds
+    :return: (list of creation times in s, list of destruction times in s), per pad
+    """
+    creation_times = []
+    destruction_times = []
+    for _ in range(nb_rounds):
+        pads = []
+        for _ in range(nb_pads):
+            t = time.perf_counter()
+            pads.append(gamepad_class())
+            creation_times.append(time.perf_counter() - t)
+        while pads:
+            gamepad = pads.pop()
+            t = time.perf_counter()
+            gamepad.close()
+            destruction_times.append(time.perf_counter() - t)
+    return creation_times, destruction_times
+
+
+def summary(name, times):
+    times = sorted(times)
+    n = len(times)
+    print(f"{name}: n={n}, "
+          f"mean={sum(times) / n * 1e3:.3f}ms, "
+          f"p50={times[n // 2] * 1e3:.3f}ms, "
+          f"p99={times[min(n - 1, n * 99 // 100)] * 1e3:.3f}ms, "
+          f"max={times[-1] * 1e3:.3f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pads', type=int, default=8, help="number of gamepads alive at the same time")
+    parser.add_argument('--rounds', type=int, default=10, help="number of creation/destruction rounds")
+    parser.add_argument('--ds4', action='store_true', help="benchmark VDS4Gamepad instead of VX360Gamepad")
+    args = parser.parse_args()
+
+    cls = vg.VDS4Gamepad if args.ds4 else vg.VX360Gamepad
+    print(f"Benchmarking {cls.__name__} creation ({args.rounds} rounds of {args.pads} pads)")
+    c, d = bench_creation(cls, args.pads, args.rounds)
+    summary("creation", c)
+    summary("destruction", d)
@@ -73,7 +73,8 @@ setup(
     url='https://github.com/yannbouteiller/vgamepad',
     download_url=f'https://github.com/yannbouteiller/vgamepad/archive/refs/tags/v{VGAMEPAD_VERSION}.tar.gz',
     keywords=['virtual', 'gamepad', 'python', 'xbox', 'dualshock', 'controller', 'emulator'],
-    install_requires=['libevdev~=0.11'] if not is_windows else [],
+    install_requires=['libevdev==0.13.1'] if not is_windows else [],  # UinputBackend.close() uses its internals
+    extras_require={'numpy': ['numpy'], 'gymnasium': ['numpy', 'gymnasium']},
     classifiers=[
         'Development Status :: 4 - Beta',
         'Intended Audience :: Developers',
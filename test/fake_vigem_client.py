@@ -0,0 +1,161 @@
+"""
+Fake ViGEm client, used in place of vgamepad.win.vigem_client (ViGEmClient.dll) in tests
+
+Emulates the client and driver state (connections, targets, notifications),
+and enables injecting bus and target failures.
+"""
+
+import itertools
+
+from vgamepad.win.vigem_commons import VIGEM_ERRORS, VIGEM_TARGET_TYPE
+
+
+NONE = int(VIGEM_ERRORS.VIGEM_ERROR_NONE)
+
+_handles = itertools.count(1)
+buses = {}  # busp -> {'connected': bool, 'broken': bool}
+targets = {}  # devicep -> {'type', 'bus', 'vid', 'pid', 'plugged', 'callback', 'reports'}
+connect_failures = 0  # number of upcoming vigem_connect calls that fail
+
+
+def break_bus(busp):
+    """
+    Simulates the loss of a bus connection (e.g. driver restart)
+    """
+    buses[busp]['broken'] = True
+
+
+def unplug(devicep):
+    """
+    Simulates the loss of a target device
+    """
+    targets[devicep]['plugged'] = False
+
+
+def vigem_alloc():
+    busp = next(_handles)
+    buses[busp] = {'connected': False, 'broken': False}
+    return busp
+
+
+def vigem_free(busp):
+    del buses[busp]
+
+
+def vigem_connect(busp):
+    global connect_failures
+    if connect_failures > 0:
+        connect_failures -= 1
+        return int(VIGEM_ERRORS.VIGEM_ERROR_BUS_NOT_FOUND)
+    buses[busp]['connected'] = True
+    return NONE
+
+
+def vigem_disconnect(busp):
+    buses[busp]['connected'] = False
+    for t in targets.values():
+        if t['bus'] == busp:
+            t['plugged'] = False
+
+
+def _target_alloc(target_type):
+    devicep = next(_handles)
+    targets[devicep] = {'type': target_type, 'bus': None, 'vid': 0x045E, 'pid': 0x028E, 'plugged': False,
+                        'callback': None, 'reports': []}
+    return devicep
+
+
+def vigem_target_x360_alloc():
+    return _target_alloc(VIGEM_TARGET_TYPE.Xbox360Wired)
+
+
+def vigem_target_ds4_alloc():
+    return _target_alloc(VIGEM_TARGET_TYPE.DualShock4Wired)
+
+
+def vigem_target_free(devicep):
+    del targets[devicep]
+
+
+def vigem_target_add(busp, devicep):
+    bus = buses[busp]
+    if not bus['connected'] or bus['broken']:
+        return int(VIGEM_ERRORS.VIGEM_ERROR_BUS_ACCESS_FAILED)
+    targets[devicep].update(bus=busp, plugged=True)
+    return NONE
+
+
+def vigem_target_remove(busp, devicep):
+    t = targets[devicep]
+    if not t['plugged']:
+        return int(VIGEM_ERRORS.VIGEM_ERROR_TARGET_NOT_PLUGGED_IN)
+    t['plugged'] = False
+    return NONE
+
+
+def vigem_target_set_vid(devicep, vid):
+    targets[devicep]['vid'] = vid
+
+
+def vigem_target_set_pid(devicep, pid):
+    targets[devicep]['pid'] = pid
+
+
+def vigem_target_get_vid(devicep):
+    return targets[devicep]['vid']
+
+
+def vigem_target_get_pid(devicep):
+    return targets[devicep]['pid']
+
+
+def vigem_target_get_index(devicep):
+    return devicep
+
+
+def vigem_target_get_type(devicep):
+    return targets[devicep]['type']
+
+
+def vigem_target_is_attached(devicep):
+    return targets[devicep]['plugged']
+
+
+def _update(busp, devicep, report):
+    if buses[busp]['broken']:
+        return int(VIGEM_ERRORS.VIGEM_ERROR_BUS_ACCESS_FAILED)
+    t = targets[devicep]
+    if not t['plugged']:
+        return int(VIGEM_ERRORS.VIGEM_ERROR_TARGET_NOT_PLUGGED_IN)
+    t['reports'].append(bytes(report))
+    return NONE
+
+
+def vigem_target_x360_update(busp, devicep, report):
+    return _update(busp, devicep, report)
+
+
+def vigem_target_ds4_update(busp, devicep, report):
+    return _update(busp, devicep, report)
+
+
+def vigem_target_ds4_update_ex_ptr(busp, devicep, report_ptr):
+    return _update(busp, devicep, b'')
+
+
+def _register_notification(busp, devicep, callback, user_data):
+    t = targets[devicep]
+    if t['callback'] is not None:
+        return int(VIGEM_ERRORS.VIGEM_ERROR_CALLBACK_ALREADY_REGISTERED)
+    t['callback'] = callback
+    return NONE
+
+
+def _unregister_notification(devicep):
+    targets[devicep]['callback'] = None
+
+
+vigem_target_x360_register_notification = _register_notification
+vigem_target_ds4_register_notification = _register_notification
+vigem_target_x360_unregister_notification = _unregister_notification
+vigem_target_ds4_unregister_notification = _unregister_notification
@@ -120,6 +120,7 @@ class TestVDS4Gamepad(unittest.TestCase):
         print(f"Setting up VDS4Gamepad")
 
         self.g = vg.VDS4Gamepad()
+        self.assertTrue(self.g.wait_ready(timeout=5.0))
         # press a button to wake the device up
         self.g.press_button(button=vg.DS4_BUTTONS.DS4_BUTTON_CROSS)
         self.g.update()
@@ -94,6 +94,7 @@ class TestVX360Gamepad(unittest.TestCase):
         print(f"Setting up VX360Gamepad")
 
         self.g = vg.VX360Gamepad()
+        self.assertTrue(self.g.wait_ready(timeout=5.0))
         # press a button to wake the device up
         self.g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
         self.g.update()
@@ -0,0 +1,50 @@
+import unittest
+
+import vgamepad as vg
+
+
+class TestLoopbackBackend(unittest.TestCase):
+
+    def test_x360_reports(self):
+        with vg.VX360Gamepad(backend='loopback') as g:
+            self.assertEqual(len(g.backend.frames), 1)  # default report sent on creation
+            g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            g.left_joystick(x_value=-32768, y_value=32767)
+            g.update()
+            report = g.backend.last_report()
+            self.assertEqual(report.wButtons, vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            self.assertEqual((report.sThumbLX, report.sThumbLY), (-32768, 32767))
+            self.assertEqual(g.counters.writes, 2)
+        self.assertTrue(g.backend.closed)
+
+    def test_ds4_reports(self):
+        with vg.VDS4Gamepad(backend=vg.LoopbackBackend()) as g:
+            g.directional_pad(direction=vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_SOUTHWEST)
+            g.right_trigger(value=255)
+            g.update()
+            report = g.backend.last_report()
+            self.assertEqual(report.wButtons & 0xF, vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_SOUTHWEST)
+            self.assertEqual(report.bTriggerR, 255)
+
+    def test_notification(self):
+        received = []
+
+        def callback(client, target, large_motor, small_motor, led_number, user_data):
+            received.append((large_motor, small_motor, led_number))
+
+        with vg.VX360Gamepad(backend='loopback') as g:
+            g.register_notification(callback_function=callback)
+            g.backend.notify(255, 128, 1)
+            g.unregister_notification()
+            g.backend.notify(0, 0, 0)
+        self.assertEqual(received, [(255, 128, 1)])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(KeyError):
+            vg.VX360Gamepad(backend='nonexistent')
+        with self.assertRaises(KeyError):
+            vg.set_default_backend('nonexistent')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,78 @@
+import unittest
+
+import vgamepad as vg
+from vgamepad.util import wait_until
+
+
+class TestCoalescing(unittest.TestCase):
+
+    def setUp(self):
+        self.g = vg.VX360Gamepad(backend='loopback')
+        self.g.enable_coalescing(rate=50.0)
+
+    def tearDown(self):
+        self.g.close()
+
+    def sent_reports(self):
+        return [vg.win.vigem_commons.XUSB_REPORT.from_buffer_copy(data) for _, data in self.g.backend.frames][1:]
+
+    def test_latest_wins(self):
+        for x in range(0, 30000, 1000):
+            self.g.left_joystick(x_value=x, y_value=0)
+            self.g.submit()
+        self.g.disable_coalescing()  # flushes the waiting frames
+        reports = self.sent_reports()
+        self.assertLess(len(reports), 30)
+        self.assertEqual(reports[-1].sThumbLX, 29000)
+
+    def test_tap_is_kept(self):
+        self.g.submit()  # keeps the flusher busy for one period
+        for _ in range(10):
+            self.g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            self.g.submit()
+            self.g.release_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            self.g.submit()
+        self.assertTrue(wait_until(lambda: self.g.coalescer.pending() == 0, timeout=2.0))
+        buttons = [r.wButtons for r in self.sent_reports()]
+        self.assertIn(vg.XUSB_BUTTON.XUSB_GAMEPAD_A, buttons)
+        self.assertEqual(buttons[-1], 0)
+
+    def test_max_pending_keeps_edges(self):
+        self.g.enable_coalescing(rate=20.0, max_pending=2)
+        self.g.submit()
+        self.assertTrue(wait_until(lambda: self.g.coalescer.pending() == 0, timeout=2.0))
+        for _ in range(2):
+            self.g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            self.assertTrue(self.g.submit())
+            self.g.release_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            self.assertTrue(self.g.submit())  # waits for room when 2 edges are pending
+        self.g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+        self.assertFalse(self.g.submit(timeout=0.0))  # 2 edges pending: not overwritten
+        self.g.disable_coalescing()
+        buttons = [r.wButtons for r in self.sent_reports()]
+        self.assertEqual(buttons, [0, vg.XUSB_BUTTON.XUSB_GAMEPAD_A, 0, vg.XUSB_BUTTON.XUSB_GAMEPAD_A, 0])
+
+    def test_max_pending_drops_non_edge(self):
+        self.g.enable_coalescing(rate=20.0, max_pending=2)
+        self.g.submit()
+        self.assertTrue(wait_until(lambda: self.g.coalescer.pending() == 0, timeout=2.0))
+        self.g.left_joystick(x_value=1000, y_value=0)
+        self.g.submit()  # same buttons as the sent frame
+        self.g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+        self.g.submit()
+        self.g.release_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+        self.assertTrue(self.g.submit(timeout=0.0))  # drops the first waiting frame, which is not an edge
+        self.assertEqual(self.g.coalescer.stats()['coalesced'], 1)
+        self.g.disable_coalescing()
+        reports = self.sent_reports()
+        self.assertEqual([r.wButtons for r in reports], [0, vg.XUSB_BUTTON.XUSB_GAMEPAD_A, 0])
+        self.assertEqual(reports[-1].sThumbLX, 1000)
+
+    def test_not_enabled(self):
+        self.g.disable_coalescing()
+        with self.assertRaises(RuntimeError):
+            self.g.submit()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
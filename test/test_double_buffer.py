@@ -0,0 +1,106 @@
+import threading
+import unittest
+
+import vgamepad as vg
+from vgamepad.macro import Macro, MacroPlayer
+from vgamepad.merge import InputMerger
+from vgamepad.shm import ReportChannel, ChannelPump
+from vgamepad.trajectory import Line, play
+from vgamepad.win.vigem_commons import XUSB_REPORT
+
+
+class TestDoubleBuffer(unittest.TestCase):
+
+    def test_commit(self):
+        with vg.VX360Gamepad(backend='loopback') as g:
+            g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            g.commit()
+            g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_B)  # back buffer only
+            g.update()
+            self.assertEqual(g.backend.last_report().wButtons, vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            g.uncommit()
+            g.update()
+            self.assertEqual(g.backend.last_report().wButtons,
+                             vg.XUSB_BUTTON.XUSB_GAMEPAD_A | vg.XUSB_BUTTON.XUSB_GAMEPAD_B)
+
+    def test_consistent_frames(self):
+        with vg.VX360Gamepad(backend=vg.LoopbackBackend(max_frames=100000)) as g:
+            g.commit()
+            stop = threading.Event()
+
+            def produce():
+                i = 0
+                while not stop.is_set():
+                    i = (i + 1) % 30000
+                    g.left_joystick(x_value=i, y_value=-i)
+                    g.commit()
+
+            producer = threading.Thread(target=produce)
+            producer.start()
+            for _ in range(2000):
+                g.update()
+            stop.set()
+            producer.join()
+            for _, data in g.backend.frames:
+                report = XUSB_REPORT.from_buffer_copy(data)
+                self.assertEqual(report.sThumbLX, -report.sThumbLY)
+
+    def test_reset_uncommits(self):
+        with vg.GamepadPool(lambda: vg.VX360Gamepad(backend='loopback'), 1) as pool:
+            g = pool.acquire(timeout=5.0)
+            g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            g.commit()
+            g.update()
+            self.assertEqual(g.backend.last_report().wButtons, vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            pool.release(g)
+            self.assertIsNone(g.front)
+            self.assertEqual(g.backend.last_report().wButtons, 0)  # released with the default report
+            g.update()
+            self.assertEqual(g.backend.last_report().wButtons, 0)
+
+
+class TestCommittedWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.g = vg.VX360Gamepad(backend='loopback')
+        self.g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_B)
+        self.g.commit()
+
+    def tearDown(self):
+        self.g.close()
+
+    def test_merger(self):
+        with InputMerger(self.g) as merger:
+            merger.source('bot').set(bRightTrigger=255)
+            self.assertTrue(merger.flush())
+        report = self.g.backend.last_report()
+        self.assertEqual((report.wButtons, report.bRightTrigger), (0, 255))
+        self.assertEqual(self.g.front.bRightTrigger, 255)
+
+    def test_channel_pump(self):
+        with ReportChannel(nb_slots=1) as channel:
+            pump = ChannelPump(channel, [self.g])
+            channel.write(0, XUSB_REPORT(sThumbLX=1234))
+            self.assertEqual(pump.poll(), 1)
+        self.assertEqual(self.g.backend.last_report().sThumbLX, 1234)
+
+    def test_macro(self):
+        with MacroPlayer(self.g) as player:
+            run = player.play(Macro(frame_rate=100.0).tap(vg.XUSB_BUTTON.XUSB_GAMEPAD_A, frames=1))
+            self.assertTrue(run.wait(timeout=2.0))
+        buttons = [XUSB_REPORT.from_buffer_copy(data).wButtons for _, data in self.g.backend.frames][1:]
+        self.assertEqual(buttons, [vg.XUSB_BUTTON.XUSB_GAMEPAD_A | vg.XUSB_BUTTON.XUSB_GAMEPAD_B,
+                                   vg.XUSB_BUTTON.XUSB_GAMEPAD_B])
+
+    def test_current_report_not_read(self):
+        self.g.left_trigger(value=99)  # being modified by another thread, not committed
+        play(self.g, {'right_trigger': Line(0.0, 1.0)}, duration=0.01, rate=200.0)
+        reports = [XUSB_REPORT.from_buffer_copy(data) for _, data in self.g.backend.frames][1:]
+        self.assertEqual({(r.wButtons, r.bLeftTrigger) for r in reports}, {(vg.XUSB_BUTTON.XUSB_GAMEPAD_B, 0)})
+        self.assertEqual(reports[-1].bRightTrigger, 255)
+        self.assertEqual(self.g.front.bRightTrigger, 255)
+        self.assertEqual(self.g.report.bRightTrigger, 0)  # left to the thread modifying it
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,98 @@
+import unittest
+
+import vgamepad as vg
+import vgamepad.instrument as instrument
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_buckets(self):
+        h = instrument.Histogram()
+        for duration in (0, 1, 2, 5, 8, 9, 2 ** 80):
+            h.record(duration)
+        self.assertEqual(h.count, 7)
+        self.assertEqual(h.sum, 25 + 2 ** 80)
+        self.assertEqual((h.min, h.max), (0, 2 ** 80))
+        self.assertEqual(h.buckets[0], 2)  # d <= 1
+        self.assertEqual(h.buckets[1], 1)  # 1 < d <= 2
+        self.assertEqual(h.buckets[3], 2)  # 4 < d <= 8: powers of two are in the bucket they bound
+        self.assertEqual(h.buckets[4], 1)  # 8 < d <= 16
+        self.assertEqual(h.buckets[instrument.OVERFLOW], 1)
+        d = h.to_dict()
+        self.assertEqual(d['buckets'], {1: 2, 2: 1, 8: 2, 16: 1, float('inf'): 1})
+        self.assertEqual((d['count'], d['min_ns'], d['max_ns']), (7, 0, 2 ** 80))
+
+    def test_prometheus_overflow(self):
+        instrument.reset()
+        try:
+            with vg.VX360Gamepad(backend='loopback') as g:
+                instrument.record(g, 'write', 8)
+                instrument.record(g, 'write', 2 ** 80)
+                lines = instrument.prometheus_text().splitlines()
+        finally:
+            instrument.reset()
+        buckets = [line for line in lines if line.startswith('vgamepad_update_stage_seconds_bucket')]
+        self.assertEqual(buckets[-2].split('le=')[1], '"8e-09"} 1')  # 8 ns is counted as <= 8 ns
+        self.assertTrue(buckets[-1].endswith('le="+Inf"} 2'))  # the overflow bucket only in +Inf
+
+
+class TestInstrument(unittest.TestCase):
+
+    def setUp(self):
+        instrument.reset()
+        self.gamepad = vg.VX360Gamepad(backend='loopback')  # creation update not timed
+        instrument.enable()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+        self.gamepad.close()
+
+    def test_snapshot(self):
+        for _ in range(3):
+            self.gamepad.update()
+        snapshot = instrument.snapshot()
+        self.assertEqual(len(snapshot), 1)
+        (label, stages), = snapshot.items()
+        self.assertTrue(label.startswith('VX360Gamepad_'))
+        self.assertEqual(set(stages), {'skip', 'pack', 'write', 'total'})
+        for stage in stages.values():
+            self.assertEqual(stage['count'], 3)
+            self.assertEqual(sum(stage['buckets'].values()), 3)
+        self.assertGreaterEqual(stages['total']['sum_ns'], stages['write']['sum_ns'])
+        self.assertEqual(len(self.gamepad.backend.frames), 4)
+
+    def test_skipped(self):
+        self.gamepad.skip_unchanged = True
+        self.gamepad.update()
+        self.gamepad.update()  # unchanged: skipped after the skip stage
+        stages, = instrument.snapshot().values()
+        self.assertEqual(stages['skip']['count'], 2)
+        self.assertEqual(stages['total']['count'], 2)
+        self.assertEqual(stages['write']['count'], 1)
+        self.assertEqual(self.gamepad.counters.skipped, 1)
+
+    def test_disabled(self):
+        instrument.disable()
+        self.gamepad.update()
+        self.assertEqual(instrument.snapshot(), {})
+
+    def test_prometheus_text(self):
+        self.gamepad.update()
+        text = instrument.prometheus_text()
+        lines = text.splitlines()
+        self.assertEqual(lines[0], "# HELP vgamepad_update_stage_seconds Duration of the stages of update().")
+        self.assertEqual(lines[1], "# TYPE vgamepad_update_stage_seconds histogram")
+        label, = instrument.snapshot()
+        for stage in ('skip', 'pack', 'write', 'total'):
+            labels = f'pad="{label}",stage="{stage}"'
+            self.assertIn(f'vgamepad_update_stage_seconds_bucket{{{labels},le="+Inf"}} 1', lines)
+            self.assertIn(f'vgamepad_update_stage_seconds_count{{{labels}}} 1', lines)
+            buckets = [line for line in lines if line.startswith(f'vgamepad_update_stage_seconds_bucket{{{labels},')]
+            counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+            self.assertEqual(counts, sorted(counts))  # cumulative
+        self.assertTrue(text.endswith("\n"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,69 @@
+import threading
+import unittest
+
+import vgamepad as vg
+
+
+class TestLockstep(unittest.TestCase):
+
+    def setUp(self):
+        self.g = vg.VX360Gamepad(backend='loopback')
+        self.g.enable_lockstep(depth=3)
+
+    def tearDown(self):
+        self.g.close()
+
+    def sent_x(self):
+        return [vg.win.vigem_commons.XUSB_REPORT.from_buffer_copy(data).sThumbLX for _, data in self.g.backend.frames][1:]
+
+    def schedule_x(self, frame_no, timeout=None):
+        self.g.left_joystick(x_value=frame_no, y_value=0)
+        return self.g.schedule(frame_no, timeout=timeout)
+
+    def test_steps(self):
+        for frame_no in (1, 2, 3):
+            self.assertTrue(self.schedule_x(frame_no))
+        self.assertFalse(self.schedule_x(4, timeout=0.0))  # depth reached
+        self.assertEqual(self.sent_x(), [])
+        self.assertTrue(self.g.step(1))
+        self.assertTrue(self.g.lockstep.confirm(1))
+        self.assertTrue(self.g.step(2))  # not confirmed
+        self.assertTrue(self.g.step(3))
+        self.assertTrue(self.g.lockstep.confirm(3))
+        self.assertFalse(self.g.step(4))  # keeps frame 3
+        self.assertTrue(self.schedule_x(6))
+        self.assertTrue(self.schedule_x(7))
+        self.assertTrue(self.g.step(7))  # frame 6 is dropped
+        with self.assertRaises(ValueError):
+            self.schedule_x(7)
+        with self.assertRaises(ValueError):
+            self.g.step(5)
+        self.assertEqual(self.sent_x(), [1, 2, 3, 7])
+        self.assertEqual(self.g.lockstep.stats(), {
+            'steps': 5, 'sent': 4, 'held': 1, 'dropped': 1, 'consumed': 2, 'unconsumed': 1})
+
+    def test_pipelined(self):
+        def producer():
+            for frame_no in range(1, 101):
+                self.schedule_x(frame_no)
+
+        thread = threading.Thread(target=producer)
+        thread.start()
+        nb_sent = 0
+        for frame_no in range(1, 101):
+            while self.g.lockstep.pending() == 0 and thread.is_alive():
+                pass
+            nb_sent += self.g.step(frame_no)
+        thread.join()
+        self.assertEqual(nb_sent, 100)
+        self.assertEqual(self.sent_x(), list(range(1, 101)))
+
+    def test_disable(self):
+        self.schedule_x(1)
+        self.g.disable_lockstep()
+        with self.assertRaises(RuntimeError):
+            self.g.step(1)
+
+
+if __name__ == '__main__':
+    unittest.main()
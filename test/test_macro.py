@@ -0,0 +1,60 @@
+import unittest
+
+import vgamepad as vg
+from vgamepad.macro import Macro, MacroPlayer
+from vgamepad.win.vigem_commons import XUSB_REPORT, DS4_REPORT
+
+A = vg.XUSB_BUTTON.XUSB_GAMEPAD_A
+B = vg.XUSB_BUTTON.XUSB_GAMEPAD_B
+
+
+class TestMacro(unittest.TestCase):
+
+    def test_compile(self):
+        macro = Macro(frame_rate=100.0).press(A).call('left_joystick', -32768, 100).wait(3).release(A)
+        compiled = macro.compile(vg.VX360Gamepad)
+        self.assertEqual(list(compiled.times), [0, 30000000])
+        report = XUSB_REPORT(wButtons=B, sThumbLX=5, bRightTrigger=7)
+        value = int.from_bytes(bytes(report), 'little')
+        value = (value & compiled.keeps[0]) | compiled.sets[0]
+        report = XUSB_REPORT.from_buffer_copy(value.to_bytes(12, 'little'))
+        self.assertEqual((report.wButtons, report.sThumbLX, report.sThumbLY, report.bRightTrigger),
+                         (A | B, -32768, 100, 7))
+        self.assertIs(macro.compile(vg.VX360Gamepad), compiled)
+
+        dpad = Macro().call('directional_pad', vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_EAST).compile(vg.VDS4Gamepad)
+        report = vg.VDS4Gamepad.get_default_report(None)
+        value = (int.from_bytes(bytes(report), 'little') & dpad.keeps[0]) | dpad.sets[0]
+        report = DS4_REPORT.from_buffer_copy(value.to_bytes(len(bytes(report)), 'little'))
+        self.assertEqual(report.wButtons & 0xF, vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_EAST)
+        self.assertEqual(report.bThumbLX, 0x80)
+
+        stick = Macro().call('left_joystick_float', x_value_float=1.0, y_value_float=-1.0).compile(vg.VX360Gamepad)
+        report = XUSB_REPORT.from_buffer_copy(stick.sets[0].to_bytes(12, 'little'))
+        self.assertEqual((report.sThumbLX, report.sThumbLY), (32767, -32767))
+
+    def test_play(self):
+        with vg.VX360Gamepad(backend='loopback') as g, MacroPlayer(g) as player:
+            run = player.play(Macro(frame_rate=100.0).tap(A, frames=3))
+            self.assertTrue(run.wait(timeout=2.0))
+            frames = [(t, XUSB_REPORT.from_buffer_copy(data).wButtons) for t, data in g.backend.frames][1:]
+            self.assertEqual([buttons for _, buttons in frames], [A, 0])
+            self.assertGreaterEqual(frames[1][0] - frames[0][0], 29000000)
+
+    def test_conflicts(self):
+        with vg.VX360Gamepad(backend='loopback') as g, MacroPlayer(g) as player:
+            hold_a = Macro().press(A).wait(600).release(A)
+            low = player.play(hold_a, priority=0)
+            other = player.play(Macro().press(B).wait(600).release(B), priority=0)  # no conflict
+            self.assertIsNotNone(other)
+            high = player.play(hold_a, priority=1)
+            self.assertTrue(low.cancelled)
+            self.assertIsNone(player.play(hold_a, priority=0))
+            high.cancel()
+            other.cancel()
+            self.assertTrue(high.done.is_set() and other.done.is_set())
+        self.assertEqual(g.report.wButtons, 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,64 @@
+import unittest
+
+import vgamepad as vg
+from vgamepad.merge import InputMerger
+from vgamepad.util import wait_until
+
+
+A = vg.XUSB_BUTTON.XUSB_GAMEPAD_A
+B = vg.XUSB_BUTTON.XUSB_GAMEPAD_B
+
+
+class TestInputMerger(unittest.TestCase):
+
+    def test_policies(self):
+        g = vg.VX360Gamepad(backend='loopback')
+        merger = InputMerger(g, policies={'sThumbRX': 'max_deflection'})
+        human = merger.source('human')
+        bot = merger.source('bot', priority=10)
+        human.press_button(A)
+        human.set(sThumbLX=-1000, bLeftTrigger=200, sThumbRX=-30000)
+        bot.press_button(B)
+        bot.set(sThumbLX=20000, bLeftTrigger=100, sThumbRX=25000)
+        self.assertTrue(merger.flush())
+        self.assertFalse(merger.flush())  # unchanged
+        report = g.backend.last_report()
+        self.assertEqual(report.wButtons, A | B)  # or
+        self.assertEqual(report.sThumbLX, 20000)  # override by the higher priority
+        self.assertEqual(report.bLeftTrigger, 200)  # max
+        self.assertEqual(report.sThumbRX, -30000)  # max deflection
+        bot.clear('sThumbLX')
+        human.release_button(A)
+        merger.remove(bot)
+        self.assertTrue(merger.flush())
+        report = g.backend.last_report()
+        self.assertEqual((report.wButtons, report.sThumbLX, report.bLeftTrigger), (0, -1000, 200))
+        human.clear()
+        merger.flush()
+        self.assertEqual(bytes(g.backend.last_report()), bytes(g.get_default_report()))
+        self.assertEqual(len(g.backend.frames), 4)  # creation and 3 flushes
+        with self.assertRaises(KeyError):
+            human.set(wrong=1)
+        merger.close()
+        g.close()
+
+    def test_ds4_ticks(self):
+        g = vg.VDS4Gamepad(backend='loopback')
+        with InputMerger(g) as merger:
+            human = merger.source('human')
+            assist = merger.source('assist', priority=1)
+            human.set(wButtons=vg.DS4_BUTTONS.DS4_BUTTON_CROSS | vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_WEST)
+            assist.press_button(vg.DS4_BUTTONS.DS4_BUTTON_CIRCLE)  # neutral directional pad
+            assist.press_special_button(vg.DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_PS)
+            merger.start(rate=200.0)
+            self.assertTrue(wait_until(lambda: merger.flushes == 1, timeout=2.0))
+        report = g.backend.last_report()
+        self.assertEqual(report.wButtons, vg.DS4_BUTTONS.DS4_BUTTON_CROSS | vg.DS4_BUTTONS.DS4_BUTTON_CIRCLE
+                         | vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_WEST)
+        self.assertEqual(report.bSpecial, vg.DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_PS)
+        self.assertEqual(merger.flushes, 1)
+        g.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
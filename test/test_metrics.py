@@ -0,0 +1,132 @@
+import ctypes
+import errno
+import unittest
+
+import vgamepad as vg
+import vgamepad.metrics as metrics
+import vgamepad.win.vigem_commons as vcom
+
+
+REPORT_SIZE = ctypes.sizeof(vcom.XUSB_REPORT)
+
+
+class FailingBackend(vg.LoopbackBackend):
+    """
+    Loopback backend whose writes fail while self.fail is set
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.fail = None
+
+    def write(self, data):
+        if self.fail is not None:
+            return self.fail
+        return super().write(data)
+
+    def error_name(self, code):
+        return errno.errorcode[code]
+
+
+class TestCounters(unittest.TestCase):
+
+    def test_add_and_snapshot(self):
+        a = metrics.Counters()
+        a.updates, a.writes, a.bytes, a.skipped, a.notifications = 1, 2, 3, 4, 5
+        a.error('EIO')
+        b = metrics.Counters()
+        b.updates = 10
+        b.error('EIO')
+        b.error('ENODEV')
+        a.add(b)
+        snapshot = a.snapshot()
+        self.assertEqual(snapshot, {'updates': 11, 'writes': 2, 'bytes': 3, 'skipped': 4, 'notifications': 5,
+                                    'errors': {'EIO': 2, 'ENODEV': 1}})
+        snapshot['errors']['EIO'] = 0
+        self.assertEqual(a.errors['EIO'], 2)  # the snapshot is a copy
+
+
+class TestGamepadStats(unittest.TestCase):
+
+    def test_updates(self):
+        with vg.VX360Gamepad(backend='loopback') as g:
+            g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            g.update()
+            g.update()
+            stats = g.stats()
+        self.assertEqual(stats, {'updates': 3, 'writes': 3, 'bytes': 3 * REPORT_SIZE, 'skipped': 0,
+                                 'notifications': 0, 'errors': {}})
+
+    def test_skip_unchanged(self):
+        with vg.VX360Gamepad(backend='loopback') as g:
+            g.skip_unchanged = True
+            g.update()  # first update since skip_unchanged: sent
+            g.update()
+            g.update()
+            g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            g.update()
+            g.update()
+            stats = g.stats()
+            self.assertEqual(len(g.backend.frames), 3)
+        self.assertEqual((stats['updates'], stats['skipped'], stats['writes']), (6, 3, 3))
+
+    def test_errors(self):
+        backend = FailingBackend()
+        with vg.VX360Gamepad(backend=backend) as g:
+            backend.fail = errno.EIO
+            with self.assertRaises(OSError):
+                g.update()
+            self.assertEqual(g.try_update(), errno.EIO)
+            backend.fail = None
+            g.update()
+            stats = g.stats()
+        self.assertEqual(stats['errors'], {'EIO': 2})
+        self.assertEqual((stats['updates'], stats['writes']), (4, 2))
+
+    def test_errors_reset_skip_unchanged(self):
+        backend = FailingBackend()
+        with vg.VX360Gamepad(backend=backend) as g:
+            g.skip_unchanged = True
+            backend.fail = errno.EIO
+            g.try_update()
+            backend.fail = None
+            g.update()  # same report, but the previous write failed: sent
+            self.assertEqual(g.stats()['skipped'], 0)
+            self.assertEqual(len(backend.frames), 2)
+
+    def test_notifications(self):
+        def callback(client, target, large_motor, small_motor, led_number, user_data):
+            pass
+
+        with vg.VX360Gamepad(backend='loopback') as g:
+            g.register_notification(callback_function=callback)
+            g.backend.notify(255, 0, 1)
+            g.backend.notify(0, 0, 1)
+            self.assertEqual(g.stats()['notifications'], 2)
+
+
+class TestProcessStats(unittest.TestCase):
+
+    def test_live_and_retired(self):
+        before = vg.process_stats()
+        g1 = vg.VX360Gamepad(backend='loopback')
+        g2 = vg.VX360Gamepad(backend=FailingBackend())
+        g1.update()
+        g2.backend.fail = errno.ENODEV
+        g2.try_update()
+        live = vg.process_stats()
+        self.assertEqual(live['updates'] - before['updates'], 4)
+        self.assertEqual(live['writes'] - before['writes'], 3)
+        self.assertEqual(live['bytes'] - before['bytes'], 3 * REPORT_SIZE)
+        self.assertEqual(live['errors'].get('ENODEV', 0) - before['errors'].get('ENODEV', 0), 1)
+
+        g1.close()
+        g2.close()
+        retired = vg.process_stats()  # the counts of closed gamepads are kept
+        self.assertEqual(retired, live)
+        g1.close()  # no effect when already closed: not retired twice
+        self.assertEqual(vg.process_stats(), live)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
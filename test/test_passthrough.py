@@ -0,0 +1,92 @@
+import os
+import platform
+import unittest
+
+import vgamepad as vg
+
+if platform.system() == 'Linux':
+    from vgamepad.lin.passthrough import (Passthrough, RemapTable, INPUT_EVENT, EV_SYN, EV_KEY, EV_ABS, SYN_REPORT,
+                                          SYN_DROPPED, BTN_SOUTH, BTN_EAST, ABS_X, ABS_Y, ABS_Z, ABS_RX, ABS_RY, ABS_RZ,
+                                          ABS_HAT0X)
+
+A = vg.XUSB_BUTTON.XUSB_GAMEPAD_A
+B = vg.XUSB_BUTTON.XUSB_GAMEPAD_B
+
+
+def event(ev_type, code, value=0):
+    return INPUT_EVENT.pack(0, 0, ev_type, code, value)
+
+
+SYN = None if platform.system() != 'Linux' else event(EV_SYN, SYN_REPORT)
+
+
+@unittest.skipUnless(platform.system() == 'Linux', "evdev passthrough is Linux only")
+class TestPassthrough(unittest.TestCase):
+
+    def setUp(self):
+        self.read_fd, self.write_fd = os.pipe()  # stands for the source device
+        self.gamepad = vg.VX360Gamepad(backend='loopback')
+        ranges = {code: (0, 255) for code in (ABS_X, ABS_Y, ABS_RX, ABS_RY, ABS_Z, ABS_RZ)}
+        table = RemapTable(buttons={BTN_SOUTH: B, BTN_EAST: A},  # swapped
+                           axes={ABS_X: ('sThumbLX', False, 1.0), ABS_Y: ('sThumbLY', True, 1.0),
+                                 ABS_RX: ('sThumbRX', False, 2.0), ABS_Z: ('bLeftTrigger', False, 1.0)},
+                           ranges=ranges)
+        self.passthrough = Passthrough(self.read_fd, self.gamepad, table)
+
+    def tearDown(self):
+        self.passthrough.close()
+        self.gamepad.close()
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def sent(self):
+        return [vg.win.vigem_commons.XUSB_REPORT.from_buffer_copy(data) for _, data in self.gamepad.backend.frames][1:]
+
+    def test_remap(self):
+        os.write(self.write_fd, event(EV_KEY, BTN_SOUTH, 1) + event(EV_ABS, ABS_X, 255) + event(EV_ABS, ABS_Y, 0)
+                 + event(EV_ABS, ABS_RX, 192) + event(EV_ABS, ABS_Z, 255) + event(EV_ABS, ABS_RY, 255) + SYN)
+        self.assertEqual(self.passthrough.poll(1.0), 1)  # one update per SYN_REPORT
+        report = self.sent()[-1]
+        self.assertEqual(report.wButtons, B)
+        self.assertEqual((report.sThumbLX, report.sThumbLY, report.bLeftTrigger), (32767, 32767, 255))
+        self.assertEqual(report.sThumbRX, 32767)  # scaled by 2 and clamped
+        self.assertEqual(report.sThumbRY, 0)  # not mapped
+        data = event(EV_KEY, BTN_SOUTH, 0) + event(EV_KEY, BTN_EAST, 1) + event(EV_ABS, ABS_HAT0X, -1) + SYN
+        os.write(self.write_fd, data[:30])  # incomplete event
+        self.assertEqual(self.passthrough.poll(1.0), 0)
+        os.write(self.write_fd, data[30:] + event(EV_ABS, ABS_HAT0X, 0) + SYN)
+        self.assertEqual(self.passthrough.poll(1.0), 2)
+        reports = self.sent()
+        self.assertEqual(reports[-2].wButtons, A | vg.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_LEFT)
+        self.assertEqual(reports[-1].wButtons, A)
+        self.assertEqual(self.passthrough.events, 13)
+
+    def test_dropped(self):
+        self.passthrough.start()
+        os.write(self.write_fd, event(EV_SYN, SYN_DROPPED) + event(EV_KEY, BTN_SOUTH, 1) + SYN
+                 + event(EV_KEY, BTN_EAST, 1) + SYN)
+        self.assertTrue(vg.util.wait_until(lambda: self.passthrough.reports == 2, timeout=2.0))
+        self.assertEqual(self.passthrough.dropped, 1)
+        self.assertEqual(self.sent()[-1].wButtons, A)  # events before the first SYN_REPORT are ignored (no resync on a pipe)
+
+
+@unittest.skipUnless(platform.system() == 'Linux' and os.access('/dev/uinput', os.W_OK), "uinput is not available")
+class TestUinputSource(unittest.TestCase):
+
+    def test_mirror(self):
+        source = vg.VX360Gamepad(backend='uinput')  # default table: inverse of the uinput backend
+        self.assertTrue(source.wait_ready(timeout=5.0))
+        mirror = vg.VX360Gamepad(backend='loopback')
+        with Passthrough(source.backend.uinput.devnode, mirror) as passthrough:
+            source.press_button(button=A)
+            source.left_joystick(x_value=-20000, y_value=12345)
+            source.update()
+            self.assertTrue(vg.util.wait_until(lambda: passthrough.poll(0.1) or passthrough.reports, timeout=5.0))
+            self.assertEqual(mirror.report.wButtons, A)
+            self.assertEqual((mirror.report.sThumbLX, mirror.report.sThumbLY), (-20000, 12345))
+        mirror.close()
+        source.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+
+import vgamepad as vg
+
+
+POOL_SIZE = 3
+
+
+class TestCreateMany(unittest.TestCase):
+
+    def test_create_many(self):
+        pads = vg.create_many(lambda: vg.VX360Gamepad(backend='loopback'), 4, workers=2)
+        for g in pads:
+            self.addCleanup(g.close)
+        self.assertEqual(len(pads), 4)
+        self.assertTrue(all(isinstance(g, vg.VX360Gamepad) for g in pads))
+
+    def test_partial_failure(self):
+        created = []
+        closed = []
+
+        class Gamepad(vg.VX360Gamepad):
+            def close(self):
+                if not self._closed:
+                    closed.append(self)
+                super().close()
+
+        def factory():
+            if len(created) == 2:
+                raise OSError("no more devices")
+            g = Gamepad(backend='loopback')
+            self.addCleanup(g.close)
+            created.append(g)
+            return g
+
+        with self.assertRaises(OSError):
+            vg.create_many(factory, 4, workers=1)
+        self.assertEqual(len(created), 2)
+        self.assertEqual(sorted(map(id, closed)), sorted(map(id, created)))
+        for g in created:
+            self.assertNotIn(g, vg.registry.live_gamepads())
+
+
+class TestClose(unittest.TestCase):
+
+    def test_context_manager(self):
+        with vg.VX360Gamepad(backend='loopback') as g:
+            self.assertIn(g, vg.registry.live_gamepads())
+        self.assertNotIn(g, vg.registry.live_gamepads())
+        g.close()  # no effect when already closed
+
+
+class TestGamepadPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = vg.GamepadPool(lambda: vg.VX360Gamepad(backend='loopback'), POOL_SIZE)
+
+    def test_acquire_release(self):
+        pads = [self.pool.acquire(timeout=5.0) for _ in range(POOL_SIZE)]
+        self.assertEqual(len(set(map(id, pads))), POOL_SIZE)
+        with self.assertRaises(TimeoutError):
+            self.pool.acquire(timeout=0.01)
+
+        pads[0].press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+        self.pool.release(pads[0])
+        g = self.pool.acquire(timeout=0.01)
+        self.assertIs(g, pads[0])
+        self.assertEqual(g.report.wButtons, 0)
+
+    def test_session_state_dropped(self):
+        def callback(client, target, large_motor, small_motor, led_number, user_data):
+            received.append(large_motor)
+
+        received = []
+        g = self.pool.acquire(timeout=5.0)
+        g.register_notification(callback_function=callback)
+        g.enable_coalescing()
+        g.enable_lockstep()
+        g.skip_unchanged = True
+        g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+        g.commit()
+        self.pool.release(g)
+        self.assertIsNone(g.coalescer)
+        self.assertIsNone(g.lockstep)
+        self.assertIsNone(g.front)
+        self.assertFalse(g.skip_unchanged)
+        self.assertIsNone(g.backend.callback)
+        g.backend.notify(255, 0, 0)
+        self.assertEqual(received, [])
+        self.assertEqual(g.backend.last_report().wButtons, 0)
+
+    def test_invalid_release(self):
+        g = self.pool.acquire(timeout=5.0)
+        self.pool.release(g)
+        with self.assertRaises(ValueError):
+            self.pool.release(g)  # double release
+        with vg.VX360Gamepad(backend='loopback') as other:
+            with self.assertRaises(ValueError):
+                self.pool.release(other)  # not from this pool
+        pads = [self.pool.acquire(timeout=5.0) for _ in range(POOL_SIZE)]
+        self.assertEqual(len(set(map(id, pads))), POOL_SIZE)  # released once: acquired once
+
+    def test_closed(self):
+        g = self.pool.acquire(timeout=5.0)
+        self.pool.close()
+        self.pool.release(g)
+        self.assertNotIn(g, vg.registry.live_gamepads())
+        with self.assertRaises(RuntimeError):
+            self.pool.acquire(timeout=0.01)
+
+    def tearDown(self):
+        self.pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,67 @@
+import socket
+import unittest
+
+import vgamepad as vg
+from vgamepad.remote import RemoteServer, RemoteBackend, FRAME_HEADER, is_newer
+from vgamepad.util import wait_until
+
+
+class TestRemote(unittest.TestCase):
+
+    def setUp(self):
+        self.pads = [vg.VX360Gamepad(backend='loopback'), vg.VDS4Gamepad(backend='loopback')]
+
+    def tearDown(self):
+        for g in self.pads:
+            g.close()
+
+    def check_protocol(self, protocol):
+        with RemoteServer(self.pads, protocol=protocol) as server:
+            with vg.VX360Gamepad(backend=RemoteBackend(server.address, pad_id=0, protocol=protocol)) as remote:
+                remote.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_B)
+                remote.right_trigger(value=200)
+                remote.update()
+                self.assertTrue(wait_until(lambda: server.frames == 2, timeout=2.0))  # creation + update
+                report = self.pads[0].backend.last_report()
+                self.assertEqual(report.wButtons, vg.XUSB_BUTTON.XUSB_GAMEPAD_B)
+                self.assertEqual(report.bRightTrigger, 200)
+
+                feedback = []
+
+                def callback(client, target, large_motor, small_motor, led_number, user_data):
+                    feedback.append((large_motor, small_motor, led_number))
+
+                remote.register_notification(callback_function=callback)
+                self.pads[0].backend.notify(10, 20, 3)
+                self.assertTrue(wait_until(lambda: feedback == [(10, 20, 3)], timeout=2.0))
+
+    def test_udp(self):
+        self.check_protocol('udp')
+
+    def test_tcp(self):
+        self.check_protocol('tcp')
+
+    def test_stale_and_invalid_frames(self):
+        with RemoteServer(self.pads) as server, socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect(server.address)
+            ds4 = self.pads[1]
+            report = ds4.get_default_report()
+            report.bTriggerR = 1
+            sock.send(FRAME_HEADER.pack(1, vg.VIGEM_TARGET_TYPE.DualShock4Wired, 5) + bytes(report))
+            report.bTriggerR = 2
+            sock.send(FRAME_HEADER.pack(1, vg.VIGEM_TARGET_TYPE.DualShock4Wired, 4) + bytes(report))  # stale
+            sock.send(FRAME_HEADER.pack(0, vg.VIGEM_TARGET_TYPE.DualShock4Wired, 6) + bytes(report))  # wrong pad
+            sock.send(b'\x00')  # truncated
+            self.assertTrue(wait_until(lambda: server.stale_frames + server.invalid_frames == 3, timeout=2.0))
+            self.assertEqual(server.stats(), {'frames': 1, 'stale_frames': 1, 'invalid_frames': 2, 'errors': 0})
+            self.assertEqual(ds4.backend.last_report().bTriggerR, 1)
+
+    def test_sequence_wrap(self):
+        self.assertTrue(is_newer(0, 0xFFFFFFFF))
+        self.assertTrue(is_newer(1, None))
+        self.assertFalse(is_newer(0xFFFFFFFF, 0))
+        self.assertFalse(is_newer(7, 7))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
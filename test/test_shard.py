@@ -0,0 +1,132 @@
+import errno
+import time
+import unittest
+
+import vgamepad as vg
+from vgamepad.shard import ShardedHost
+from vgamepad.util import wait_until
+
+
+class SlowBackend(vg.LoopbackBackend):
+    """
+    Loopback backend whose first creation in a worker process is slow
+    """
+
+    created = 0
+
+    def create(self, target_type):
+        if SlowBackend.created == 0:
+            time.sleep(0.5)
+        SlowBackend.created += 1
+        super().create(target_type)
+
+
+class TestShardedHost(unittest.TestCase):
+
+    def setUp(self):
+        self.host = ShardedHost(nb_workers=2, backend='loopback', nb_slots=8, health_interval=0.05)
+        self.pads = []
+
+    def tearDown(self):
+        for g in self.pads:
+            g.close()
+        self.host.close()
+
+    def applied(self):
+        return self.host.states() == {g.get_index(): bytes(g.report) for g in self.pads}
+
+    def test_sharding(self):
+        for i in range(4):
+            g = self.host.gamepad(vg.VX360Gamepad)
+            g.left_trigger(value=i + 1)
+            g.update()
+            self.pads.append(g)
+        ds4 = self.host.gamepad(vg.VDS4Gamepad)
+        ds4.press_special_button(special_button=vg.DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_PS)
+        ds4.update()
+        self.pads.append(ds4)
+        self.assertTrue(wait_until(self.applied, timeout=5.0))
+        self.assertEqual(sorted(w['pads'] for w in self.host.health()), [2, 3])
+        self.pads.pop(0).close()
+        self.assertEqual(self.host.stats()['pads'], 4)
+        with self.assertRaises(RuntimeError):
+            for _ in range(5):
+                self.pads.append(self.host.gamepad(vg.VX360Gamepad))  # 8 slots
+
+    def test_migration(self):
+        for i in range(4):
+            g = self.host.gamepad(vg.VX360Gamepad)
+            g.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            g.right_trigger(value=10 * i)
+            g.update()
+            self.pads.append(g)
+        self.assertTrue(wait_until(self.applied, timeout=5.0))
+        dead = self.host.workers[0]
+        nb_pads = len(dead.slots)
+        dead.process.kill()
+        self.assertTrue(wait_until(lambda: self.host.migrations == nb_pads, timeout=10.0))
+        self.assertEqual(self.host.restarts, 1)
+        self.assertTrue(all(w['alive'] for w in self.host.health()))
+        self.assertTrue(wait_until(self.applied, timeout=5.0))  # last reports re-applied by the new workers
+        for g in self.pads:
+            g.release_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+            g.update()
+        self.assertTrue(wait_until(self.applied, timeout=5.0))
+
+
+class TestDeadWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.host = ShardedHost(nb_workers=1, backend='loopback', nb_slots=4, health_interval=60.0,
+                                request_timeout=0.2)  # health checked by the tests
+        self.g = self.host.gamepad(vg.VX360Gamepad)
+        self.host.states()  # once the worker has read the first report
+        worker = self.host.workers[0]
+        worker.process.kill()
+        worker.process.join()
+
+    def tearDown(self):
+        self.g.close()
+        self.host.close()
+
+    def test_close(self):
+        self.g.close()  # does not raise, the slot is freed
+        self.assertEqual(self.host.stats()['pads'], 0)
+        self.assertEqual(self.host.check_health(), 1)
+        self.assertEqual(self.host.migrations, 0)
+        self.assertEqual(self.host.health()[0]['pads'], 0)
+
+    def test_late_worker(self):
+        for _ in range(self.host.channel.ring_size):
+            self.g.update()
+        with self.assertRaises(OSError) as cm:
+            self.g.update()  # the ring of the slot is full
+        self.assertEqual(cm.exception.errno, errno.ETIMEDOUT)
+        self.assertEqual(self.g.stats()['errors'], {'ETIMEDOUT': 1})
+        self.assertEqual(self.host.check_health(), 1)
+        self.assertEqual(self.host.migrations, 1)
+        self.g.left_trigger(value=42)
+        self.g.update()  # the new worker reads the slot
+        self.assertTrue(wait_until(lambda: self.host.states() == {self.g.get_index(): bytes(self.g.report)},
+                                   timeout=5.0))
+
+
+class TestSlowWorker(unittest.TestCase):
+
+    def test_late_reply(self):
+        with ShardedHost(nb_workers=1, backend=SlowBackend, nb_slots=4, request_timeout=0.1) as host:
+            with self.assertRaises(TimeoutError):
+                host.gamepad(vg.VX360Gamepad)
+            self.assertEqual(host.stats()['pads'], 0)
+            host.request_timeout = 5.0
+            self.assertEqual(host.states(), {})  # not the late replies to add and remove
+            g = host.gamepad(vg.VX360Gamepad)
+            g.left_trigger(value=42)
+            g.update()
+            self.assertTrue(wait_until(lambda: host.states() == {g.get_index(): bytes(g.report)}, timeout=5.0))
+            g.close()
+            self.assertEqual(host.states(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import multiprocessing
+import unittest
+from unittest import mock
+
+import vgamepad as vg
+import vgamepad.shm as shm
+from vgamepad.shm import ReportChannel, ChannelPump
+from vgamepad.win.vigem_commons import XUSB_REPORT, DS4_REPORT
+from vgamepad.util import wait_until
+
+
+def produce(name, lock):
+    with ReportChannel(name=name, lock=lock) as channel:
+        report = XUSB_REPORT()
+        for value in range(1, 101):
+            report.bLeftTrigger = value
+            channel.write(0, report)
+        ds4_report = DS4_REPORT()
+        ds4_report.bTriggerR = 42
+        channel.write(1, ds4_report)
+
+
+def sent(gamepad):
+    return [XUSB_REPORT.from_buffer_copy(data) for _, data in gamepad.backend.frames]
+
+
+class TestSharedMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = ReportChannel(nb_slots=2)
+        self.pads = [vg.VX360Gamepad(backend='loopback'), vg.VDS4Gamepad(backend='loopback')]
+
+    def tearDown(self):
+        for g in self.pads:
+            g.close()
+        self.channel.close()
+
+    def test_poll(self):
+        pump = ChannelPump(self.channel, self.pads)
+        self.assertEqual(pump.poll(), 0)
+        report = self.pads[0].get_default_report()
+        report.wButtons = vg.XUSB_BUTTON.XUSB_GAMEPAD_Y
+        self.channel.write(0, report)
+        self.channel.write(1, report)  # wrong type for the DS4 slot
+        self.assertEqual(pump.poll(), 1)
+        self.assertEqual(pump.poll(), 0)  # unchanged
+        self.assertEqual(pump.invalid_reports, 1)
+        self.assertEqual(self.pads[0].backend.last_report().wButtons, vg.XUSB_BUTTON.XUSB_GAMEPAD_Y)
+
+    def test_edges_between_polls(self):
+        pump = ChannelPump(self.channel, self.pads)
+        pump.poll()
+        report = self.pads[0].get_default_report()
+        report.wButtons = vg.XUSB_BUTTON.XUSB_GAMEPAD_A
+        self.channel.write(0, report)
+        report.wButtons = 0
+        self.channel.write(0, report)  # released before the next poll
+        self.assertEqual(pump.poll(), 2)
+        self.assertEqual([r.wButtons for r in sent(self.pads[0])][-2:],
+                         [vg.XUSB_BUTTON.XUSB_GAMEPAD_A, 0])
+
+    def test_full_ring(self):
+        pump = ChannelPump(self.channel, self.pads)
+        report = self.pads[0].get_default_report()
+        for value in range(self.channel.ring_size):
+            report.bLeftTrigger = value
+            self.assertTrue(self.channel.write(0, report, timeout=0.0))
+        self.assertFalse(self.channel.write(0, report, timeout=0.01))  # the oldest report is not overwritten
+        self.assertEqual(pump.poll(), 1)  # a new pump starts with the last report
+        for value in range(self.channel.ring_size):
+            report.bLeftTrigger = 100 + value
+            self.assertTrue(self.channel.write(0, report, timeout=0.0))
+        self.assertEqual(pump.poll(), self.channel.ring_size)
+        self.assertEqual([r.bLeftTrigger for r in sent(self.pads[0])][-self.channel.ring_size:],
+                         list(range(100, 100 + self.channel.ring_size)))
+
+    def test_lock_required(self):
+        with mock.patch.object(shm, 'SEQLOCK_SAFE', False):
+            with self.assertRaises(ValueError):
+                ReportChannel(nb_slots=1)
+            lock = multiprocessing.Lock()
+            with ReportChannel(nb_slots=1, lock=lock) as channel:
+                pump = ChannelPump(channel, self.pads[:1])
+                channel.write(0, self.pads[0].get_default_report())
+                self.assertEqual(pump.poll(), 1)
+                self.assertIs(channel._read_lock, lock)
+
+    def test_other_process(self):
+        ctx = multiprocessing.get_context()
+        with ChannelPump(self.channel, self.pads) as pump:
+            pump.start()
+            p = ctx.Process(target=produce, args=(self.channel.name, ctx.Lock()))
+            p.start()
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+            self.assertTrue(wait_until(lambda: self.pads[0].backend.last_report().bLeftTrigger == 100
+                                       and self.pads[1].backend.last_report().bTriggerR == 42, timeout=2.0))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+import vgamepad as vg
+from vgamepad.store import PadStore, PerRowBackend, LoopbackBatchBackend
+
+
+class TestPadStore(unittest.TestCase):
+
+    def test_vectorized(self):
+        store = PadStore(vg.VX360Gamepad, 10000)
+        store.set('sThumbLX', np.arange(10000, dtype=np.int16))
+        store.press_buttons(vg.XUSB_BUTTON.XUSB_GAMEPAD_A | vg.XUSB_BUTTON.XUSB_GAMEPAD_B, rows=slice(0, 10))
+        store.release_buttons(vg.XUSB_BUTTON.XUSB_GAMEPAD_A, rows=[0])
+        self.assertEqual(store.flush(), 10000)
+        self.assertEqual(store.flush(), 0)
+        backend = store._owners[0][3]
+        self.assertEqual(backend.batches, 1)
+        self.assertEqual(backend.reports['sThumbLX'][9999], 9999)
+        self.assertEqual(backend.reports['wButtons'][0], vg.XUSB_BUTTON.XUSB_GAMEPAD_B)
+        self.assertEqual(backend.reports['wButtons'][5], vg.XUSB_BUTTON.XUSB_GAMEPAD_A | vg.XUSB_BUTTON.XUSB_GAMEPAD_B)
+
+    def test_views(self):
+        store = PadStore(vg.VDS4Gamepad, 100)
+        self.assertTrue((store.reports['bThumbLX'] == 0x80).all())
+        pad = store.view(42)
+        self.assertIsInstance(pad, vg.VDS4Gamepad)
+        pad.directional_pad(direction=vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_WEST)
+        pad.left_joystick_float(x_value_float=1.0, y_value_float=0.0)
+        self.assertFalse(store.dirty.any())
+        pad.update()
+        self.assertEqual(np.flatnonzero(store.dirty).tolist(), [42])
+        self.assertEqual(store.reports['bThumbLX'][42], 255)
+        self.assertEqual(store.reports['wButtons'][42] & 0xF, vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_WEST)
+        pad.reset()
+        self.assertEqual(store.reports['bThumbLX'][42], 0x80)
+
+    def test_backends(self):
+        store = PadStore(vg.VX360Gamepad, 6, backend=LoopbackBatchBackend())
+        loopback = store._owners[0][3]
+        store.assign(PerRowBackend('loopback'), 2, 4)
+        store.view(1).update()
+        view = store.view(5)
+        view.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_Y)
+        view.update()
+        store.view(3).update()
+        self.assertEqual(store.flush(), 3)
+        self.assertEqual(loopback.reports['wButtons'][5], vg.XUSB_BUTTON.XUSB_GAMEPAD_Y)
+        self.assertEqual(loopback.rows_written, 2)
+        per_row = store._owners[1][3]
+        self.assertEqual([len(b.frames) for b in per_row.backends], [0, 1])
+        store.assign(LoopbackBatchBackend(), 2, 4)
+        self.assertEqual(per_row.backends, [])  # closed
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,109 @@
+import sys
+import unittest
+
+import fake_vigem_client as fake
+
+# The real ViGEm client needs Windows and ViGEmBus, these tests run against the fake client instead
+sys.modules.setdefault('vgamepad.win.vigem_client', fake)
+
+import vgamepad.win.virtual_gamepad as vwin
+from vgamepad.win.supervisor import Supervisor
+
+
+def dummy_callback(client, target, large_motor, small_motor, led_number, user_data):
+    pass
+
+
+class TestSupervisor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.real_vcli, cls.real_vbus = vwin.vcli, vwin.VBUS
+        vwin.vcli = fake  # in case the real client was already imported (Windows)
+        vwin.VBUS = vwin.VBus()
+
+    @classmethod
+    def tearDownClass(cls):
+        vwin.VBUS.close()
+        vwin.vcli, vwin.VBUS = cls.real_vcli, cls.real_vbus
+
+    def setUp(self):
+        self.events = []
+        self.supervisor = Supervisor(max_attempts=3, first_delay=0.001,
+                                     health_callback=lambda event, g, err: self.events.append((event, err)),
+                                     vbus=vwin.VBUS)
+        self.g = vwin.VX360Gamepad(backend=vwin.ViGEmBackend())
+        self.supervisor.supervise(self.g)
+
+    def test_bus_lost(self):
+        self.g.set_pid(0x1234)
+        self.g.register_notification(dummy_callback)
+        self.g.press_button(button=vwin.vcom.XUSB_BUTTON.XUSB_GAMEPAD_A)
+        fake.break_bus(vwin.VBUS.get_busp())
+
+        self.g.update()
+
+        self.assertEqual(self.events[0], ('failure', 'VIGEM_ERROR_BUS_ACCESS_FAILED'))
+        self.assertEqual(self.events[-1][0], 'recovered')
+        target = fake.targets[self.g.backend._devicep]
+        self.assertTrue(target['plugged'])
+        self.assertEqual(target['bus'], vwin.VBUS.get_busp())
+        self.assertEqual(target['pid'], 0x1234)
+        self.assertIsNotNone(target['callback'])
+        self.assertEqual(target['reports'][-1], bytes(self.g.report))
+
+    def test_target_lost(self):
+        busp = vwin.VBUS.get_busp()
+        fake.unplug(self.g.backend._devicep)
+
+        self.g.update()
+
+        self.assertEqual(vwin.VBUS.get_busp(), busp)  # no reconnection needed
+        self.assertEqual(self.events, [('failure', 'VIGEM_ERROR_TARGET_NOT_PLUGGED_IN'),
+                                       ('recovered', 'VIGEM_ERROR_TARGET_NOT_PLUGGED_IN')])
+
+    def test_backoff_and_lost(self):
+        fake.break_bus(vwin.VBUS.get_busp())
+        fake.connect_failures = 2
+        self.g.update()  # third attempt succeeds
+        self.assertEqual([e for e, _ in self.events], ['failure', 'retry', 'retry', 'recovered'])
+
+        self.events.clear()
+        fake.break_bus(vwin.VBUS.get_busp())
+        fake.connect_failures = 3
+        with self.assertRaises(vwin.VigemBusLostError):
+            self.g.update()
+        self.assertEqual(self.events[-1][0], 'lost')
+        fake.connect_failures = 0
+        vwin.VBUS.reconnect()
+
+    def test_unsupervised_on_same_bus(self):
+        other = vwin.VX360Gamepad(backend=vwin.ViGEmBackend())  # not supervised
+        try:
+            fake.break_bus(vwin.VBUS.get_busp())
+            fake.connect_failures = 1
+            self.g.update()
+            self.assertEqual(self.events[0], ('failure', 'VIGEM_ERROR_BUS_ACCESS_FAILED'))
+            self.assertEqual(self.events[-1], ('recovered', 'VIGEM_ERROR_BUS_ACCESS_FAILED'))  # not the retry error
+            self.assertEqual(other.backend._busp, vwin.VBUS.get_busp())  # not the freed bus
+            other.press_button(button=vwin.vcom.XUSB_BUTTON.XUSB_GAMEPAD_B)
+            self.assertEqual(other.try_update(), vwin.VIGEM_ERROR_NONE)
+            self.assertEqual(fake.targets[other.backend._devicep]['reports'][-1], bytes(other.report))
+        finally:
+            other.close()
+
+    def test_unsupervised(self):
+        self.g.supervisor = None
+        fake.unplug(self.g.backend._devicep)
+        self.assertEqual(self.g.try_update(), vwin.vcom.VIGEM_ERRORS.VIGEM_ERROR_TARGET_NOT_PLUGGED_IN)
+        with self.assertRaises(vwin.VigemTargetNotPluggedInError):
+            self.g.update()
+        self.g.replug()
+        self.g.update()
+
+    def tearDown(self):
+        self.g.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import vgamepad as vg
+import vgamepad.trace as trace
+import vgamepad.win.vigem_commons as vcom
+from vgamepad.trace import Trace, TraceWriter, RecordingBackend, build_index, replay
+
+
+A = vg.XUSB_BUTTON.XUSB_GAMEPAD_A
+B = vg.XUSB_BUTTON.XUSB_GAMEPAD_B
+
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'run.vgtrace')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write_x360(self, buttons):
+        with TraceWriter(self.path, vg.VIGEM_TARGET_TYPE.Xbox360Wired) as writer:
+            for i, b in enumerate(buttons):
+                writer.write(vcom.XUSB_REPORT(wButtons=b, sThumbLX=-32768 + 1000 * i), timestamp=i * 1000)
+
+    def test_statistics(self):
+        self.write_x360([A, A | B, B, 0, A, A, A, 0, 0, A])
+        for chunk in (trace.CHUNK, 3):
+            trace.CHUNK = chunk
+            try:
+                with Trace(self.path) as t:
+                    self.assertEqual(len(t), 10)
+                    counts = t.press_counts()
+                    self.assertEqual(counts[A], 3)
+                    self.assertEqual(counts[B], 1)
+                    self.assertEqual(counts[vg.XUSB_BUTTON.XUSB_GAMEPAD_X], 0)
+                    self.assertEqual(t.hold_durations(A).tolist(), [2000, 3000])  # the last press is not released
+                    self.assertEqual(t.hold_durations(B).tolist(), [2000])
+                    histogram, x_edges, _ = t.stick_histogram('left', bins=4)
+                    self.assertEqual(histogram.sum(), 10)
+                    self.assertEqual(histogram[0, 2], 10)  # Y = 0 is in the third bin
+                    stats = t.interval_stats()
+                    self.assertEqual((stats['count'], stats['min'], stats['max'], stats['p50']), (9, 1000, 1000, 1000.0))
+                    self.assertEqual(t.report(1).wButtons, A | B)
+            finally:
+                trace.CHUNK = 1 << 20
+
+    def test_interval_stats_chunks(self):
+        rng = np.random.default_rng(0)
+        timestamps = np.cumsum(rng.integers(1, 50000, 1000))
+        with TraceWriter(self.path, vg.VIGEM_TARGET_TYPE.Xbox360Wired) as writer:
+            for t in timestamps:
+                writer.write(vcom.XUSB_REPORT(), timestamp=int(t))
+        intervals = np.diff(timestamps)
+        for chunk in (2, 7, trace.CHUNK):
+            trace.CHUNK = chunk
+            try:
+                with Trace(self.path) as t:
+                    stats = t.interval_stats()
+                    self.assertEqual((stats['count'], stats['min'], stats['max']),
+                                     (len(intervals), int(intervals.min()), int(intervals.max())))
+                    self.assertAlmostEqual(stats['mean'], intervals.mean(), delta=1e-6 * intervals.mean())
+                    self.assertAlmostEqual(stats['std'], intervals.std(), delta=1e-6 * intervals.std())
+                    for q in (50, 99):
+                        exact = np.sort(intervals)[int(q / 100 * (len(intervals) - 1))]
+                        self.assertLess(abs(stats[f'p{q}'] - exact), 0.011 * exact)
+                    self.assertEqual(sum(len(c) for c in t.dpad()), len(timestamps))
+            finally:
+                trace.CHUNK = 1 << 20
+
+    def test_recording_backend(self):
+        loopback = vg.LoopbackBackend()
+        gamepad = vg.VDS4Gamepad(backend=RecordingBackend(loopback, self.path))
+        gamepad.directional_pad(direction=vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_EAST)
+        gamepad.press_special_button(special_button=vg.DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_PS)
+        gamepad.update()
+        gamepad.close()
+        self.assertEqual(len(loopback.frames), 2)
+        with Trace(self.path) as t:
+            self.assertEqual(t.target_type, vg.VIGEM_TARGET_TYPE.DualShock4Wired)
+            self.assertEqual(np.concatenate(list(t.dpad())).tolist(), [vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_NONE,
+                                                  vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_EAST])
+            self.assertEqual(t.press_counts()[vg.DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_PS], 1)
+            self.assertTrue((t.records['bThumbLX'] == 0x80).all())
+            self.assertEqual(bytes(t.report(1)), loopback.frames[1][1])
+
+    def test_seek(self):
+        with TraceWriter(self.path, vg.VIGEM_TARGET_TYPE.Xbox360Wired, index_interval=1e-5) as writer:
+            for i in range(1000):
+                writer.write(vcom.XUSB_REPORT(sThumbLX=i), timestamp=1000 + 3000 * (i // 2))  # pairs of records
+        expected = {0: -1, 999: -1, 1000: 1, 2999: 1, 4000: 3, 1000 + 3000 * 499: 999, 10 ** 9: 999}
+        with Trace(self.path) as t:
+            self.assertEqual(len(t.index), 125)  # first records at least 10 us after the previous entry
+            self.assertEqual(t.index['record'][1], 8)
+            self.assertEqual(t.index['offset'][1], trace.HEADER.size + 8 * t.dtype.itemsize)
+            for timestamp, i in expected.items():
+                self.assertEqual(t.seek(timestamp), i)
+            self.assertIsNone(t.report_at(999))
+            self.assertEqual(t.report_at(1000 + 3000 * 100 + 5).sThumbLX, 201)
+            index = t.index.copy()
+        os.remove(self.path + '.idx')
+        with Trace(self.path) as t:
+            self.assertIsNone(t.index)
+            for timestamp, i in expected.items():
+                self.assertEqual(t.seek(timestamp), i)
+        build_index(self.path, index_interval=1e-5)
+        with Trace(self.path) as t:
+            self.assertTrue((t.index == index).all())
+
+    def test_replay(self):
+        self.write_x360([A, A | B, B, 0, A, A, A, 0, 0, A])
+        gamepad = vg.VX360Gamepad(backend='loopback')
+        with Trace(self.path) as t:
+            self.assertEqual(replay(gamepad, t, start=2500, stop=6000, speed=10.0), 5)
+        sent = [vcom.XUSB_REPORT.from_buffer_copy(data).wButtons for _, data in gamepad.backend.frames]
+        self.assertEqual(sent, [0, B, 0, A, A, A])  # default report, then records 2 (in effect at 2500) to 6
+        self.assertEqual(gamepad.report.wButtons, A)
+        gamepad.close()
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a trace' * 4)
+        with self.assertRaises(ValueError):
+            Trace(self.path)
+        self.write_x360([])
+        with Trace(self.path) as t:
+            self.assertEqual(len(t), 0)
+            self.assertIsNone(t.interval_stats())
+            self.assertEqual(t.hold_durations(A).tolist(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
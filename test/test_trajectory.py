@@ -0,0 +1,51 @@
+import math
+import unittest
+
+import vgamepad as vg
+from vgamepad.macro import Macro
+from vgamepad.trajectory import Line, Bezier, Circle, ease_in_out, play, add_to_macro
+from vgamepad.win.vigem_commons import XUSB_REPORT
+
+
+class TestTrajectory(unittest.TestCase):
+
+    def test_shapes(self):
+        line = Line((0.0, -1.0), (1.0, 1.0), easing=ease_in_out)
+        self.assertEqual(list(line.samples(3)), [(0.0, -1.0), (0.5, 0.0), (1.0, 1.0)])
+        self.assertEqual(Line(0.0, 1.0).at(0.25), 0.25)
+        curve = Bezier((0.0, 0.0), (1.0, 1.0), (1.0, 0.0))
+        self.assertEqual(curve.at(0.0), (0.0, 0.0))
+        self.assertEqual(curve.at(0.5), (0.75, 0.5))
+        self.assertEqual(curve.at(1.0), (1.0, 0.0))
+        x, y = Circle(start_angle=0.0, end_angle=math.pi / 2).at(1.0)
+        self.assertAlmostEqual(x, 0.0)
+        self.assertAlmostEqual(y, 1.0)
+
+    def test_play(self):
+        with vg.VX360Gamepad(backend='loopback') as g:
+            play(g, {'left_joystick': Circle(radius=1.5), 'right_trigger': Line(0.0, 1.0)}, duration=0.05, rate=200.0)
+            reports = [XUSB_REPORT.from_buffer_copy(data) for _, data in g.backend.frames][1:]
+            self.assertEqual(len(reports), 11)
+            self.assertEqual(reports[0].bRightTrigger, 0)
+            self.assertEqual(reports[-1].bRightTrigger, 255)
+            self.assertEqual(reports[-1].sThumbLX, 32767)  # clamped
+            self.assertEqual(min(r.sThumbLY for r in reports), -32767)
+
+    def test_macro(self):
+        macro = add_to_macro(Macro(), {'right_joystick': Line((0.0, 0.0), (1.0, 0.0))}, frames=4)
+        self.assertEqual(macro.frame, 4)
+        self.assertEqual(len(macro.compile(vg.VDS4Gamepad).times), 5)
+
+    def test_mismatch(self):
+        with vg.VX360Gamepad(backend='loopback') as g:
+            for moves in ({'left_trigger': Circle()}, {'right_joystick': Line(0.0, 1.0)}, {'dpad': Line(0.0, 1.0)}):
+                with self.subTest(moves=list(moves)):
+                    with self.assertRaises(ValueError):
+                        play(g, dict(left_joystick=Circle(), **moves), duration=0.05)  # checked before any move
+                    with self.assertRaises(ValueError):
+                        add_to_macro(Macro(), moves, frames=4)
+            self.assertEqual(len(g.backend.frames), 1)  # nothing played
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
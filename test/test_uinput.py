@@ -0,0 +1,36 @@
+import os
+import unittest
+
+try:
+    import libevdev
+    import libevdev._clib
+    libevdev.Device()
+    REAL_LIBEVDEV = True
+except (ImportError, OSError):
+    REAL_LIBEVDEV = False  # libevdev.so is missing
+
+
+@unittest.skipUnless(REAL_LIBEVDEV, "requires python-libevdev and libevdev")
+class TestUinputBackend(unittest.TestCase):
+
+    def test_libevdev_internals(self):
+        # UinputBackend.close() destroys the device through these internals of python-libevdev
+        self.assertIsNone(libevdev.Device()._uinput)
+        self.assertTrue(callable(getattr(libevdev._clib.UinputDevice, '__exit__', None)))
+
+    @unittest.skipUnless(os.access('/dev/uinput', os.W_OK), "requires write access to /dev/uinput")
+    def test_close_destroys_device(self):
+        import vgamepad as vg
+        from vgamepad.lin.virtual_gamepad import UinputBackend
+        from vgamepad.util import wait_until
+        g = vg.VX360Gamepad(backend=UinputBackend())
+        uinput = g.backend.uinput  # keeps a reference to the device
+        devnode = uinput.devnode
+        self.assertTrue(g.wait_ready(timeout=5.0))
+        g.close()
+        self.assertIsNone(uinput._uinput)
+        self.assertTrue(wait_until(lambda: not os.path.exists(devnode), timeout=5.0))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
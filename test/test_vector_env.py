@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+
+import vgamepad as vg
+from vgamepad.store import LoopbackBatchBackend
+from vgamepad.vector_env import VectorGamepads
+
+try:
+    import gymnasium
+except ImportError:
+    gymnasium = None
+
+
+class TestVectorGamepads(unittest.TestCase):
+
+    def test_x360(self):
+        with VectorGamepads(vg.VX360Gamepad, 3, backend=LoopbackBatchBackend()) as pads:
+            buttons = np.zeros((3, len(pads.buttons)), dtype=np.int8)
+            buttons[0, pads.buttons.index(vg.XUSB_BUTTON.XUSB_GAMEPAD_A)] = 1
+            buttons[2, pads.buttons.index(vg.XUSB_BUTTON.XUSB_GAMEPAD_Y)] = 1
+            buttons[2, pads.buttons.index(vg.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_UP)] = 1
+            joysticks = np.array([[0.5, -0.25, 1.0, -1.0], [2.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0]], dtype=np.float32)
+            triggers = np.array([[0.0, 1.0], [0.5, 0.2], [0.0, 0.0]], dtype=np.float32)
+            pads.step({'buttons': buttons, 'joysticks': joysticks, 'triggers': triggers})
+            sent = pads.store._owners[0][3].reports
+            self.assertEqual(sent['wButtons'].tolist(), [vg.XUSB_BUTTON.XUSB_GAMEPAD_A, 0,
+                                                          vg.XUSB_BUTTON.XUSB_GAMEPAD_Y | vg.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_UP])
+            # same values as the float setters
+            gamepad = vg.VX360Gamepad(backend='loopback')
+            gamepad.left_joystick_float(x_value_float=0.5, y_value_float=-0.25)
+            gamepad.right_trigger_float(value_float=1.0)
+            self.assertEqual((sent['sThumbLX'][0], sent['sThumbLY'][0], sent['bRightTrigger'][0]),
+                             (gamepad.report.sThumbLX, gamepad.report.sThumbLY, gamepad.report.bRightTrigger))
+            gamepad.close()
+            self.assertEqual(sent['sThumbLX'][1], 32767)  # clipped
+            self.assertEqual(sent['bLeftTrigger'][1], 128)
+
+    def test_ds4_async(self):
+        with VectorGamepads(vg.VDS4Gamepad, 2, backend='loopback') as pads:
+            buttons = np.zeros((2, len(pads.buttons)), dtype=np.int8)
+            buttons[1, pads.buttons.index(vg.DS4_BUTTONS.DS4_BUTTON_CROSS)] = 1
+            buttons[1, pads.buttons.index(vg.DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_PS)] = 1
+            dpad = np.array([vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_NONE, vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_EAST])
+            pads.step_async({'buttons': buttons, 'dpad': dpad, 'joysticks': np.full((2, 4), -1.0)})
+            pads.step_wait(timeout=5.0)
+            report = pads.store._owners[0][3].backends[1].last_report()
+            self.assertEqual(report.wButtons, vg.DS4_BUTTONS.DS4_BUTTON_CROSS | vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_EAST)
+            self.assertEqual(report.bSpecial, vg.DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_PS)
+            self.assertEqual(report.bThumbLX, 1)
+            pads.step({'buttons': np.zeros_like(buttons)})  # keeps the directional pad
+            report = pads.store._owners[0][3].backends[1].last_report()
+            self.assertEqual(report.wButtons, vg.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_EAST)
+
+    @unittest.skipIf(gymnasium is None, "gymnasium is not installed")
+    def test_action_space(self):
+        with VectorGamepads(vg.VDS4Gamepad, 4, backend=LoopbackBatchBackend()) as pads:
+            space = pads.action_space
+            actions = space.sample()
+            self.assertEqual(actions['buttons'].shape, (4, 14))
+            self.assertEqual(actions['joysticks'].shape, (4, 4))
+            pads.step(actions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import sys
+import unittest
+
+import fake_vigem_client as fake
+
+# The real ViGEm client needs Windows and ViGEmBus, these tests run against the fake client instead
+sys.modules.setdefault('vgamepad.win.vigem_client', fake)
+
+import vgamepad.win.virtual_gamepad as vwin
+from vgamepad.win.vigem_commons import VIGEM_ERRORS, XUSB_BUTTON
+
+
+class TestErrorMapping(unittest.TestCase):
+
+    def test_success(self):
+        self.assertIsNone(vwin.check_err(vwin.VIGEM_ERROR_NONE))
+        self.assertIsNone(vwin.check_err(VIGEM_ERRORS.VIGEM_ERROR_NONE))
+        self.assertIs(type(vwin.VIGEM_ERROR_NONE), int)
+
+    def test_typed_errors(self):
+        expected = {
+            VIGEM_ERRORS.VIGEM_ERROR_BUS_NOT_FOUND: vwin.VigemBusLostError,
+            VIGEM_ERRORS.VIGEM_ERROR_BUS_ACCESS_FAILED: vwin.VigemBusLostError,
+            VIGEM_ERRORS.VIGEM_ERROR_BUS_INVALID_HANDLE: vwin.VigemBusLostError,
+            VIGEM_ERRORS.VIGEM_ERROR_NO_FREE_SLOT: vwin.VigemNoFreeSlotError,
+            VIGEM_ERRORS.VIGEM_ERROR_TARGET_NOT_PLUGGED_IN: vwin.VigemTargetNotPluggedInError,
+        }
+        for code in VIGEM_ERRORS:
+            if code == VIGEM_ERRORS.VIGEM_ERROR_NONE:
+                continue
+            with self.subTest(code=code.name):
+                error = vwin.vigem_error(int(code))
+                self.assertIs(type(error), expected.get(code, vwin.VigemError))
+                self.assertEqual(error.code, code)
+                self.assertEqual(str(error), code.name)
+                with self.assertRaises(type(error)):
+                    vwin.check_err(int(code))
+
+    def test_unknown_code(self):
+        error = vwin.vigem_error(0xE00000FF)
+        self.assertIs(type(error), vwin.VigemError)
+        self.assertEqual(error.code, 0xE00000FF)
+        self.assertEqual(str(error), '0xe00000ff')
+        self.assertEqual(vwin.error_name(0xE00000FF), '0xe00000ff')
+
+
+class TestTryUpdate(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.real_vcli, cls.real_vbus = vwin.vcli, vwin.VBUS
+        vwin.vcli = fake  # in case the real client was already imported (Windows)
+        vwin.VBUS = vwin.VBus()
+
+    @classmethod
+    def tearDownClass(cls):
+        vwin.VBUS.close()
+        vwin.vcli, vwin.VBUS = cls.real_vcli, cls.real_vbus
+
+    def setUp(self):
+        self.g = vwin.VX360Gamepad(backend=vwin.ViGEmBackend())
+
+    def tearDown(self):
+        self.g.close()
+
+    def test_success(self):
+        self.g.press_button(button=XUSB_BUTTON.XUSB_GAMEPAD_A)
+        self.assertEqual(self.g.try_update(), vwin.VIGEM_ERROR_NONE)
+        self.assertEqual(fake.targets[self.g.backend._devicep]['reports'][-1], bytes(self.g.report))
+        self.assertEqual(self.g.stats()['errors'], {})
+
+    def test_error_code_returned(self):
+        fake.unplug(self.g.backend._devicep)
+        err = self.g.try_update()  # does not raise
+        self.assertEqual(err, VIGEM_ERRORS.VIGEM_ERROR_TARGET_NOT_PLUGGED_IN)
+        with self.assertRaises(vwin.VigemTargetNotPluggedInError):
+            self.g.update()
+        self.assertEqual(self.g.stats()['errors'], {'VIGEM_ERROR_TARGET_NOT_PLUGGED_IN': 2})
+
+    def test_bus_lost(self):
+        fake.break_bus(vwin.VBUS.get_busp())
+        try:
+            self.assertEqual(self.g.try_update(), VIGEM_ERRORS.VIGEM_ERROR_BUS_ACCESS_FAILED)
+            with self.assertRaises(vwin.VigemBusLostError):
+                self.g.update()
+        finally:
+            fake.buses[vwin.VBUS.get_busp()]['broken'] = False
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -2,6 +2,16 @@ import platform
 from vgamepad.win.vigem_commons import VIGEM_TARGET_TYPE, XUSB_BUTTON, DS4_BUTTONS, DS4_SPECIAL_BUTTONS, DS4_DPAD_DIRECTIONS
 
 if platform.system() == 'Windows':
-    from vgamepad.win.virtual_gamepad import VX360Gamepad, VDS4Gamepad
+    import vgamepad.win.virtual_gamepad  # registers the 'vigem' backend
+    from vgamepad.win.virtual_gamepad import VigemError, VigemBusLostError, VigemNoFreeSlotError, VigemTargetNotPluggedInError
+    DEFAULT_BACKEND = 'vigem'
 else:  # Linux
-    from vgamepad.lin.virtual_gamepad import VX360Gamepad, VDS4Gamepad
+    import vgamepad.lin.virtual_gamepad  # registers the 'uinput' backend
+    DEFAULT_BACKEND = 'uinput'
+
+from vgamepad.backend import Backend, LoopbackBackend, register_backend, set_default_backend
+set_default_backend(DEFAULT_BACKEND)
+from vgamepad.virtual_gamepad import VX360Gamepad, VDS4Gamepad
+import vgamepad.registry as registry
+from vgamepad.pool import GamepadPool, create_many
+from vgamepad.metrics import process_stats
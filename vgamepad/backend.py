@@ -0,0 +1,256 @@
+"""
+Backends: what a virtual gamepad needs from the OS (or from anything else)
+
+A backend plugs a single virtual device and submits the reports built by the gamepad front end
+(vgamepad.virtual_gamepad). Reports are always XUSB_REPORT or DS4_REPORT structures,
+the backend converts them into whatever it writes (pack), writes them (write), and may deliver feedback.
+
+Backends are registered by name. The platform backend ('vigem' on Windows, 'uinput' on Linux)
+is registered as the default backend when vgamepad is imported.
+"""
+
+import collections
+from abc import ABC, abstractmethod
+from ctypes import sizeof
+from time import perf_counter_ns
+
+import vgamepad.win.vigem_commons as vcom
+
+
+class Backend(ABC):
+    """
+    Interface of the backends
+
+    The constructor must be cheap, the device is plugged in by create().
+    """
+
+    SUCCESS = 0  # error code returned by write() on success
+
+    @abstractmethod
+    def create(self, target_type):
+        """
+        Plugs the virtual device in
+
+        :param target_type: VIGEM_TARGET_TYPE.Xbox360Wired or VIGEM_TARGET_TYPE.DualShock4Wired
+        """
+        pass
+
+    @abstractmethod
+    def pack(self, report):
+        """
+        :param report: the XUSB_REPORT or DS4_REPORT to send
+        :return: the data that write() sends for this report
+        """
+        pass
+
+    @abstractmethod
+    def write(self, data):
+        """
+        Sends data returned by pack() to the device, without raising on device errors
+
+        :return: self.SUCCESS, or an error code
+        """
+        pass
+
+    def written(self, data):
+        """
+        :param data: data successfully sent by write()
+        :return: (number of writes, number of bytes) performed by write(data), for metrics
+        """
+        return 1, len(data)
+
+    def error(self, code):
+        """
+        :param code: an error code returned by write()
+        :return: the exception raised by update() for this code
+        """
+        return OSError(code, f"{type(self).__name__} error {code}")
+
+    def error_name(self, code):
+        """
+        :param code: an error code returned by write()
+        :return: a name for this code, used in metrics
+        """
+        return str(code)
+
+    @abstractmethod
+    def close(self):
+        """
+        Unplugs the virtual device (no effect if already closed)
+        """
+        pass
+
+    def is_ready(self):
+        """
+        :return: True if the device is visible to other applications
+        """
+        return True
+
+    def register_notification(self, callback_function):
+        """
+        Registers a feedback callback (rumble, LEDs...)
+
+        :param callback_function: function of the form my_func(client, target, large_motor, small_motor, led_number, user_data)
+        """
+        raise NotImplementedError(f"Notifications are not supported by {type(self).__name__}.")
+
+    def unregister_notification(self):
+        """
+        Unregisters the feedback callback
+        """
+        raise NotImplementedError(f"Notifications are not supported by {type(self).__name__}.")
+
+    def submit_extended(self, extended_report):
+        """
+        Sends a DS4_REPORT_EX (DualShock 4 only)
+
+        :return: self.SUCCESS, or an error code
+        """
+        raise NotImplementedError(f"Extended reports are not supported by {type(self).__name__}.")
+
+    def replug(self):
+        """
+        Plugs a new device in place of the current one, keeping its identifiers and feedback callback
+        """
+        raise NotImplementedError(f"Replugging is not supported by {type(self).__name__}.")
+
+    def get_vid(self):
+        return 0
+
+    def get_pid(self):
+        return 0
+
+    def set_vid(self, vid):
+        pass
+
+    def set_pid(self, pid):
+        pass
+
+    def get_index(self):
+        return 0
+
+    def get_type(self):
+        return None
+
+
+class LoopbackBackend(Backend):
+    """
+    Backend without device, which keeps the written reports in memory
+
+    Useful for tests and simulation. Feedback can be injected with notify().
+    """
+
+    def __init__(self, max_frames=1024):
+        """
+        :param max_frames: number of written frames kept in self.frames
+        """
+        self.frames = collections.deque(maxlen=max_frames)  # (perf_counter_ns() at write time, report bytes)
+        self.target_type = None
+        self.callback = None
+        self.vid = 0
+        self.pid = 0
+        self.closed = True
+
+    def create(self, target_type):
+        self.target_type = target_type
+        self.closed = False
+
+    def pack(self, report):
+        return bytes(report)
+
+    def write(self, data):
+        self.frames.append((perf_counter_ns(), data))
+        return self.SUCCESS
+
+    def close(self):
+        self.closed = True
+        self.callback = None
+
+    def is_ready(self):
+        return not self.closed
+
+    def register_notification(self, callback_function):
+        self.callback = callback_function
+
+    def unregister_notification(self):
+        self.callback = None
+
+    def notify(self, large_motor, small_motor, led_number):
+        """
+        Simulates a feedback notification from an application
+        """
+        if self.callback is not None:
+            self.callback(None, None, large_motor, small_motor, led_number, None)
+
+    def last_report(self):
+        """
+        :return: the last written report as a XUSB_REPORT or DS4_REPORT (None if nothing was written)
+        """
+        if not self.frames:
+            return None
+        report_type = vcom.XUSB_REPORT if self.target_type == vcom.VIGEM_TARGET_TYPE.Xbox360Wired else vcom.DS4_REPORT
+        data = self.frames[-1][1]
+        assert len(data) == sizeof(report_type)
+        return report_type.from_buffer_copy(data)
+
+    def get_vid(self):
+        return self.vid
+
+    def get_pid(self):
+        return self.pid
+
+    def set_vid(self, vid):
+        self.vid = vid
+
+    def set_pid(self, pid):
+        self.pid = pid
+
+    def get_type(self):
+        return self.target_type
+
+
+_backends = {'loopback': LoopbackBackend}
+_default_backend = None
+
+
+def register_backend(name, factory, default=False):
+    """
+    Registers a backend under a name
+
+    :param name: name of the backend (e.g. 'uinput')
+    :param factory: callable without arguments returning a new Backend (typically a Backend subclass)
+    :param default: if True, gamepads use this backend when no backend is specified
+    """
+    global _default_backend
+    _backends[name] = factory
+    if default:
+        _default_backend = name
+
+
+def set_default_backend(name):
+    """
+    :param name: name of a registered backend, used by gamepads when no backend is specified
+    """
+    global _default_backend
+    if name not in _backends:
+        raise KeyError(f"Unknown backend: {name}. Registered backends: {list(_backends)}")
+    _default_backend = name
+
+
+def get_backend(backend=None):
+    """
+    :param backend: None (default backend), name of a registered backend, callable returning a new Backend,
+        or Backend not created yet
+    :return: a Backend, not created yet
+    """
+    if isinstance(backend, Backend):
+        return backend
+    if backend is None:
+        if _default_backend is None:
+            raise RuntimeError("No default backend registered.")
+        backend = _default_backend
+    if isinstance(backend, str):
+        if backend not in _backends:
+            raise KeyError(f"Unknown backend: {backend}. Registered backends: {list(_backends)}")
+        backend = _backends[backend]
+    return backend()
@@ -0,0 +1,128 @@
+"""
+Input coalescing: latest-wins frame submission under backpressure
+
+In coalescing mode (see VGamepad.enable_coalescing()), producers submit frames instead of calling update(),
+and a flusher thread sends them at most at a given rate.
+A frame that is not sent yet is replaced by the next submitted frame, unless their buttons differ:
+button presses and releases are never merged, so a tap lasts at least one frame.
+When max_pending frames are waiting, submit() waits until the flusher sends one (backpressure).
+"""
+
+import collections
+import threading
+from time import perf_counter, sleep
+
+
+def _buttons(report):
+    return report.wButtons, getattr(report, 'bSpecial', 0)  # includes the DS4 D-Pad
+
+
+class Coalescer:
+    """
+    Flusher of the frames submitted to a gamepad
+    """
+
+    def __init__(self, gamepad, rate=250.0, max_pending=64):
+        """
+        :param gamepad: the gamepad to which frames are sent
+        :param rate: maximum number of frames sent per second
+        :param max_pending: maximum number of frames waiting to be sent
+            (when reached, submit() waits, see submit())
+        """
+        self.gamepad = gamepad
+        self.period = 1.0 / rate
+        self.max_pending = max_pending
+        self.submitted = 0  # submitted frames
+        self.coalesced = 0  # frames replaced by a newer frame before being sent
+        self.errors = 0  # frames whose update() raised
+        self._pending = collections.deque()  # consecutive frames have different buttons
+        self._sent_buttons = None  # buttons of the last frame taken by the flusher
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, timeout=None):
+        """
+        Submits a frame, replacing the last waiting frame if it has the same buttons
+
+        When max_pending frames are waiting, the first one is dropped if it does not change the buttons
+        of the last sent frame, otherwise submit() waits until the flusher sends it: edges are never overwritten.
+
+        :param frame: the report to send (copied)
+        :param timeout: maximum time to wait while max_pending frames are waiting, in seconds (None = wait forever)
+        :return: True if the frame is submitted, False if the timeout elapsed
+        """
+        frame = type(frame).from_buffer_copy(frame)
+        buttons = _buttons(frame)
+        deadline = None if timeout is None else perf_counter() + timeout
+        with self._cond:
+            pending = self._pending
+            while True:
+                if self._closed:
+                    raise RuntimeError("The coalescer is closed.")
+                if pending and _buttons(pending[-1]) == buttons:
+                    pending[-1] = frame
+                    self.coalesced += 1
+                    break
+                if len(pending) < self.max_pending:
+                    pending.append(frame)
+                    self._cond.notify_all()
+                    break
+                if _buttons(pending[0]) == self._sent_buttons:
+                    pending.popleft()  # not an edge, and the next waiting frames are newer
+                    self.coalesced += 1
+                    continue
+                remaining = None if deadline is None else deadline - perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.submitted += 1
+        return True
+
+    def pending(self):
+        """
+        :return: the number of frames waiting to be sent
+        """
+        with self._cond:
+            return len(self._pending)
+
+    def _run(self):
+        next_time = 0.0
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return  # closed and flushed
+            delay = next_time - perf_counter()
+            if delay > 0:
+                sleep(delay)  # frames submitted meanwhile are coalesced
+            with self._cond:
+                frame = self._pending.popleft()
+                self._sent_buttons = _buttons(frame)
+                self._cond.notify_all()  # room for a waiting submit()
+            next_time = perf_counter() + self.period
+            try:
+                self.gamepad.update(frame)
+            except Exception:
+                self.errors += 1  # counted by the gamepad counters as well
+
+    def close(self):
+        """
+        Sends the waiting frames and stops the flusher
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def stats(self):
+        """
+        :return: dict of the counters of the coalescer
+        """
+        return {
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+        }
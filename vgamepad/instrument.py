@@ -0,0 +1,168 @@
+"""
+Opt-in timing of the stages of update()
+
+Usage:
+    import vgamepad.instrument as instrument
+    instrument.enable()
+    # (...) use gamepads
+    print(instrument.snapshot())
+
+When disabled (default), update() only pays for reading the ENABLED flag.
+
+Stages:
+    skip: choosing the sent report (current or committed) and comparing it to the last sent one
+        when skip_unchanged is set (see vgamepad.metrics)
+    pack: reading the report fields and converting them into what the OS expects (e.g. evdev events on Linux)
+    write: sending to the OS (e.g. send_events on Linux, vigem_target_*_update on Windows), including the syscalls
+    total: the whole update() call
+"""
+
+import itertools
+import weakref
+from time import perf_counter_ns
+
+
+ENABLED = False
+
+NB_BUCKETS = 64  # bucket i counts durations d such that 2 ** (i - 1) < d <= 2 ** i nanoseconds (0 in bucket 0)
+OVERFLOW = NB_BUCKETS - 1  # the last bucket counts the durations larger than 2 ** (NB_BUCKETS - 2) ns
+
+_pads = weakref.WeakKeyDictionary()  # gamepad -> (label, {stage: Histogram})
+_pad_counter = itertools.count()
+
+
+class Histogram:
+    """
+    Histogram of durations in nanoseconds, with power-of-two buckets
+    """
+
+    __slots__ = ('count', 'sum', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * NB_BUCKETS
+
+    def record(self, duration_ns):
+        self.count += 1
+        self.sum += duration_ns
+        if self.min is None or duration_ns < self.min:
+            self.min = duration_ns
+        if self.max is None or duration_ns > self.max:
+            self.max = duration_ns
+        self.buckets[min(max(duration_ns - 1, 0).bit_length(), OVERFLOW)] += 1
+
+    def to_dict(self):
+        """
+        :return: dictionary with count, sum_ns, min_ns, max_ns, and non-empty buckets
+            {inclusive upper bound in ns (inf for the overflow bucket): count}
+        """
+        return {
+            'count': self.count,
+            'sum_ns': self.sum,
+            'min_ns': self.min,
+            'max_ns': self.max,
+            'buckets': {(2 ** i if i < OVERFLOW else float('inf')): c for i, c in enumerate(self.buckets) if c},
+        }
+
+
+def enable():
+    """
+    Starts timing update() calls
+    """
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    """
+    Stops timing update() calls (recorded histograms are kept)
+    """
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    """
+    Forgets all recorded histograms
+    """
+    _pads.clear()
+
+
+def _stages(gamepad):
+    entry = _pads.get(gamepad)
+    if entry is None:
+        entry = (f"{type(gamepad).__name__}_{next(_pad_counter)}", {})
+        _pads[gamepad] = entry
+    return entry[1]
+
+
+def record(gamepad, stage, duration_ns):
+    """
+    Records the duration of a stage for a gamepad
+
+    :param gamepad: the timed gamepad
+    :param stage: name of the stage (e.g. 'write')
+    :param duration_ns: duration in nanoseconds
+    """
+    stages = _stages(gamepad)
+    h = stages.get(stage)
+    if h is None:
+        h = stages[stage] = Histogram()
+    h.record(duration_ns)
+
+
+def timed_update(gamepad, report=None):
+    """
+    Performs and times the stages of gamepad.update()
+
+    :param gamepad: the updated gamepad
+    :param report: report to send instead of the current report of the gamepad
+    :return: the value returned by the write stage (None if the update was skipped)
+    """
+    t0 = perf_counter_ns()
+    state = gamepad._read(report)
+    skipped = gamepad._skip(state)
+    t1 = perf_counter_ns()
+    record(gamepad, 'skip', t1 - t0)
+    if skipped:
+        record(gamepad, 'total', t1 - t0)
+        return None
+    data = gamepad._pack(state)
+    t2 = perf_counter_ns()
+    result = gamepad._write(data)
+    t3 = perf_counter_ns()
+    record(gamepad, 'pack', t2 - t1)
+    record(gamepad, 'write', t3 - t2)
+    record(gamepad, 'total', t3 - t0)
+    return result
+
+
+def snapshot():
+    """
+    :return: dictionary {gamepad label: {stage: Histogram.to_dict()}}
+    """
+    return {label: {stage: h.to_dict() for stage, h in stages.items()} for label, stages in list(_pads.values())}
+
+
+def prometheus_text():
+    """
+    :return: the recorded histograms in the Prometheus text exposition format
+    """
+    name = 'vgamepad_update_stage_seconds'
+    lines = [f"# HELP {name} Duration of the stages of update().",
+             f"# TYPE {name} histogram"]
+    for label, stages in list(_pads.values()):
+        for stage, h in stages.items():
+            labels = f'pad="{label}",stage="{stage}"'
+            cumulated = 0
+            last = max((i for i, c in enumerate(h.buckets[:OVERFLOW]) if c), default=0)
+            for i in range(last + 1):  # the overflow bucket is only in +Inf
+                cumulated += h.buckets[i]
+                lines.append(f'{name}_bucket{{{labels},le="{2 ** i / 1e9:g}"}} {cumulated}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f'{name}_sum{{{labels}}} {h.sum / 1e9:g}')
+            lines.append(f'{name}_count{{{labels}}} {h.count}')
+    return "\n".join(lines) + "\n"
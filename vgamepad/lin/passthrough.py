@@ -0,0 +1,327 @@
+"""
+Physical-to-virtual controller passthrough (Linux)
+
+A Passthrough reads the events of an evdev device (/dev/input/eventN, e.g. a physical controller) with epoll,
+translates them into the report of a VX360Gamepad through a RemapTable, and sends the report once per SYN_REPORT,
+i.e. with one batched write of the virtual device per input frame:
+    table = RemapTable(buttons={BTN_SOUTH: XUSB_BUTTON.XUSB_GAMEPAD_B, BTN_EAST: XUSB_BUTTON.XUSB_GAMEPAD_A},
+                       axes={ABS_Y: ('sThumbLY', True, 1.0)})  # swaps A and B, inverts the left joystick Y axis
+    passthrough = Passthrough('/dev/input/event5', VX360Gamepad(), table, grab=True)
+    passthrough.start()
+
+The events are read as raw struct input_event, without libevdev. The table is compiled once, when the source
+is opened, into dictionaries giving for each event code a button mask, or the coefficients (a, b) of the linear map
+value = a * raw + b of an axis, computed from the range of the source axis (EVIOCGABS) and of the report field.
+"""
+
+import errno
+import fcntl
+import os
+import select
+import struct
+import threading
+
+import vgamepad.win.vigem_commons as vcom
+
+
+INPUT_EVENT = struct.Struct('llHHi')  # struct input_event: seconds, microseconds, type, code, value
+ABSINFO = struct.Struct('6i')  # struct input_absinfo: value, minimum, maximum, fuzz, flat, resolution
+
+# From linux/input-event-codes.h
+EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+SYN_REPORT, SYN_DROPPED = 0, 3
+BTN_SOUTH, BTN_EAST, BTN_NORTH, BTN_WEST = 0x130, 0x131, 0x133, 0x134
+BTN_TL, BTN_TR, BTN_SELECT, BTN_START, BTN_MODE, BTN_THUMBL, BTN_THUMBR = 0x136, 0x137, 0x13a, 0x13b, 0x13c, 0x13d, 0x13e
+ABS_X, ABS_Y, ABS_Z, ABS_RX, ABS_RY, ABS_RZ = 0x00, 0x01, 0x02, 0x03, 0x04, 0x05
+ABS_HAT0X, ABS_HAT0Y = 0x10, 0x11
+
+
+def EVIOCGABS(axis):
+    return (2 << 30) | (ABSINFO.size << 16) | (ord('E') << 8) | (0x40 + axis)  # _IOR('E', 0x40 + axis, absinfo)
+
+
+def EVIOCGKEY(length):
+    return (2 << 30) | (length << 16) | (ord('E') << 8) | 0x18  # _IOR('E', 0x18, char[length])
+
+
+KEY_BITS_SIZE = 0x300 // 8  # (KEY_MAX + 1) / 8
+EVIOCGRAB = (1 << 30) | (struct.calcsize('i') << 16) | (ord('E') << 8) | 0x90  # _IOW('E', 0x90, int)
+
+FIELD_RANGES = {
+    'sThumbLX': (-32768, 32767),
+    'sThumbLY': (-32768, 32767),
+    'sThumbRX': (-32768, 32767),
+    'sThumbRY': (-32768, 32767),
+    'bLeftTrigger': (0, 255),
+    'bRightTrigger': (0, 255),
+}
+
+# Inverse of the mapping of the uinput backend (vgamepad.lin.virtual_gamepad)
+DEFAULT_BUTTONS = {
+    BTN_SOUTH: vcom.XUSB_BUTTON.XUSB_GAMEPAD_A,
+    BTN_EAST: vcom.XUSB_BUTTON.XUSB_GAMEPAD_B,
+    BTN_NORTH: vcom.XUSB_BUTTON.XUSB_GAMEPAD_X,
+    BTN_WEST: vcom.XUSB_BUTTON.XUSB_GAMEPAD_Y,
+    BTN_TL: vcom.XUSB_BUTTON.XUSB_GAMEPAD_LEFT_SHOULDER,
+    BTN_TR: vcom.XUSB_BUTTON.XUSB_GAMEPAD_RIGHT_SHOULDER,
+    BTN_SELECT: vcom.XUSB_BUTTON.XUSB_GAMEPAD_BACK,
+    BTN_START: vcom.XUSB_BUTTON.XUSB_GAMEPAD_START,
+    BTN_MODE: vcom.XUSB_BUTTON.XUSB_GAMEPAD_GUIDE,
+    BTN_THUMBL: vcom.XUSB_BUTTON.XUSB_GAMEPAD_LEFT_THUMB,
+    BTN_THUMBR: vcom.XUSB_BUTTON.XUSB_GAMEPAD_RIGHT_THUMB,
+}
+
+DEFAULT_AXES = {
+    ABS_X: ('sThumbLX', False, 1.0),
+    ABS_Y: ('sThumbLY', False, 1.0),
+    ABS_RX: ('sThumbRX', False, 1.0),
+    ABS_RY: ('sThumbRY', False, 1.0),
+    ABS_Z: ('bLeftTrigger', False, 1.0),
+    ABS_RZ: ('bRightTrigger', False, 1.0),
+}
+
+DEFAULT_HATS = {
+    ABS_HAT0X: (vcom.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_LEFT, vcom.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_RIGHT),
+    ABS_HAT0Y: (vcom.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_UP, vcom.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_DOWN),
+}
+
+
+def _code(code):
+    return getattr(code, 'value', code)  # libevdev codes are accepted as well
+
+
+class RemapTable:
+    """
+    Translation of evdev events into the fields of a XUSB_REPORT
+
+    Unmapped events are ignored. The default table is the inverse of the uinput backend of vgamepad.
+    Physical controllers often report Y axes pointing down: invert them to get XInput axes.
+    """
+
+    def __init__(self, buttons=None, axes=None, hats=None, ranges=None):
+        """
+        :param buttons: dict {EV_KEY code: XUSB_BUTTON} (None = DEFAULT_BUTTONS)
+        :param axes: dict {EV_ABS code: (report field, invert, scale)}, scale multiplying the value around
+            the center of the range of the field, e.g. 1.5 for more sensitive joysticks (None = DEFAULT_AXES)
+        :param hats: dict {EV_ABS code: (XUSB_BUTTON for negative values, XUSB_BUTTON for positive values)}
+            (None = DEFAULT_HATS)
+        :param ranges: dict {EV_ABS code: (minimum, maximum)} of the source axes
+            (None = ranges read from the source device)
+        """
+        self.buttons = {_code(c): b for c, b in (DEFAULT_BUTTONS if buttons is None else buttons).items()}
+        self.axes = {_code(c): a for c, a in (DEFAULT_AXES if axes is None else axes).items()}
+        self.hats = {_code(c): h for c, h in (DEFAULT_HATS if hats is None else hats).items()}
+        self.ranges = {_code(c): r for c, r in (ranges or {}).items()}
+        for field, _, _ in self.axes.values():
+            if field not in FIELD_RANGES:
+                raise ValueError(f"{field} is not an axis of XUSB_REPORT.")
+
+    def compile(self, fd=None):
+        """
+        :param fd: file descriptor of the source device, to read the ranges of its axes
+        :return: (keys, axes, hats): dict {EV_KEY code: button mask},
+            dict {EV_ABS code: (field, a, b, minimum, maximum)} such that field = clamp(round(a * raw + b)),
+            dict {EV_ABS code: (negative mask, positive mask)}
+        """
+        keys = {code: int(button) for code, button in self.buttons.items()}
+        hats = {code: (int(neg), int(pos)) for code, (neg, pos) in self.hats.items()}
+        axes = {}
+        for code, (field, invert, scale) in self.axes.items():
+            source_min, source_max = self.ranges[code] if code in self.ranges else _abs_range(fd, code)
+            lo, hi = FIELD_RANGES[field]
+            a = (hi - lo) / (source_max - source_min)
+            b = lo - source_min * a  # maps [source_min, source_max] to [lo, hi]
+            if invert:
+                a, b = -a, lo + hi - b
+            center = (lo + hi) / 2
+            axes[code] = (field, a * scale, (b - center) * scale + center, lo, hi)
+        return keys, axes, hats
+
+
+def _abs_range(fd, code):
+    if fd is None:
+        raise ValueError(f"The range of axis {code} is unknown: give it in RemapTable(ranges=...).")
+    try:
+        info = fcntl.ioctl(fd, EVIOCGABS(code), bytes(ABSINFO.size))
+    except OSError as e:
+        raise ValueError(f"Cannot read the range of axis {code} ({e}): give it in RemapTable(ranges=...).") from e
+    _, minimum, maximum, _, _, _ = ABSINFO.unpack(info)
+    return minimum, maximum
+
+
+class Passthrough:
+    """
+    Mirrors an evdev device into a VX360Gamepad
+    """
+
+    def __init__(self, source, gamepad, table=None, grab=False):
+        """
+        :param source: path of the evdev device (e.g. '/dev/input/event5'), or file descriptor of an input_event stream
+            (not closed by close())
+        :param gamepad: the VX360Gamepad
+        :param table: RemapTable (None = default table)
+        :param grab: if True, the events of the source are not delivered to other applications (EVIOCGRAB)
+        """
+        if isinstance(source, int):
+            self.fd = source
+            self._own_fd = False
+        else:
+            self.fd = os.open(source, os.O_RDONLY | os.O_NONBLOCK)
+            self._own_fd = True
+        self.gamepad = gamepad
+        self.table = RemapTable() if table is None else table
+        self.events = 0  # read events
+        self.reports = 0  # reports sent (one per SYN_REPORT)
+        self.dropped = 0  # SYN_DROPPED events (the events until the next SYN_REPORT are replaced by a resync)
+        self.error = None  # OSError that stopped the thread (e.g. ENODEV when the source is unplugged)
+        self._grabbed = False
+        self._buffer = b''
+        self._dropping = False
+        self._frame = None  # report being modified, until sent at the next SYN_REPORT (see VGamepad._frame())
+        self._thread = None
+        self._stop = threading.Event()
+        try:
+            os.set_blocking(self.fd, False)
+            self._keys, self._axes, self._hats = self.table.compile(self.fd)
+            if grab:
+                fcntl.ioctl(self.fd, EVIOCGRAB, 1)
+                self._grabbed = True
+        except Exception:
+            self.close()
+            raise
+        self._epoll = select.epoll()
+        self._epoll.register(self.fd, select.EPOLLIN)
+
+    def process(self, data):
+        """
+        Applies a block of raw input_event structures to the report, and sends it at each SYN_REPORT
+
+        :param data: bytes read from the source (an incomplete last event is kept for the next call)
+        :return: the number of sent reports
+        """
+        data = self._buffer + data
+        end = len(data) - len(data) % INPUT_EVENT.size
+        self._buffer = data[end:]
+        if self._frame is None:
+            self._frame = self.gamepad._frame()
+        report = self._frame
+        keys, axes, hats = self._keys, self._axes, self._hats
+        nb_reports = 0
+        for _, _, ev_type, code, value in INPUT_EVENT.iter_unpack(data[:end]):
+            if ev_type == EV_SYN:
+                if code == SYN_REPORT:
+                    if self._dropping:
+                        self._dropping = False
+                        self._resync(report)
+                    self._frame = None
+                    self.gamepad._update_report(report)
+                    nb_reports += 1
+                    report = self._frame = self.gamepad._frame()
+                elif code == SYN_DROPPED:
+                    self._dropping = True
+                    self.dropped += 1
+            elif self._dropping:
+                continue
+            elif ev_type == EV_KEY:
+                mask = keys.get(code)
+                if mask is not None:
+                    report.wButtons = report.wButtons | mask if value else report.wButtons & ~mask
+            elif ev_type == EV_ABS:
+                axis = axes.get(code)
+                if axis is not None:
+                    field, a, b, lo, hi = axis
+                    setattr(report, field, min(max(round(a * value + b), lo), hi))
+                    continue
+                hat = hats.get(code)
+                if hat is not None:
+                    neg, pos = hat
+                    buttons = report.wButtons & ~(neg | pos)
+                    report.wButtons = buttons | neg if value < 0 else buttons | pos if value > 0 else buttons
+        self.events += end // INPUT_EVENT.size
+        self.reports += nb_reports
+        return nb_reports
+
+    def _resync(self, report):
+        """
+        Reads the state of the source after events were dropped (no effect if the source is not an evdev device)
+
+        :param report: the report to modify
+        """
+        try:
+            key_bits = fcntl.ioctl(self.fd, EVIOCGKEY(KEY_BITS_SIZE), bytes(KEY_BITS_SIZE))
+            values = {code: ABSINFO.unpack(fcntl.ioctl(self.fd, EVIOCGABS(code), bytes(ABSINFO.size)))[0]
+                      for code in list(self._axes) + list(self._hats)}
+        except OSError:
+            return
+        buttons = report.wButtons
+        for code, mask in self._keys.items():
+            buttons = buttons | mask if key_bits[code // 8] >> (code % 8) & 1 else buttons & ~mask
+        for code, (neg, pos) in self._hats.items():
+            buttons &= ~(neg | pos)
+            buttons |= neg if values[code] < 0 else pos if values[code] > 0 else 0
+        report.wButtons = buttons
+        for code, (field, a, b, lo, hi) in self._axes.items():
+            setattr(report, field, min(max(round(a * values[code] + b), lo), hi))
+
+    def poll(self, timeout=None):
+        """
+        Waits for events of the source and processes all the available events
+
+        :param timeout: maximum time to wait in seconds (None = wait forever)
+        :return: the number of sent reports
+        """
+        if not self._epoll.poll(-1 if timeout is None else timeout):
+            return 0
+        nb_reports = 0
+        while True:
+            try:
+                data = os.read(self.fd, 64 * INPUT_EVENT.size)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            nb_reports += self.process(data)
+        return nb_reports
+
+    def start(self):
+        """
+        Processes the events of the source in a background thread
+        """
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll(0.1)
+            except OSError as e:
+                self.error = e  # e.g. ENODEV: the source is unplugged
+                return
+
+    def close(self):
+        """
+        Stops the background thread and releases the source (the gamepad is not closed)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if getattr(self, '_epoll', None) is not None:
+            self._epoll.close()
+            self._epoll = None
+        if self._grabbed:
+            try:
+                fcntl.ioctl(self.fd, EVIOCGRAB, 0)
+            except OSError as e:
+                if e.errno != errno.ENODEV:
+                    raise
+            self._grabbed = False
+        if self._own_fd and self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,139 @@
+"""
+Frame lockstep: reports change exactly at the frame boundaries of an emulator or simulator
+
+In lockstep mode (see VGamepad.enable_lockstep()), producers schedule the reports of the next frames ahead of time,
+and the emulator calls step(frame_no) at each frame boundary, which sends the report scheduled for this frame
+from the calling thread, without timers or sleeps:
+    gamepad.enable_lockstep(depth=4)
+    gamepad.schedule(frame_no + 1)  # copy of the current report, for frame frame_no + 1
+    ...
+    gamepad.step(frame_no + 1)  # emulator thread, at the start of frame frame_no + 1
+    gamepad.lockstep.confirm(frame_no + 1)  # when the game has read the inputs of the frame
+Frames without a scheduled report keep the report of the previous frame.
+"""
+
+import collections
+import threading
+
+
+class Lockstep:
+    """
+    Reports scheduled for the next frames of a gamepad
+    """
+
+    def __init__(self, gamepad, depth=8):
+        """
+        :param gamepad: the gamepad to which reports are sent
+        :param depth: maximum number of scheduled frames (schedule() waits when reached)
+        """
+        self.gamepad = gamepad
+        self.depth = depth
+        self.steps = 0  # step() calls
+        self.sent = 0  # frames sent by step()
+        self.held = 0  # steps without scheduled report
+        self.dropped = 0  # scheduled frames skipped by step() (frame numbers that were never stepped)
+        self.consumed = 0  # sent frames confirmed before the next step
+        self.unconsumed = 0  # sent frames not confirmed before the next step
+        self.frame_no = None  # last stepped frame
+        self._sent_frame = None  # last sent frame, until it is confirmed or the next step
+        self._pending = collections.deque()  # (frame number, report), increasing frame numbers
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def schedule(self, frame_no, frame, timeout=None):
+        """
+        :param frame_no: number of the frame, larger than the previously stepped and scheduled frames
+        :param frame: the report to send at this frame (copied)
+        :param timeout: maximum time to wait while depth frames are scheduled, in seconds (None = wait forever)
+        :return: True if the frame is scheduled, False if the timeout elapsed
+        """
+        frame = type(frame).from_buffer_copy(frame)
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or len(self._pending) < self.depth, timeout):
+                return False
+            if self._closed:
+                raise RuntimeError("Lockstep is disabled.")
+            last = self._pending[-1][0] if self._pending else self.frame_no
+            if last is not None and frame_no <= last:
+                raise ValueError(f"Frame {frame_no} is not after frame {last}.")
+            self._pending.append((frame_no, frame))
+        return True
+
+    def step(self, frame_no):
+        """
+        Sends the report scheduled for a frame, from the calling thread
+
+        Scheduled frames with a lower number are dropped.
+
+        :param frame_no: number of the frame that starts
+        :return: True if a report was sent, False if the frame keeps the report of the previous frame
+        """
+        frame = None
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Lockstep is disabled.")
+            if self.frame_no is not None and frame_no <= self.frame_no:
+                raise ValueError(f"Frame {frame_no} is not after frame {self.frame_no}.")
+            self.steps += 1
+            self.frame_no = frame_no
+            if self._sent_frame is not None:
+                self.unconsumed += 1
+                self._sent_frame = None
+            pending = self._pending
+            while pending and pending[0][0] < frame_no:
+                pending.popleft()
+                self.dropped += 1
+            if pending and pending[0][0] == frame_no:
+                frame = pending.popleft()[1]
+                self._sent_frame = frame_no
+            self._cond.notify_all()
+        if frame is None:
+            self.held += 1
+            return False
+        self.sent += 1
+        self.gamepad.update(frame)
+        return True
+
+    def confirm(self, frame_no):
+        """
+        Records that the game consumed the report of a frame (e.g. from the input callback of an emulator)
+
+        :param frame_no: number of the consumed frame
+        :return: True if this is the last sent frame, not confirmed yet
+        """
+        with self._cond:
+            if frame_no != self._sent_frame:
+                return False
+            self._sent_frame = None
+            self.consumed += 1
+            return True
+
+    def pending(self):
+        """
+        :return: the number of scheduled frames
+        """
+        with self._cond:
+            return len(self._pending)
+
+    def close(self):
+        """
+        Drops the scheduled frames (schedule() calls waiting for room raise RuntimeError)
+        """
+        with self._cond:
+            self._closed = True
+            self.dropped += len(self._pending)
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        :return: dict of the counters of the lockstep mode
+        """
+        return {
+            'steps': self.steps,
+            'sent': self.sent,
+            'held': self.held,
+            'dropped': self.dropped,
+            'consumed': self.consumed,
+            'unconsumed': self.unconsumed,
+        }
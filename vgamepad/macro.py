@@ -0,0 +1,363 @@
+"""
+Macros: frame-exact input sequences played on a gamepad
+
+A Macro is built from the setters of the gamepads, frame by frame:
+    macro = Macro(frame_rate=60.0)
+    macro.press(XUSB_BUTTON.XUSB_GAMEPAD_A).wait(3)
+    for x, y in ((0.0, -1.0), (0.7, -0.7), (1.0, 0.0)):  # quarter circle
+        macro.call('left_joystick_float', x, y).wait(1)
+    macro.release(XUSB_BUTTON.XUSB_GAMEPAD_A).call('left_joystick_float', 0.0, 0.0)
+
+It is compiled once per gamepad class into a timeline of (time offset, report delta) entries,
+a delta setting and clearing bits of the raw report. A MacroPlayer plays compiled macros on a gamepad,
+with one update() per timeline entry, from a thread that sleeps until shortly before each entry and spins
+for the rest of the time.
+
+Several macros can run on the same gamepad. Two macros conflict when they write the same bits of the report:
+a macro preempts the running macros it conflicts with if its priority is higher or equal, otherwise it is rejected.
+The bits of a preempted macro that the new macro does not write are reset to their default value.
+"""
+
+import ctypes
+import threading
+from array import array
+from time import perf_counter_ns
+
+
+SPIN_NS = 1000000  # the player spins during the last millisecond before an entry
+
+
+class _Scratch:
+    """
+    Stands for a gamepad when compiling: the setters of the gamepads only use self.report and other setters
+    """
+
+    __slots__ = ('report', 'gamepad_class')
+
+    def __init__(self, report, gamepad_class):
+        self.report = report
+        self.gamepad_class = gamepad_class
+
+    def __getattr__(self, name):
+        return getattr(self.gamepad_class, name).__get__(self)
+
+
+def _report_int(report):
+    return int.from_bytes(bytes(report), 'little')
+
+
+class CompiledMacro:
+    """
+    Timeline of a macro for a gamepad class
+    """
+
+    __slots__ = ('times', 'keeps', 'sets', 'resources', 'duration', 'size')
+
+    def __init__(self, times, keeps, sets, size):
+        """
+        :param times: array of time offsets of the entries, in nanoseconds
+        :param keeps: for each entry, mask of the report bits left unchanged (report as a little-endian integer)
+        :param sets: for each entry, bits set in the report (the other written bits are cleared)
+        :param size: size of the report in bytes
+        """
+        self.times = times
+        self.keeps = keeps
+        self.sets = sets
+        self.size = size
+        full = (1 << (8 * size)) - 1
+        resources = 0
+        for keep in keeps:
+            resources |= full & ~keep
+        self.resources = resources  # mask of the report bits written by the macro
+        self.duration = times[-1] if len(times) else 0
+
+
+class Macro:
+    """
+    Sequence of gamepad setter calls, on a frame grid
+    """
+
+    def __init__(self, frame_rate=60.0):
+        """
+        :param frame_rate: number of frames per second
+        """
+        self.frame_rate = frame_rate
+        self.frame = 0  # current frame of the builder
+        self.steps = []  # (frame, setter name, args, kwargs)
+        self._compiled = {}
+
+    def call(self, name, *args, **kwargs):
+        """
+        Calls a setter of the gamepad at the current frame
+
+        :param name: name of the setter, e.g. 'left_joystick_float' or 'directional_pad'
+        :return: self
+        """
+        self.steps.append((self.frame, name, args, kwargs))
+        self._compiled.clear()
+        return self
+
+    def press(self, button):
+        """
+        Presses a button at the current frame
+
+        :return: self
+        """
+        return self.call('press_button', button)
+
+    def release(self, button):
+        """
+        Releases a button at the current frame
+
+        :return: self
+        """
+        return self.call('release_button', button)
+
+    def wait(self, frames=1):
+        """
+        Moves the current frame forward (e.g. to hold buttons)
+
+        :return: self
+        """
+        self.frame += frames
+        return self
+
+    def tap(self, button, frames=1):
+        """
+        Presses a button during a number of frames
+
+        :return: self
+        """
+        return self.press(button).wait(frames).release(button)
+
+    def compile(self, gamepad_class):
+        """
+        :param gamepad_class: e.g. VX360Gamepad
+        :return: the CompiledMacro for this gamepad class (cached)
+        """
+        compiled = self._compiled.get(gamepad_class)
+        if compiled is None:
+            compiled = self._compiled[gamepad_class] = self._compile(gamepad_class)
+        return compiled
+
+    def _compile(self, gamepad_class):
+        report_type = type(gamepad_class.get_default_report(None))
+        size = ctypes.sizeof(report_type)
+        full = (1 << (8 * size)) - 1
+        frame_ns = 1e9 / self.frame_rate
+        times = array('q')
+        keeps = []
+        sets = []
+        steps = sorted(self.steps, key=lambda step: step[0])  # stable: same-frame calls keep their order
+        i = 0
+        while i < len(steps):
+            frame = steps[i][0]
+            # Each bit of the delta is found by applying the calls to a report of zeros and to a report of ones
+            zeros = _Scratch(report_type.from_buffer_copy(bytes(size)), gamepad_class)
+            ones = _Scratch(report_type.from_buffer_copy(b'\xff' * size), gamepad_class)
+            while i < len(steps) and steps[i][0] == frame:
+                _, name, args, kwargs = steps[i]
+                getattr(zeros, name)(*args, **kwargs)
+                getattr(ones, name)(*args, **kwargs)
+                i += 1
+            bits_set = _report_int(zeros.report)
+            bits_cleared = full & ~_report_int(ones.report)
+            times.append(round(frame * frame_ns))
+            keeps.append(full & ~(bits_set | bits_cleared))
+            sets.append(bits_set)
+        return CompiledMacro(times, tuple(keeps), tuple(sets), size)
+
+
+class MacroRun:
+    """
+    A macro being played (returned by MacroPlayer.play())
+    """
+
+    __slots__ = ('player', 'macro', 'priority', 'start', 'index', 'cancelled', 'done')
+
+    def __init__(self, player, macro, priority, start):
+        self.player = player
+        self.macro = macro
+        self.priority = priority
+        self.start = start  # perf_counter_ns() at time offset 0
+        self.index = 0  # next timeline entry
+        self.cancelled = False  # True if cancelled or preempted
+        self.done = threading.Event()
+
+    def next_time(self):
+        return self.start + self.macro.times[self.index]
+
+    def cancel(self):
+        """
+        Stops the macro (no effect if already done)
+        """
+        self.player.cancel(self)
+
+    def wait(self, timeout=None):
+        """
+        :param timeout: maximum time to wait in seconds (None = wait forever)
+        :return: True if the macro is done
+        """
+        return self.done.wait(timeout)
+
+
+class MacroPlayer:
+    """
+    Plays macros on a gamepad, in a background thread
+
+    Fields written by the running macros should not be modified by other means meanwhile.
+    """
+
+    def __init__(self, gamepad):
+        """
+        :param gamepad: the gamepad
+        """
+        self.gamepad = gamepad
+        self.errors = 0  # update() calls that raised
+        self._size = ctypes.sizeof(gamepad.report)
+        self._default = _report_int(gamepad.get_default_report())
+        self._runs = []
+        self._dirty = False  # the report was modified out of a timeline entry (preemption)
+        self._frame = None  # report being modified, until sent (see VGamepad._frame())
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def play(self, macro, priority=0, delay=0.0):
+        """
+        :param macro: a Macro, or a CompiledMacro for the class of the gamepad
+        :param priority: the macro preempts conflicting running macros with a lower or equal priority
+        :param delay: time before the first entry of the macro, in seconds
+        :return: a MacroRun, or None if a conflicting running macro has a higher priority
+        """
+        if isinstance(macro, Macro):
+            macro = macro.compile(type(self.gamepad))
+        if macro.size != self._size:
+            raise ValueError("The macro was not compiled for this type of gamepad.")
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The player is closed.")
+            conflicts = [run for run in self._runs if run.macro.resources & macro.resources]
+            if any(run.priority > priority for run in conflicts):
+                return None
+            for run in conflicts:
+                self._stop(run, macro.resources)
+            run = MacroRun(self, macro, priority, perf_counter_ns() + round(delay * 1e9))
+            if len(macro.times):
+                self._runs.append(run)
+            else:
+                run.done.set()
+            self._cond.notify()
+        return run
+
+    def cancel(self, run):
+        """
+        Stops a running macro and resets the bits it wrote to their default value (no effect if already done)
+        """
+        with self._cond:
+            if run in self._runs:
+                self._stop(run, 0)
+                self._cond.notify()
+
+    def _stop(self, run, kept_resources):
+        self._runs.remove(run)
+        run.cancelled = True
+        mask = run.macro.resources & ~kept_resources
+        if mask:
+            self._write((self._read() & ~mask) | (self._default & mask))
+            self._dirty = True
+        run.done.set()
+
+    def _report(self):
+        if self._frame is None:
+            self._frame = self.gamepad._frame()
+        return self._frame
+
+    def _read(self):
+        return _report_int(self._report())
+
+    def _write(self, value):
+        ctypes.memmove(ctypes.addressof(self._report()), value.to_bytes(self._size, 'little'), self._size)
+
+    def _send(self):
+        with self._cond:
+            frame, self._frame = self._frame, None
+        self.gamepad._update_report(frame)
+
+    def _run(self):
+        cond = self._cond
+        while True:
+            with cond:
+                while True:
+                    if self._closed:
+                        return
+                    if self._dirty:
+                        deadline = 0
+                        break
+                    if not self._runs:
+                        cond.wait()
+                        continue
+                    deadline = min(run.next_time() for run in self._runs)
+                    remaining = deadline - perf_counter_ns()
+                    if remaining <= SPIN_NS:
+                        break
+                    cond.wait((remaining - SPIN_NS) / 1e9)  # woken up early by play() and cancel()
+            while perf_counter_ns() < deadline:
+                pass
+            with cond:
+                finished = self._apply_due(perf_counter_ns())
+            try:
+                self._send()
+            except Exception:
+                self.errors += 1  # counted by the gamepad counters as well
+            for run in finished:
+                run.done.set()  # once its last entry is sent
+
+    def _apply_due(self, now):
+        """
+        Applies the entries due at time now
+
+        :return: the runs whose last entry was applied
+        """
+        value = self._read()
+        finished = []
+        for run in list(self._runs):
+            macro = run.macro
+            times, keeps, sets = macro.times, macro.keeps, macro.sets
+            i = run.index
+            while i < len(times) and run.start + times[i] <= now:
+                value = (value & keeps[i]) | sets[i]
+                i += 1
+            run.index = i
+            if i == len(times):
+                self._runs.remove(run)
+                finished.append(run)
+        self._write(value)
+        self._dirty = False
+        return finished
+
+    def close(self):
+        """
+        Cancels the running macros and stops the player (the gamepad is not closed)
+        """
+        with self._cond:
+            if self._closed:
+                return
+            for run in list(self._runs):
+                self._stop(run, 0)
+        if self._dirty:
+            try:
+                self._send()
+            except Exception:
+                self.errors += 1
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,272 @@
+"""
+Input merging: several sources (human, bot, macro...) controlling one gamepad
+
+Each source of an InputMerger holds a partial report: the fields it sets. The merged report is computed field by field,
+with a policy per field, from the values of the sources that set this field, ordered by decreasing priority:
+    'override': the value of the source with the highest priority (ties: the source added first)
+    'or': bitwise OR of the values (buttons)
+    'max', 'min': largest or smallest value (e.g. 'max' for triggers)
+    'max_deflection': value farthest from the neutral position (joysticks)
+A field set by no source keeps its default value. A policy can also be a function of the list of values.
+    merger = InputMerger(gamepad)
+    human = merger.source('human')
+    bot = merger.source('bot', priority=10)
+    human.press_button(XUSB_BUTTON.XUSB_GAMEPAD_A)
+    bot.set(sThumbLX=20000, bRightTrigger=255)
+    merger.start(rate=250.0)  # or merger.flush() once per tick
+
+The merged report is updated incrementally: a change of a source only recomputes the fields it changed,
+and flush() sends the merged report once per tick, only if it changed.
+"""
+
+import ctypes
+import functools
+import operator
+import threading
+from time import perf_counter, sleep
+
+import vgamepad.win.vigem_commons as vcom
+
+
+def _override(values):
+    return values[0]
+
+
+def _or(values):
+    return functools.reduce(operator.or_, values)
+
+
+def _max_deflection(neutral):
+    def merge(values):
+        return max(values, key=lambda v: abs(v - neutral))
+    return merge
+
+
+def _ds4_buttons(values):
+    """
+    OR of the buttons, and directional pad of the first source that does not leave it neutral
+    """
+    dpad = next((v & 0xF for v in values if v & 0xF != vcom.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_NONE),
+                vcom.DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_NONE)
+    return (_or(values) & ~0xF) | dpad
+
+
+POLICIES = {
+    'override': _override,
+    'or': _or,
+    'max': max,
+    'min': min,
+}
+
+DEFAULT_POLICIES = {
+    vcom.XUSB_REPORT: {
+        'wButtons': 'or',
+        'bLeftTrigger': 'max',
+        'bRightTrigger': 'max',
+        'sThumbLX': 'override',
+        'sThumbLY': 'override',
+        'sThumbRX': 'override',
+        'sThumbRY': 'override',
+    },
+    vcom.DS4_REPORT: {
+        'wButtons': _ds4_buttons,
+        'bSpecial': 'or',
+        'bTriggerL': 'max',
+        'bTriggerR': 'max',
+        'bThumbLX': 'override',
+        'bThumbLY': 'override',
+        'bThumbRX': 'override',
+        'bThumbRY': 'override',
+    },
+}
+
+
+class Source:
+    """
+    Partial report of a source of an InputMerger (returned by InputMerger.source())
+    """
+
+    def __init__(self, merger, name, priority, order):
+        self.merger = merger
+        self.name = name
+        self.priority = priority
+        self.order = order
+        self.values = {}  # field -> value set by the source
+
+    def set(self, **fields):
+        """
+        Sets fields of the report, e.g. source.set(sThumbLX=20000, bLeftTrigger=255)
+        """
+        self.merger._set(self, fields)
+
+    def clear(self, *fields):
+        """
+        Stops setting fields (all fields if none is given)
+        """
+        self.merger._clear(self, fields or tuple(self.values))
+
+    def press_button(self, button):
+        """
+        Presses a button (XUSB_BUTTON or DS4_BUTTONS), the source then sets the buttons field
+        """
+        self.merger._update_buttons(self, 'wButtons', button, True)
+
+    def release_button(self, button):
+        """
+        Releases a button (the source still sets the buttons field, see clear())
+        """
+        self.merger._update_buttons(self, 'wButtons', button, False)
+
+    def press_special_button(self, special_button):
+        """
+        Presses a DS4_SPECIAL_BUTTONS (DualShock 4)
+        """
+        self.merger._update_buttons(self, 'bSpecial', special_button, True)
+
+    def release_special_button(self, special_button):
+        """
+        Releases a DS4_SPECIAL_BUTTONS (DualShock 4)
+        """
+        self.merger._update_buttons(self, 'bSpecial', special_button, False)
+
+
+class InputMerger:
+    """
+    Merges the partial reports of several sources into the report of a gamepad
+    """
+
+    def __init__(self, gamepad, policies=None):
+        """
+        :param gamepad: the gamepad (its report is overwritten by flush())
+        :param policies: dict {field: policy name or function}, overriding the default policies
+        """
+        self.gamepad = gamepad
+        self.report_type = type(gamepad.report)
+        self.default = gamepad.get_default_report()
+        self.merged = self.report_type.from_buffer_copy(self.default)
+        self.policies = {}
+        for field, policy in dict(DEFAULT_POLICIES[self.report_type], **(policies or {})).items():
+            self.policies[field] = self._policy(policy)
+        self.sources = []  # by decreasing priority
+        self.flushes = 0  # reports sent by flush()
+        self.errors = 0  # update() calls of the background thread that raised
+        self._nb_sources = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _policy(self, policy):
+        if callable(policy):
+            return policy
+        if policy == 'max_deflection':
+            return _max_deflection(128 if self.report_type is vcom.DS4_REPORT else 0)
+        return POLICIES[policy]
+
+    def source(self, name, priority=0):
+        """
+        :param name: name of the source (for debugging)
+        :param priority: sources with a higher priority come first in the policies
+        :return: a new Source
+        """
+        with self._lock:
+            source = Source(self, name, priority, self._nb_sources)
+            self._nb_sources += 1
+            self.sources.append(source)
+            self.sources.sort(key=lambda s: (-s.priority, s.order))
+            return source
+
+    def remove(self, source):
+        """
+        Removes a source and the fields it sets
+        """
+        with self._lock:
+            self.sources.remove(source)
+            fields, source.values = tuple(source.values), {}
+            self._merge(fields)
+
+    def _set(self, source, fields):
+        with self._lock:
+            for field in fields:
+                if field not in self.policies:
+                    raise KeyError(f"{field} is not a field of {self.report_type.__name__}.")
+            source.values.update(fields)
+            self._merge(fields)
+
+    def _clear(self, source, fields):
+        with self._lock:
+            for field in fields:
+                source.values.pop(field, None)
+            self._merge(fields)
+
+    def _update_buttons(self, source, field, button, pressed):
+        with self._lock:
+            value = source.values.get(field, getattr(self.default, field))
+            source.values[field] = value | button if pressed else value & ~button
+            self._merge((field, ))
+
+    def _merge(self, fields):
+        """
+        Recomputes fields of the merged report (with the lock)
+        """
+        for field in fields:
+            values = [s.values[field] for s in self.sources if field in s.values]
+            value = self.policies[field](values) if values else getattr(self.default, field)
+            if value != getattr(self.merged, field):
+                setattr(self.merged, field, value)
+                self._dirty = True
+
+    def flush(self):
+        """
+        Copies the merged report to the gamepad and sends it, if it changed since the last flush
+
+        :return: True if the report was sent
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            self._dirty = False
+            frame = self.gamepad._frame()
+            ctypes.memmove(ctypes.addressof(frame), ctypes.addressof(self.merged), ctypes.sizeof(self.merged))
+        self.gamepad._update_report(frame)
+        self.flushes += 1
+        return True
+
+    def start(self, rate=250.0):
+        """
+        Calls flush() at a fixed rate, in a background thread
+
+        :param rate: number of ticks per second
+        """
+        self._thread = threading.Thread(target=self._run, args=(1.0 / rate, ), daemon=True)
+        self._thread.start()
+
+    def _run(self, period):
+        next_time = perf_counter()
+        while not self._stop.is_set():
+            try:
+                self.flush()
+            except Exception:
+                self.errors += 1  # counted by the gamepad counters as well
+            next_time += period
+            delay = next_time - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            else:
+                next_time = perf_counter()  # late: no burst of ticks
+
+    def close(self):
+        """
+        Stops the background thread and sends the last changes (the gamepad is not closed)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
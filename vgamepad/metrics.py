@@ -0,0 +1,76 @@
+"""
+Monotonic counters of gamepad activity
+
+Each gamepad owns a Counters object, incremented without locking on the hot path
+(increments from several threads updating the same gamepad may occasionally be lost).
+gamepad.stats() returns a snapshot of its counters, process_stats() sums them over the whole process.
+"""
+
+import vgamepad.registry as registry
+
+
+class Counters:
+    """
+    Counters of a single gamepad
+    """
+
+    __slots__ = ('updates', 'writes', 'bytes', 'skipped', 'notifications', 'errors')
+
+    def __init__(self):
+        self.updates = 0  # update() calls
+        self.writes = 0  # evdev events (Linux) or reports (Windows) written
+        self.bytes = 0  # bytes written
+        self.skipped = 0  # update() calls skipped because the report was unchanged
+        self.notifications = 0  # feedback notifications received
+        self.errors = {}  # error name (e.g. VIGEM_ERROR_BUS_NOT_FOUND) -> count
+
+    def error(self, name):
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def add(self, other):
+        """
+        Adds the counts of another Counters object to this one
+        """
+        self.updates += other.updates
+        self.writes += other.writes
+        self.bytes += other.bytes
+        self.skipped += other.skipped
+        self.notifications += other.notifications
+        for name, count in list(other.errors.items()):
+            self.errors[name] = self.errors.get(name, 0) + count
+
+    def snapshot(self):
+        """
+        :return: a dictionary copy of the counters
+        """
+        return {
+            'updates': self.updates,
+            'writes': self.writes,
+            'bytes': self.bytes,
+            'skipped': self.skipped,
+            'notifications': self.notifications,
+            'errors': dict(self.errors),
+        }
+
+
+_retired = Counters()  # counts of the closed gamepads
+
+
+def retire(counters):
+    """
+    Keeps the counts of a closed gamepad in the process-wide totals
+
+    :param counters: the Counters of the closed gamepad
+    """
+    _retired.add(counters)
+
+
+def process_stats():
+    """
+    :return: snapshot of the counters summed over all gamepads of the process, open or closed
+    """
+    total = Counters()
+    total.add(_retired)
+    for gamepad in registry.live_gamepads():
+        total.add(gamepad.counters)
+    return total.snapshot()
@@ -0,0 +1,155 @@
+"""
+Bulk creation of virtual gamepads
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def create_many(gamepad_class, n, workers=8):
+    """
+    Creates n virtual gamepads concurrently
+
+    Device creation mostly waits for the OS (the underlying ctypes calls release the GIL),
+    so creating gamepads in a pool of threads is much faster than creating them one by one.
+    If any creation fails, the gamepads created so far are destroyed and the exception is raised.
+
+    :param gamepad_class: class (or callable without arguments) of the gamepads, e.g. VX360Gamepad
+    :param n: number of gamepads to create
+    :param workers: number of threads creating gamepads concurrently
+    :return: the list of created gamepads (always in the same order as their creation calls)
+    """
+    gamepads = [None] * n
+    errors = []
+    failed = threading.Event()
+
+    def create(i):
+        if failed.is_set():
+            return  # do not start new creations after a failure
+        try:
+            gamepads[i] = gamepad_class()
+        except Exception as e:
+            errors.append((i, e))
+            failed.set()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, n))) as executor:
+        executor.map(create, range(n))
+    # All creations are finished when the executor is shut down
+    if errors:
+        for gamepad in gamepads:
+            if gamepad is not None:
+                gamepad.close()
+        raise min(errors, key=lambda ie: ie[0])[1]
+    return gamepads
+
+
+class GamepadPool:
+    """
+    Pool of virtual gamepads created ahead of time in a background thread
+
+    Creating a virtual device is slow (tens to hundreds of ms), because the OS has to plug it in.
+    The pool creates its gamepads in the background, so that acquire() does not block on device creation.
+    """
+
+    def __init__(self, gamepad_class, size):
+        """
+        :param gamepad_class: class (or callable without arguments) of the gamepads, e.g. VX360Gamepad
+        :param size: total number of gamepads managed by the pool
+        """
+        assert size > 0, "The size of the pool must be positive."
+        self.gamepad_class = gamepad_class
+        self.size = size
+        self._idle = queue.LifoQueue()  # most recently released gamepads are reused first
+        self._acquired = set()  # gamepads returned by acquire() and not released yet
+        self._defaults = {}  # gamepad -> (skip_unchanged, supervisor) when created
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        for _ in range(self.size):
+            if self._closed.is_set():
+                return
+            try:
+                gamepad = self.gamepad_class()
+            except Exception as e:
+                self._idle.put(e)  # re-raised by acquire()
+                return
+            self._defaults[gamepad] = (gamepad.skip_unchanged, gamepad.supervisor)
+            self._idle.put(gamepad)
+
+    def acquire(self, timeout=None):
+        """
+        Takes an idle gamepad from the pool
+
+        Blocks until a gamepad is available (i.e. created or released)
+
+        :param timeout: maximum time to wait in seconds (None = wait forever)
+        :return: a gamepad in its default state
+        """
+        if self._closed.is_set():
+            raise RuntimeError("The pool is closed.")
+        try:
+            gamepad = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No idle gamepad available after {timeout} s.")
+        if isinstance(gamepad, Exception):
+            self._idle.put(gamepad)  # all waiters see the creation failure
+            raise RuntimeError("The pool could not create a gamepad.") from gamepad
+        with self._lock:
+            self._acquired.add(gamepad)
+        return gamepad
+
+    def release(self, gamepad):
+        """
+        Resets a gamepad to its default state and gives it back to the pool
+
+        The state of the session of the previous owner is dropped: notification callback, coalescing, lockstep,
+        committed frame, skip_unchanged and supervisor.
+
+        :param gamepad: a gamepad previously returned by acquire(), and not released yet
+        """
+        with self._lock:
+            if gamepad not in self._acquired:
+                raise ValueError("The gamepad was not acquired from this pool, or is already released.")
+            self._acquired.remove(gamepad)
+        try:
+            gamepad.unregister_notification()
+        except NotImplementedError:
+            pass  # the backend has no notifications, so none is registered
+        gamepad.disable_coalescing()
+        gamepad.disable_lockstep()
+        gamepad.uncommit()
+        gamepad.skip_unchanged, gamepad.supervisor = self._defaults[gamepad]
+        gamepad.reset()
+        gamepad.update()
+        if self._closed.is_set():
+            self._defaults.pop(gamepad, None)
+            gamepad.close()
+            return
+        self._idle.put(gamepad)
+
+    def close(self):
+        """
+        Destroys the idle gamepads and stops creating new ones
+
+        Gamepads that are still acquired are destroyed when released.
+        """
+        self._closed.set()
+        self._thread.join()
+        while True:
+            try:
+                gamepad = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(gamepad, Exception):
+                self._defaults.pop(gamepad, None)
+                gamepad.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
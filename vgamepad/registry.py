@@ -0,0 +1,59 @@
+"""
+Registry of the live virtual gamepads
+
+All gamepads that are still open are closed at interpreter exit, before the objects they rely on
+(e.g. the ViGEmBus connection) are garbage collected in an arbitrary order.
+"""
+
+import atexit
+import weakref
+
+
+_gamepads = weakref.WeakSet()
+_finalizers = []
+
+
+def register(gamepad):
+    """
+    :param gamepad: a newly created gamepad, to be closed at exit if still open
+    """
+    _gamepads.add(gamepad)
+
+
+def unregister(gamepad):
+    """
+    :param gamepad: a closed gamepad
+    """
+    _gamepads.discard(gamepad)
+
+
+def live_gamepads():
+    """
+    :return: the list of gamepads that are still open
+    """
+    return list(_gamepads)
+
+
+def register_finalizer(func):
+    """
+    Registers a function to be called at exit, after all gamepads are closed
+
+    Finalizers are called in reverse registration order.
+
+    :param func: a function without arguments
+    """
+    _finalizers.append(func)
+
+
+@atexit.register
+def close_all():
+    """
+    Closes all live gamepads, then calls the registered finalizers
+    """
+    for gamepad in live_gamepads():
+        try:
+            gamepad.close()
+        except Exception:
+            pass  # nothing sensible to do at exit
+    while _finalizers:
+        _finalizers.pop()()
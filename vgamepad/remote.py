@@ -0,0 +1,357 @@
+"""
+Remote gamepads over UDP or TCP
+
+A RemoteServer hosts gamepads and applies the reports it receives from remote controllers.
+A remote controller is a normal gamepad whose backend is a RemoteBackend:
+    # on the game host
+    server = RemoteServer({0: VX360Gamepad()}, address=('0.0.0.0', 5555))
+    # elsewhere
+    gamepad = VX360Gamepad(backend=RemoteBackend(('game-host', 5555), pad_id=0))
+    gamepad.press_button(button=XUSB_BUTTON.XUSB_GAMEPAD_A)
+    gamepad.update()  # sends one frame
+
+Wire protocol (little endian):
+    frame (controller to server): FRAME_HEADER (pad id, target type, sequence number), then the raw report
+        (XUSB_REPORT or DS4_REPORT bytes, the size is given by the target type)
+    feedback (server to controller): FEEDBACK (pad id, large motor, small motor, led number)
+Over UDP, each datagram holds exactly one frame. Over TCP, frames are sent back to back.
+
+Frames older than the last frame applied to a pad (by sequence number, modulo 2**32) are dropped,
+so reordered UDP datagrams never roll a pad back to a previous state.
+"""
+
+import ctypes
+import errno
+import os
+import select
+import selectors
+import socket
+import struct
+import threading
+
+import vgamepad.win.vigem_commons as vcom
+from vgamepad.backend import Backend
+
+
+FRAME_HEADER = struct.Struct('<HBI')  # pad id, VIGEM_TARGET_TYPE, sequence number
+FEEDBACK = struct.Struct('<HBBB')  # pad id, large motor, small motor, led number
+
+REPORT_SIZES = {
+    int(vcom.VIGEM_TARGET_TYPE.Xbox360Wired): ctypes.sizeof(vcom.XUSB_REPORT),
+    int(vcom.VIGEM_TARGET_TYPE.DualShock4Wired): ctypes.sizeof(vcom.DS4_REPORT),
+}
+
+SEQ_MASK = 0xFFFFFFFF
+_SEQ_HALF = 0x80000000
+
+
+def is_newer(seq, last_seq):
+    """
+    :param seq: sequence number of a received frame
+    :param last_seq: sequence number of the last applied frame (None if no frame was applied)
+    :return: True if seq is after last_seq, modulo 2**32
+    """
+    return last_seq is None or 0 < ((seq - last_seq) & SEQ_MASK) < _SEQ_HALF
+
+
+def _socket_type(protocol):
+    if protocol == 'udp':
+        return socket.SOCK_DGRAM
+    if protocol == 'tcp':
+        return socket.SOCK_STREAM
+    raise ValueError(f"Unknown protocol: {protocol}. Expected 'udp' or 'tcp'.")
+
+
+class RemoteServer:
+    """
+    Serves gamepads to remote controllers, in a background thread
+
+    Feedback (rumble, LEDs) of a pad is sent to the controller that sent the last applied frame of this pad.
+    """
+
+    def __init__(self, gamepads, address=('127.0.0.1', 0), protocol='udp', feedback=True):
+        """
+        :param gamepads: dict {pad id: gamepad}, or sequence of gamepads (pad id = index); pad ids are in [0, 65535]
+        :param address: (host, port) to listen on (port 0 = any free port, see self.address)
+        :param protocol: 'udp' or 'tcp'
+        :param feedback: if True, feedback notifications of the gamepads are sent to the controllers
+        """
+        if not isinstance(gamepads, dict):
+            gamepads = dict(enumerate(gamepads))
+        self.gamepads = gamepads
+        self.protocol = protocol
+        self.frames = 0  # applied frames
+        self.stale_frames = 0  # frames dropped because a newer frame was already applied
+        self.invalid_frames = 0  # frames dropped because of an unknown pad id, a wrong type or a wrong size
+        self.errors = 0  # frames whose update() raised
+        self._pad_sizes = {pad_id: ctypes.sizeof(g.report) for pad_id, g in gamepads.items()}
+        self._pad_types = {pad_id: int(g.target_type()) for pad_id, g in gamepads.items()}
+        self._last_seq = {}  # pad id -> sequence number of the last applied frame
+        self._peers = {}  # pad id -> UDP address or TCP connection of the controller
+        self._feedback_lock = threading.Lock()
+        self._notifying = []
+        self._stop = threading.Event()
+        self._sock = socket.socket(socket.AF_INET, _socket_type(protocol))
+        try:
+            if protocol == 'tcp':
+                self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._sock.bind(address)
+            if protocol == 'tcp':
+                self._sock.listen()
+        except OSError:
+            self._sock.close()
+            raise
+        self.address = self._sock.getsockname()
+        if feedback:
+            for pad_id, g in gamepads.items():
+                try:
+                    g.register_notification(self._feedback_callback(pad_id))
+                except NotImplementedError:
+                    continue  # e.g. uinput
+                self._notifying.append(g)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops the server (the gamepads are not closed)
+        """
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            for g in self._notifying:
+                g.unregister_notification()
+            self._notifying.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def stats(self):
+        """
+        :return: dict of the frame counters of the server
+        """
+        return {
+            'frames': self.frames,
+            'stale_frames': self.stale_frames,
+            'invalid_frames': self.invalid_frames,
+            'errors': self.errors,
+        }
+
+    def _feedback_callback(self, pad_id):
+        def callback(client, target, large_motor, small_motor, led_number, user_data):
+            self._send_feedback(pad_id, large_motor, small_motor, led_number)
+        return callback
+
+    def _send_feedback(self, pad_id, large_motor, small_motor, led_number):
+        peer = self._peers.get(pad_id)
+        if peer is None:
+            return
+        data = FEEDBACK.pack(pad_id, large_motor & 0xFF, small_motor & 0xFF, led_number & 0xFF)
+        with self._feedback_lock:  # called by the notification thread of the backend
+            try:
+                if self.protocol == 'udp':
+                    self._sock.sendto(data, peer)
+                else:
+                    peer.sendall(data)
+            except OSError:
+                pass  # the controller is gone, it gets feedback again when it sends a new frame
+
+    def _apply(self, data, offset, peer):
+        """
+        Applies the frame at data[offset:]
+
+        :return: the size of the frame, or None if data[offset:] holds an incomplete frame
+        """
+        if len(data) - offset < FRAME_HEADER.size:
+            return None
+        pad_id, target_type, seq = FRAME_HEADER.unpack_from(data, offset)
+        report_size = REPORT_SIZES.get(target_type)
+        if report_size is None:
+            raise ValueError(f"Invalid target type: {target_type}")  # the stream cannot be resynchronized
+        frame_size = FRAME_HEADER.size + report_size
+        if len(data) - offset < frame_size:
+            return None
+        g = self.gamepads.get(pad_id)
+        if g is None or self._pad_types[pad_id] != target_type or self._pad_sizes[pad_id] != report_size:
+            self.invalid_frames += 1
+            return frame_size
+        if self._peers.get(pad_id) != peer:
+            self._peers[pad_id] = peer
+            self._last_seq.pop(pad_id, None)  # new controller: new sequence
+        if not is_newer(seq, self._last_seq.get(pad_id)):
+            self.stale_frames += 1
+            return frame_size
+        self._last_seq[pad_id] = seq
+        frame = g._frame()
+        ctypes.memmove(ctypes.addressof(frame), bytes(data[offset + FRAME_HEADER.size:offset + frame_size]),
+                       report_size)
+        try:
+            g._update_report(frame)
+        except Exception:
+            self.errors += 1
+            return frame_size
+        self.frames += 1
+        return frame_size
+
+    def _serve(self):
+        with selectors.DefaultSelector() as sel:
+            sel.register(self._sock, selectors.EVENT_READ)
+            buffers = {}  # TCP connection -> bytearray of received data
+            try:
+                while not self._stop.is_set():
+                    for key, _ in sel.select(timeout=0.1):
+                        sock = key.fileobj
+                        if self.protocol == 'udp':
+                            self._serve_datagram(sock)
+                        elif sock is self._sock:
+                            conn, _ = sock.accept()
+                            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                            buffers[conn] = bytearray()
+                            sel.register(conn, selectors.EVENT_READ)
+                        elif not self._serve_stream(sock, buffers[sock]):
+                            sel.unregister(sock)
+                            del buffers[sock]
+                            self._forget(sock)
+                            sock.close()
+            finally:
+                for conn in buffers:
+                    self._forget(conn)
+                    conn.close()
+                self._sock.close()
+
+    def _serve_datagram(self, sock):
+        try:
+            data, peer = sock.recvfrom(65536)
+        except OSError:
+            return
+        if len(data) < FRAME_HEADER.size or len(data) != FRAME_HEADER.size + REPORT_SIZES.get(data[2], -1):
+            self.invalid_frames += 1  # a datagram holds exactly one frame
+            return
+        self._apply(data, 0, peer)
+
+    def _serve_stream(self, conn, buffer):
+        """
+        :return: False if the connection must be closed
+        """
+        try:
+            data = conn.recv(65536)
+        except OSError:
+            return False
+        if not data:
+            return False
+        buffer += data
+        offset = 0
+        try:
+            while True:
+                size = self._apply(buffer, offset, conn)
+                if size is None:
+                    break
+                offset += size
+        except ValueError:
+            self.invalid_frames += 1
+            return False
+        del buffer[:offset]
+        return True
+
+    def _forget(self, conn):
+        with self._feedback_lock:
+            for pad_id, peer in list(self._peers.items()):
+                if peer is conn:
+                    del self._peers[pad_id]
+                    self._last_seq.pop(pad_id, None)
+
+
+class RemoteBackend(Backend):
+    """
+    Backend sending the reports of a gamepad to a pad of a RemoteServer
+    """
+
+    def __init__(self, address, pad_id=0, protocol='udp'):
+        """
+        :param address: (host, port) of the RemoteServer
+        :param pad_id: id of the pad on the server
+        :param protocol: 'udp' or 'tcp' (same as the server)
+        """
+        self.address = address
+        self.pad_id = pad_id
+        self.protocol = protocol
+        self.seq = 0  # sequence number of the last frame
+        self.sock = None
+        self.target_type = None
+        self.callback = None
+        self._receiver = None
+        self._stop = threading.Event()
+
+    def create(self, target_type):
+        self.target_type = target_type
+        sock = socket.socket(socket.AF_INET, _socket_type(self.protocol))
+        try:
+            if self.protocol == 'tcp':
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.connect(self.address)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+    def pack(self, report):
+        self.seq = (self.seq + 1) & SEQ_MASK
+        return FRAME_HEADER.pack(self.pad_id, self.target_type, self.seq) + bytes(report)
+
+    def write(self, data):
+        try:
+            self.sock.sendall(data)
+        except OSError as e:
+            return e.errno or errno.EIO
+        return self.SUCCESS
+
+    def error(self, code):
+        return OSError(code, os.strerror(code))
+
+    def error_name(self, code):
+        return errno.errorcode.get(code, str(code))
+
+    def close(self):
+        if self.sock is not None:
+            self._stop.set()
+            if self._receiver is not None:
+                self._receiver.join()
+                self._receiver = None
+            self.sock.close()
+            self.sock = None
+            self.callback = None
+
+    def register_notification(self, callback_function):
+        self.callback = callback_function
+        if self._receiver is None:
+            self._receiver = threading.Thread(target=self._receive, daemon=True)
+            self._receiver.start()
+
+    def unregister_notification(self):
+        self.callback = None
+
+    def _receive(self):
+        buffer = bytearray()
+        while not self._stop.is_set():
+            if not select.select([self.sock], [], [], 0.1)[0]:
+                continue
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                continue  # e.g. ICMP port unreachable on UDP: the server may come (back) later
+            if not data and self.protocol == 'tcp':
+                return
+            buffer += data
+            nb_feedbacks = len(buffer) // FEEDBACK.size
+            for i in range(nb_feedbacks):
+                pad_id, large_motor, small_motor, led_number = FEEDBACK.unpack_from(buffer, i * FEEDBACK.size)
+                callback = self.callback
+                if pad_id == self.pad_id and callback is not None:
+                    callback(None, None, large_motor, small_motor, led_number, None)
+            del buffer[:nb_feedbacks * FEEDBACK.size]
+
+    def get_type(self):
+        return self.target_type
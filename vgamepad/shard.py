@@ -0,0 +1,393 @@
+"""
+Gamepads sharded across worker processes
+
+One process sending the reports of hundreds of gamepads is limited to one core. A ShardedHost starts worker processes
+that own the virtual devices (uinput devices or ViGEm targets), and spreads the gamepads across them.
+The front end uses normal gamepads, whose backend writes their reports to a shared-memory ReportChannel
+(see vgamepad.shm), without pickling or system calls; each worker applies the reports of its gamepads:
+    host = ShardedHost(nb_workers=4)
+    gamepad = host.gamepad(VX360Gamepad)  # the virtual device is created in a worker
+    gamepad.press_button(button=XUSB_BUTTON.XUSB_GAMEPAD_A)
+    gamepad.update()  # written to shared memory, sent by the worker
+
+Each update() is sent by the worker, in order (a button pressed and released before the worker polls the channel
+is still sent pressed). update() waits while the worker is late by a full ring of reports, and fails with ETIMEDOUT
+after request_timeout.
+
+The host monitors its workers. When a worker dies or stops responding, a new worker is started,
+and the gamepads of the dead worker are migrated to the least loaded workers, which plug in new devices
+with the last report of each gamepad.
+"""
+
+import ctypes
+import errno
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+
+import vgamepad.win.vigem_commons as vcom
+from vgamepad.backend import Backend
+from vgamepad.shm import SEQLOCK_SAFE, ReportChannel, ChannelPump
+
+
+def _default_report(target_type):
+    if target_type == vcom.VIGEM_TARGET_TYPE.Xbox360Wired:
+        return vcom.XUSB_REPORT()
+    report = vcom.DS4_REPORT()
+    vcom.DS4_REPORT_INIT(report)
+    return report
+
+
+def _serve(channel_name, channel_lock, conn, backend, heartbeat, interval):
+    """
+    Main function of the worker processes: applies the reports of its slots and executes the commands of the host
+    """
+    from vgamepad.virtual_gamepad import VX360Gamepad, VDS4Gamepad
+    channel = ReportChannel(name=channel_name, lock=channel_lock)
+    pump = ChannelPump(channel, {})
+    try:
+        while True:
+            heartbeat.value = time.monotonic()
+            nb_updates = pump.poll()
+            try:
+                if not conn.poll(0.0 if nb_updates else interval):
+                    continue
+                request_id, command, arg = conn.recv()
+            except (EOFError, OSError):
+                return  # the host is gone
+            if command == 'close':
+                return
+            try:
+                if command == 'add':
+                    slot, target_type = arg
+                    cls = VX360Gamepad if target_type == vcom.VIGEM_TARGET_TYPE.Xbox360Wired else VDS4Gamepad
+                    pump.add(slot, cls(backend=backend))
+                    reply = None
+                elif command == 'remove':
+                    pump.remove(arg).close()
+                    reply = None
+                elif command == 'states':
+                    reply = {slot: bytes(g.report) for slot, g in pump.gamepads.items()}
+                else:
+                    raise ValueError(f"Unknown command: {command}")
+                conn.send((request_id, 'ok', reply))
+            except Exception as e:
+                conn.send((request_id, 'error', repr(e)))
+    finally:
+        for g in pump.gamepads.values():
+            g.close()
+        channel.close()
+
+
+class Worker:
+    """
+    Worker process of a ShardedHost
+    """
+
+    def __init__(self, ctx, channel_name, channel_lock, backend, interval):
+        self.conn, child_conn = ctx.Pipe()
+        self.heartbeat = ctx.Value('d', time.monotonic(), lock=False)  # time.monotonic() of the last loop
+        self.slots = set()
+        self.lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self.process = ctx.Process(target=_serve, daemon=True,
+                                   args=(channel_name, channel_lock, child_conn, backend, self.heartbeat, interval))
+        self.process.start()
+        child_conn.close()
+
+    def request(self, command, arg=None, timeout=10.0):
+        """
+        Sends a command and waits for its reply
+
+        Replies to previous requests that timed out are discarded.
+
+        :return: the reply of the worker
+        """
+        with self.lock:
+            request_id = next(self._request_ids)
+            self.conn.send((request_id, command, arg))
+            deadline = time.monotonic() + timeout
+            while True:
+                if not self.conn.poll(max(deadline - time.monotonic(), 0.0)):
+                    raise TimeoutError(f"Worker {self.process.pid} did not reply to {command}.")
+                reply_id, status, reply = self.conn.recv()
+                if reply_id == request_id:
+                    break
+        if status != 'ok':
+            raise RuntimeError(f"Worker {self.process.pid} failed to {command}: {reply}")
+        return reply
+
+    def is_healthy(self, heartbeat_timeout):
+        return self.process.is_alive() and time.monotonic() - self.heartbeat.value < heartbeat_timeout
+
+    def stop(self, timeout=5.0):
+        if self.process.is_alive():
+            try:
+                with self.lock:
+                    self.conn.send((next(self._request_ids), 'close', None))
+            except OSError:
+                pass
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ShardedHost:
+    """
+    Worker processes owning the virtual devices of the gamepads created by gamepad()
+    """
+
+    def __init__(self, nb_workers=None, backend=None, nb_slots=256, interval=0.0005,
+                 health_interval=0.5, heartbeat_timeout=5.0, request_timeout=10.0, context=None):
+        """
+        :param nb_workers: number of worker processes (None = number of CPUs)
+        :param backend: backend of the gamepads in the workers, name of a registered backend or picklable callable
+            returning a new Backend (None = default backend of the platform)
+        :param nb_slots: maximum number of gamepads
+        :param interval: sleep of an idle worker between two polls of the reports, in seconds
+        :param health_interval: time between two health checks of the workers, in seconds
+        :param heartbeat_timeout: a worker whose loop is stuck for this time (in seconds) is replaced
+        :param request_timeout: maximum time to wait for the reply of a worker to a command, in seconds
+        :param context: multiprocessing start method (None = default)
+        """
+        self._ctx = multiprocessing.get_context(context)
+        self.backend = backend
+        self.interval = interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.request_timeout = request_timeout
+        self._channel_lock = None if SEQLOCK_SAFE else self._ctx.Lock()  # see vgamepad.shm
+        self.channel = ReportChannel(nb_slots=nb_slots, lock=self._channel_lock)
+        self.migrations = 0  # gamepads moved to another worker
+        self.restarts = 0  # workers replaced
+        self.errors = 0  # failed migrations (retried at the next health check)
+        self.workers = []
+        self._free_slots = list(range(nb_slots - 1, -1, -1))
+        self._target_types = {}  # slot -> VIGEM_TARGET_TYPE
+        self._orphans = []  # slots of dead workers, not migrated yet
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        for _ in range(nb_workers or os.cpu_count() or 1):
+            self.workers.append(self._start_worker())
+        self._monitor = threading.Thread(target=self._run_monitor, args=(health_interval, ), daemon=True)
+        self._monitor.start()
+
+    def _start_worker(self):
+        return Worker(self._ctx, self.channel.name, self._channel_lock, self.backend, self.interval)
+
+    def gamepad(self, gamepad_class):
+        """
+        :param gamepad_class: VX360Gamepad or VDS4Gamepad
+        :return: a new gamepad, whose virtual device is owned by a worker
+        """
+        return gamepad_class(backend=ShardBackend(self))
+
+    def set_state(self, slot, report):
+        """
+        Sends a report to the gamepad of a slot, without front-end gamepad
+
+        :param slot: slot of the gamepad (gamepad.get_index())
+        :param report: a XUSB_REPORT or DS4_REPORT
+        :return: True if the report is written, False if the worker is late for request_timeout
+        """
+        return self.channel.write(slot, report, self.request_timeout)
+
+    def _least_loaded(self):
+        return min(self.workers, key=lambda w: len(w.slots))
+
+    def _add(self, target_type):
+        with self._lock:
+            if self._stop.is_set():
+                raise RuntimeError("The host is closed.")
+            if not self._free_slots:
+                raise RuntimeError(f"No free slot: the host has {self.channel.nb_slots} slots.")
+            slot = self._free_slots.pop()
+            self.channel.discard(slot)  # reports of a previous gamepad not read by its worker
+            self.channel.write(slot, _default_report(target_type))  # not the last report of a previous gamepad
+            worker = self._least_loaded()
+            try:
+                self._plug(worker, slot, target_type)
+            except Exception:
+                self._free_slots.append(slot)
+                raise
+            worker.slots.add(slot)
+            self._target_types[slot] = target_type
+            return slot
+
+    def _plug(self, worker, slot, target_type):
+        """
+        Creates the gamepad of a slot in a worker
+        """
+        try:
+            worker.request('add', (slot, target_type), self.request_timeout)
+        except Exception:
+            try:
+                worker.request('remove', slot, self.request_timeout)  # in case the add completes late
+            except Exception:
+                pass
+            raise
+
+    def _remove(self, slot):
+        with self._lock:
+            del self._target_types[slot]
+            self._free_slots.append(slot)
+            if slot in self._orphans:
+                self._orphans.remove(slot)
+                return
+            for worker in self.workers:
+                if slot in worker.slots:
+                    worker.slots.remove(slot)
+                    if not self._stop.is_set():
+                        try:
+                            worker.request('remove', slot, self.request_timeout)
+                        except (EOFError, OSError):
+                            pass  # dead worker, replaced by check_health()
+                    return
+
+    def check_health(self):
+        """
+        Replaces the dead or stuck workers and migrates their gamepads (called periodically by a background thread)
+
+        :return: the number of replaced workers
+        """
+        dead = []
+        with self._lock:
+            for i, worker in enumerate(self.workers):
+                if worker.is_healthy(self.heartbeat_timeout):
+                    continue
+                dead.append(worker)
+                self._orphans.extend(sorted(worker.slots))
+                self.workers[i] = self._start_worker()
+                self.restarts += 1
+            orphans = list(self._orphans)
+        # The requests to the workers are sent without the lock, which gamepad() and close() need meanwhile
+        for worker in dead:
+            worker.stop(timeout=0.0)
+        for slot in orphans:
+            with self._lock:
+                if slot not in self._orphans:
+                    continue  # closed or migrated meanwhile
+                self._orphans.remove(slot)
+                target_type = self._target_types[slot]
+                worker = self._least_loaded()
+                worker.slots.add(slot)  # closing the gamepad meanwhile removes it from this worker
+            try:
+                self._plug(worker, slot, target_type)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                    if slot in worker.slots:
+                        worker.slots.remove(slot)
+                        self._orphans.append(slot)
+                continue
+            with self._lock:
+                self.migrations += 1
+        return len(dead)
+
+    def _run_monitor(self, health_interval):
+        while not self._stop.wait(health_interval):
+            self.check_health()
+
+    def health(self):
+        """
+        :return: list of dicts describing the workers ('pid', 'alive', 'heartbeat_age' in seconds, 'pads')
+        """
+        with self._lock:
+            now = time.monotonic()
+            return [{
+                'pid': w.process.pid,
+                'alive': w.process.is_alive(),
+                'heartbeat_age': now - w.heartbeat.value,
+                'pads': len(w.slots),
+            } for w in self.workers]
+
+    def states(self):
+        """
+        :return: dict {slot: bytes of the last report applied by the workers} (for monitoring and tests)
+        """
+        with self._lock:
+            states = {}
+            for worker in self.workers:
+                states.update(worker.request('states', timeout=self.request_timeout))
+            return states
+
+    def stats(self):
+        """
+        :return: dict of the counters of the host
+        """
+        return {
+            'workers': len(self.workers),
+            'pads': len(self._target_types),
+            'migrations': self.migrations,
+            'restarts': self.restarts,
+            'errors': self.errors,
+        }
+
+    def close(self):
+        """
+        Stops the workers, which destroy their virtual devices (the front-end gamepads should be closed first)
+        """
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._monitor.join()
+        with self._lock:
+            for worker in self.workers:
+                worker.stop()
+            self.workers.clear()
+        self.channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ShardBackend(Backend):
+    """
+    Backend writing the reports of a gamepad to the slot of a ShardedHost
+    """
+
+    def __init__(self, host):
+        """
+        :param host: the ShardedHost
+        """
+        self.host = host
+        self.slot = None
+        self.target_type = None
+
+    def create(self, target_type):
+        self.target_type = target_type
+        self.slot = self.host._add(target_type)
+
+    def pack(self, report):
+        return report  # written before update() returns, no copy needed
+
+    def write(self, data):
+        if not self.host.channel.write(self.slot, data, self.host.request_timeout):
+            return errno.ETIMEDOUT  # the worker did not read the reports of the slot
+        return self.SUCCESS
+
+    def error_name(self, code):
+        return errno.errorcode.get(code, str(code))
+
+    def written(self, data):
+        return 1, ctypes.sizeof(data)
+
+    def close(self):
+        if self.slot is not None:
+            slot, self.slot = self.slot, None
+            self.host._remove(slot)
+
+    def is_ready(self):
+        return self.slot is not None
+
+    def get_index(self):
+        return self.slot
+
+    def get_type(self):
+        return self.target_type
@@ -0,0 +1,308 @@
+"""
+Shared-memory channel between producer processes and the process owning the gamepads
+
+The channel is a block of shared memory holding a small ring of reports per pad (a slot). Producers append reports
+to the ring of a slot without pickling, pipes or sockets, and the owner process sends each report to its gamepad
+with update(), in order: a button pressed and released between two polls of the owner is still sent pressed.
+    # owner process
+    channel = ReportChannel(nb_slots=4)
+    pump = ChannelPump(channel, {0: VX360Gamepad(), 1: VDS4Gamepad()})
+    pump.start()
+    # producer process
+    channel = ReportChannel(name=channel_name)
+    channel.write(0, report)
+
+A producer appending to a full ring waits for the owner to read it (see ReportChannel.write).
+Each report is published with a sequence number (a seqlock) and the number of reports of the ring,
+which relies on the stores to shared memory being visible in program order to the other processes.
+This is the case on x86 (and x86-64) CPUs only: on other CPUs, the owner and the producers must share
+a multiprocessing.Lock, which orders the accesses instead.
+"""
+
+import ctypes
+import multiprocessing
+import os
+import platform
+import struct
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import vgamepad.win.vigem_commons as vcom
+
+
+HEADER = struct.Struct('<4sIII')  # magic, number of slots, ring size, entry size
+HEADER_SIZE = 64
+MAGIC = b'VGSM'
+REPORT_SIZE = max(ctypes.sizeof(vcom.XUSB_REPORT), ctypes.sizeof(vcom.DS4_REPORT))
+SEQ_MASK = 0xFFFFFFFF
+SEQLOCK_SAFE = platform.machine().lower() in ('x86_64', 'amd64', 'i386', 'i686', 'x86')
+WAIT_INTERVAL = 0.0001  # sleep of a producer waiting for the owner, in seconds
+
+_created = set()  # names of the channels created by this process
+
+
+class Cursor(ctypes.Structure):
+    _fields_ = [
+        ('head', ctypes.c_uint32),  # number of reports appended (modulo 2 ** 32), written by the producers
+        ('_padding1', ctypes.c_ubyte * 60),
+        ('tail', ctypes.c_uint32),  # number of reports read, written by the owner
+        ('_padding2', ctypes.c_ubyte * 60),  # head and tail in distinct cache lines: no false sharing
+    ]
+
+
+class Entry(ctypes.Structure):
+    _fields_ = [
+        ('seq', ctypes.c_uint32),  # 2 * n + 2 once the report number n is written, odd while being written
+        ('target_type', ctypes.c_uint8),
+        ('size', ctypes.c_uint8),
+        ('report', ctypes.c_ubyte * REPORT_SIZE),
+        ('_padding', ctypes.c_ubyte * (64 - 6 - REPORT_SIZE)),  # one entry per cache line
+    ]
+
+
+class ReportChannel:
+    """
+    Rings of reports in shared memory, one per pad
+
+    A slot must not be written by several producers at the same time, unless they share a lock (see __init__),
+    and is read by a single owner.
+    """
+
+    def __init__(self, nb_slots=None, name=None, lock=None, ring_size=8):
+        """
+        :param nb_slots: number of slots, to create a new channel (None = attach to the existing channel name)
+        :param name: name of the shared memory block (None = random name, see self.name)
+        :param lock: optional multiprocessing.Lock serializing the writes of several producers,
+            required on CPUs other than x86, where the owner and all the producers must use the same lock
+        :param ring_size: number of reports a slot holds before a producer waits for the owner, to create a new channel
+            (a power of 2)
+        """
+        if lock is None and not SEQLOCK_SAFE:
+            raise ValueError(f"The seqlock of ReportChannel requires a x86 CPU, on {platform.machine()} "
+                             f"the owner and the producers must share a lock.")
+        self.lock = lock
+        self._read_lock = None if SEQLOCK_SAFE else lock
+        if nb_slots is not None:
+            if ring_size < 1 or ring_size & (ring_size - 1):
+                raise ValueError(f"The ring size must be a power of 2, not {ring_size}.")
+            self.owner = True
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + nb_slots * (
+                ctypes.sizeof(Cursor) + ring_size * ctypes.sizeof(Entry)))
+            HEADER.pack_into(self.shm.buf, 0, MAGIC, nb_slots, ring_size, ctypes.sizeof(Entry))
+            _created.add(self.shm.name)
+        else:
+            self.owner = False
+            self.shm = _attach(name)
+            magic, nb_slots, ring_size, entry_size = HEADER.unpack_from(self.shm.buf, 0)
+            if magic != MAGIC or entry_size != ctypes.sizeof(Entry):
+                self.shm.close()
+                raise ValueError(f"{name} is not a compatible vgamepad report channel.")
+        self.name = self.shm.name
+        self.nb_slots = nb_slots
+        self.ring_size = ring_size
+        self.cursors = (Cursor * nb_slots).from_buffer(self.shm.buf, HEADER_SIZE)
+        self.entries = (Entry * (nb_slots * ring_size)).from_buffer(
+            self.shm.buf, HEADER_SIZE + nb_slots * ctypes.sizeof(Cursor))
+
+    def write(self, slot, report, timeout=None):
+        """
+        Appends a report to the ring of a slot (producer side)
+
+        :param slot: index of the slot
+        :param report: a XUSB_REPORT or DS4_REPORT
+        :param timeout: maximum time to wait while the ring is full, in seconds (None = wait forever)
+        :return: True if the report is written, False if the timeout elapsed
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            if self.lock is not None:
+                with self.lock:
+                    if self._append(slot, report):
+                        return True
+            elif self._append(slot, report):
+                return True
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            time.sleep(WAIT_INTERVAL)  # without the lock, the owner may need it to read
+
+    def _append(self, slot, report):
+        c = self.cursors[slot]
+        n = c.head
+        if (n - c.tail) & SEQ_MASK >= self.ring_size:
+            return False  # full: the oldest report is not read yet
+        e = self.entries[slot * self.ring_size + n % self.ring_size]
+        e.seq = (2 * n + 1) & SEQ_MASK
+        e.target_type = vcom.VIGEM_TARGET_TYPE.Xbox360Wired if isinstance(report, vcom.XUSB_REPORT) \
+            else vcom.VIGEM_TARGET_TYPE.DualShock4Wired
+        e.size = ctypes.sizeof(report)
+        ctypes.memmove(e.report, ctypes.addressof(report), e.size)
+        e.seq = (2 * n + 2) & SEQ_MASK
+        c.head = (n + 1) & SEQ_MASK  # published after the report
+        return True
+
+    def read(self, slot, next_report=None):
+        """
+        Reads the reports appended to the ring of a slot, and frees their entries (owner side)
+
+        :param slot: index of the slot
+        :param next_report: number of the next report to read, returned by the previous read of this slot
+            (None = only the last report appended, if any)
+        :return: (list of (target type, report bytes) in order, number of the next report to read)
+        """
+        if self._read_lock is not None:
+            with self._read_lock:
+                return self._read(slot, next_report)
+        return self._read(slot, next_report)
+
+    def _read(self, slot, n):
+        c = self.cursors[slot]
+        head = c.head
+        if n is None:
+            n = (head - 1) & SEQ_MASK if head else head
+        reports = []
+        while n != head:
+            e = self.entries[slot * self.ring_size + n % self.ring_size]
+            seq = e.seq
+            if seq != (2 * n + 2) & SEQ_MASK:
+                break  # being written by a producer not holding the lock, read at the next poll
+            target_type = e.target_type
+            data = bytes(e.report)[:e.size]
+            if e.seq != seq:
+                break
+            reports.append((target_type, data))
+            n = (n + 1) & SEQ_MASK
+        c.tail = n
+        return reports, n
+
+    def discard(self, slot):
+        """
+        Frees the reports of a slot which are not read yet (when the slot has no owner reading it)
+        """
+        if self._read_lock is not None:
+            with self._read_lock:
+                self.cursors[slot].tail = self.cursors[slot].head
+        else:
+            self.cursors[slot].tail = self.cursors[slot].head
+
+    def close(self):
+        """
+        Detaches from the channel, and destroys it if this is the owner
+        """
+        if self.shm is not None:
+            del self.cursors, self.entries  # releases the exported buffer
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+                _created.discard(self.shm.name)
+            self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _attach(name):
+    """
+    Attaches to an existing shared memory block, without destroying it when this process exits
+
+    Python 3.13+ does not track the block (track=False). Before, on POSIX systems, the block is registered to the
+    resource tracker of the process, which destroys it when the process exits: it is unregistered, unless this
+    process created it or is a multiprocessing child, which shares the resource tracker of its parent
+    (assumed to be the owner, which unregisters the block when destroying it).
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix' and name not in _created and multiprocessing.parent_process() is None:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister('/' + shm.name, 'shared_memory')  # POSIX names start with /
+    return shm
+
+
+class ChannelPump:
+    """
+    Applies the new reports of a ReportChannel to gamepads (owner side)
+    """
+
+    def __init__(self, channel, gamepads):
+        """
+        :param channel: a ReportChannel
+        :param gamepads: dict {slot: gamepad}, or sequence of gamepads (slot = index)
+        """
+        if not isinstance(gamepads, dict):
+            gamepads = dict(enumerate(gamepads))
+        self.channel = channel
+        self.gamepads = gamepads
+        self.invalid_reports = 0  # reports whose type does not match the gamepad of the slot
+        self._next = dict.fromkeys(gamepads)  # number of the next report to read, per slot
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, slot, gamepad):
+        """
+        Starts applying the reports of a slot to a gamepad (from the polling thread), beginning with its last report
+        """
+        self.gamepads[slot] = gamepad
+        self._next[slot] = None
+
+    def remove(self, slot):
+        """
+        Stops applying the reports of a slot (from the polling thread)
+
+        :return: the gamepad of the slot (not closed)
+        """
+        del self._next[slot]
+        return self.gamepads.pop(slot)
+
+    def poll(self):
+        """
+        Sends the reports written since the last poll, in order (one update() per report)
+
+        :return: the number of reports sent
+        """
+        nb_updates = 0
+        read = self.channel.read
+        for slot, g in self.gamepads.items():
+            reports, self._next[slot] = read(slot, self._next[slot])
+            for target_type, data in reports:
+                if target_type != g.target_type() or len(data) != ctypes.sizeof(g.report):
+                    self.invalid_reports += 1
+                    continue
+                frame = g._frame()
+                ctypes.memmove(ctypes.addressof(frame), data, len(data))
+                g._update_report(frame)
+                nb_updates += 1
+        return nb_updates
+
+    def start(self, interval=0.001):
+        """
+        Polls the channel in a background thread
+
+        :param interval: sleep between two polls without new reports, in seconds
+        """
+        self._thread = threading.Thread(target=self._run, args=(interval, ), daemon=True)
+        self._thread.start()
+
+    def _run(self, interval):
+        while not self._stop.is_set():
+            if not self.poll():
+                time.sleep(interval)
+
+    def close(self):
+        """
+        Stops the background thread (the channel and the gamepads are not closed)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,273 @@
+"""
+Columnar state of many simulated gamepads (requires NumPy)
+
+A PadStore holds the reports of thousands of gamepads in one NumPy structured array,
+with the layout of XUSB_REPORT or DS4_REPORT (one row per gamepad), and a dirty flag per row.
+Rows are modified with vectorized operations, or through views that have the setters of the gamepads:
+    store = PadStore(VX360Gamepad, 10000)
+    store.set('sThumbLX', np.linspace(-32768, 32767, 10000).astype(np.int16))
+    pad = store.view(42)
+    pad.press_button(button=XUSB_BUTTON.XUSB_GAMEPAD_A)
+    pad.update()  # marks row 42 as dirty
+    store.flush()  # sends all dirty rows, in bulk, to the batch backends owning them
+"""
+
+import ctypes
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+import vgamepad.win.vigem_commons as vcom
+from vgamepad.backend import get_backend
+from vgamepad.virtual_gamepad import VX360Gamepad, VDS4Gamepad
+
+
+class BatchBackend(ABC):
+    """
+    Interface of the backends receiving rows of a PadStore
+    """
+
+    def create(self, target_type, nb_rows):
+        """
+        :param target_type: VIGEM_TARGET_TYPE of the rows
+        :param nb_rows: number of rows owned by the backend
+        """
+        pass
+
+    @abstractmethod
+    def write_batch(self, rows, reports):
+        """
+        Sends reports, raising on errors
+
+        :param rows: array of row indices, relative to the first row owned by the backend
+        :param reports: structured array of the reports of these rows
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+class LoopbackBatchBackend(BatchBackend):
+    """
+    Batch backend without devices, which keeps the last written report of each row (self.reports)
+    """
+
+    def __init__(self):
+        self.reports = None
+        self.batches = 0  # number of write_batch() calls
+        self.rows_written = 0
+
+    def create(self, target_type, nb_rows):
+        self.reports = np.zeros(nb_rows, dtype=report_dtype(target_type))
+
+    def write_batch(self, rows, reports):
+        self.reports[rows] = reports
+        self.batches += 1
+        self.rows_written += len(rows)
+
+
+class PerRowBackend(BatchBackend):
+    """
+    Batch backend sending each row to its own Backend (e.g. RemoteBackend, or devices for a few rows)
+    """
+
+    def __init__(self, backend=None):
+        """
+        :param backend: the backend of each row, as accepted by VX360Gamepad(backend=...),
+            except a Backend instance (e.g. a name such as 'loopback', or a callable returning a new Backend)
+        """
+        self.backend = backend
+        self.backends = []
+
+    def create(self, target_type, nb_rows):
+        self.report_type = vcom.XUSB_REPORT if target_type == vcom.VIGEM_TARGET_TYPE.Xbox360Wired else vcom.DS4_REPORT
+        for _ in range(nb_rows):
+            backend = get_backend(self.backend)
+            backend.create(target_type)
+            self.backends.append(backend)
+
+    def write_batch(self, rows, reports):
+        data = reports.tobytes()
+        size = reports.itemsize
+        for i, row in enumerate(rows.tolist()):
+            backend = self.backends[row]
+            err = backend.write(backend.pack(self.report_type.from_buffer_copy(data, i * size)))
+            if err != backend.SUCCESS:
+                raise backend.error(err)
+
+    def close(self):
+        for backend in self.backends:
+            backend.close()
+        self.backends.clear()
+
+
+def report_dtype(target_type):
+    """
+    :return: the NumPy dtype of the reports of a VIGEM_TARGET_TYPE (same layout as XUSB_REPORT or DS4_REPORT)
+    """
+    if target_type == vcom.VIGEM_TARGET_TYPE.Xbox360Wired:
+        return np.dtype(vcom.XUSB_REPORT)
+    return np.dtype(vcom.DS4_REPORT)
+
+
+class _RowView:
+    """
+    Setters of a gamepad operating on a row of a PadStore
+    """
+
+    __slots__ = ()
+
+    front = None  # no double buffering: update() marks the row
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+        self.report = store.report_type.from_buffer(store.reports, row * store.reports.itemsize)
+
+    def reset(self):
+        ctypes.memmove(ctypes.addressof(self.report), ctypes.addressof(self.store.default_report),
+                       ctypes.sizeof(self.report))
+
+    def update(self, report=None):
+        """
+        Marks the row as dirty: it is sent by the next store.flush()
+
+        :param report: report to copy in the row first
+        """
+        if report is not None:
+            ctypes.memmove(ctypes.addressof(self.report), ctypes.addressof(report), ctypes.sizeof(self.report))
+        self.store.dirty[self.row] = True
+
+    def try_update(self, report=None):
+        self.update(report)
+        return 0
+
+    def close(self):
+        pass
+
+
+class X360RowView(_RowView, VX360Gamepad):
+    """
+    VX360Gamepad-compatible view of a row of a PadStore
+    """
+
+    __slots__ = ('store', 'row')
+
+
+class DS4RowView(_RowView, VDS4Gamepad):
+    """
+    VDS4Gamepad-compatible view of a row of a PadStore
+    """
+
+    __slots__ = ('store', 'row')
+
+
+class PadStore:
+    """
+    Reports of many gamepads of the same type, in a NumPy structured array
+    """
+
+    def __init__(self, gamepad_class, nb_pads, backend=None):
+        """
+        :param gamepad_class: VX360Gamepad or VDS4Gamepad
+        :param nb_pads: number of rows
+        :param backend: BatchBackend owning all the rows (None = LoopbackBatchBackend), see also assign()
+        """
+        self.target_type = gamepad_class.target_type(None)
+        self.default_report = gamepad_class.get_default_report(None)
+        self.report_type = type(self.default_report)
+        self.view_class = X360RowView if self.report_type is vcom.XUSB_REPORT else DS4RowView
+        self.reports = np.full(nb_pads, np.frombuffer(bytes(self.default_report), report_dtype(self.target_type))[0])
+        self.dirty = np.zeros(nb_pads, dtype=bool)
+        self._owners = []  # (start row, stop row, first row of the backend, BatchBackend), sorted
+        self.assign(LoopbackBatchBackend() if backend is None else backend, 0, nb_pads)
+
+    def __len__(self):
+        return len(self.reports)
+
+    def assign(self, backend, start, stop):
+        """
+        Makes a BatchBackend own rows [start, stop)
+
+        The previous backends of these rows keep their other rows, and are closed if they have none left.
+
+        :param backend: a BatchBackend, not created yet
+        """
+        owners = []
+        for owner_start, owner_stop, base, owner in self._owners:
+            if owner_start < start:
+                owners.append((owner_start, min(owner_stop, start), base, owner))
+            if stop < owner_stop:
+                owners.append((max(owner_start, stop), owner_stop, base, owner))
+        kept = {id(o[3]) for o in owners}
+        for _, _, _, owner in self._owners:
+            if id(owner) not in kept:
+                kept.add(id(owner))
+                owner.close()
+        backend.create(self.target_type, stop - start)
+        owners.append((start, stop, start, backend))
+        owners.sort(key=lambda o: o[0])
+        self._owners = owners
+
+    def view(self, row):
+        """
+        :return: a gamepad-like view of a row (update() marks it as dirty)
+        """
+        return self.view_class(self, row)
+
+    def set(self, field, values, rows=slice(None)):
+        """
+        Sets a field of rows, and marks them as dirty
+
+        :param field: name of a report field, e.g. 'sThumbLX'
+        :param values: value or array of values
+        :param rows: index, slice, boolean mask or array of indices
+        """
+        self.reports[field][rows] = values
+        self.dirty[rows] = True
+
+    def press_buttons(self, buttons, rows=slice(None)):
+        """
+        Presses buttons (bitmask of XUSB_BUTTON or DS4_BUTTONS) on rows, and marks them as dirty
+        """
+        column = self.reports['wButtons']
+        column[rows] |= np.uint16(buttons)
+        self.dirty[rows] = True
+
+    def release_buttons(self, buttons, rows=slice(None)):
+        """
+        Releases buttons (bitmask of XUSB_BUTTON or DS4_BUTTONS) on rows, and marks them as dirty
+        """
+        column = self.reports['wButtons']
+        column[rows] &= ~np.uint16(buttons)
+        self.dirty[rows] = True
+
+    def mark_dirty(self, rows=slice(None)):
+        self.dirty[rows] = True
+
+    def flush(self):
+        """
+        Sends the dirty rows to their backends (one write_batch() call per backend) and clears their dirty flags
+        (rows owned by no backend are not sent)
+
+        :return: the number of sent rows
+        """
+        rows = np.flatnonzero(self.dirty)
+        if not len(rows):
+            return 0
+        self.dirty[rows] = False
+        reports = self.reports[rows]  # copy: the rows can be modified while the backends write
+        for start, stop, base, backend in self._owners:
+            i, j = np.searchsorted(rows, (start, stop))
+            if i < j:
+                backend.write_batch(rows[i:j] - base, reports[i:j])
+        return len(rows)
+
+    def close(self):
+        """
+        Closes the backends
+        """
+        for backend in {id(o[3]): o[3] for o in self._owners}.values():
+            backend.close()
+        self._owners.clear()
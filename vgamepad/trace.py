@@ -0,0 +1,535 @@
+"""
+Input traces: recording of the reports sent to a gamepad, and fast analysis (requires NumPy)
+
+A trace file is a header followed by fixed-size records: a timestamp in nanoseconds and a raw
+XUSB_REPORT or DS4_REPORT. Traces are recorded by wrapping the backend of a gamepad:
+    gamepad = VX360Gamepad(backend=RecordingBackend('uinput', 'run.vgtrace'))
+or from reports and LoopbackBackend frames with a TraceWriter.
+
+Trace memory-maps a trace as a NumPy structured array with the fields of the report
+(e.g. trace.records['sThumbLX']), and computes statistics with vectorized operations,
+chunk by chunk, so that traces larger than the memory can be analysed:
+    trace = Trace('run.vgtrace')
+    trace.press_counts()  # {XUSB_BUTTON.XUSB_GAMEPAD_A: 12, ...}
+    trace.hold_durations(XUSB_BUTTON.XUSB_GAMEPAD_A)  # in nanoseconds
+    trace.stick_histogram('left', bins=32)
+    trace.interval_stats()
+
+Recordings get a sparse index next to the trace file (path + '.idx'), with an entry every index_interval:
+the timestamp, the number and the byte offset of the first record of each interval. Records hold full reports,
+so the record found by a seek is the exact report at that time, without decoding the previous records.
+Segments of a trace can be replayed on a gamepad:
+    replay(gamepad, trace, start=trace.timestamps[0] + 60 * 10**9)  # from 1 minute into the trace
+"""
+
+import ctypes
+import os
+import struct
+from time import perf_counter_ns, sleep
+
+import numpy as np
+
+import vgamepad.win.vigem_commons as vcom
+from vgamepad.backend import Backend, get_backend
+
+
+HEADER = struct.Struct('<4sHBBQ')  # magic, version, target type, report size, reserved
+MAGIC = b'VGTR'
+VERSION = 1
+TIMESTAMP = struct.Struct('<q')
+INDEX_HEADER = struct.Struct('<4sHHq')  # magic, version, reserved, interval between entries in ns
+INDEX_MAGIC = b'VGTI'
+INDEX_DTYPE = np.dtype([('timestamp', '<i8'), ('record', '<i8'), ('offset', '<i8')])
+CHUNK = 1 << 20  # number of records processed at once by the statistics
+INTERVAL_BUCKETS = 64  # buckets per power of two of the interval histogram of interval_stats()
+
+
+def report_type(target_type):
+    """
+    :return: XUSB_REPORT or DS4_REPORT, the report of a VIGEM_TARGET_TYPE
+    """
+    return vcom.XUSB_REPORT if target_type == vcom.VIGEM_TARGET_TYPE.Xbox360Wired else vcom.DS4_REPORT
+
+
+def record_dtype(target_type):
+    """
+    :return: the NumPy dtype of the records of a trace: 'timestamp' (int64, ns) and the fields of the report
+    """
+    rtype = report_type(target_type)
+    report = np.dtype(rtype)
+    names = ['timestamp'] + list(report.names)
+    formats = [np.dtype('<i8')] + [report.fields[name][0] for name in report.names]
+    offsets = [0] + [TIMESTAMP.size + report.fields[name][1] for name in report.names]
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                     'itemsize': TIMESTAMP.size + ctypes.sizeof(rtype)})
+
+
+def index_path(path):
+    """
+    :return: the path of the index of a trace file
+    """
+    return path + '.idx'
+
+
+class TraceWriter:
+    """
+    Writes reports to a trace file, and its index
+
+    Timestamps must be non-decreasing.
+    """
+
+    def __init__(self, path, target_type, index_interval=0.1):
+        """
+        :param path: path of the trace file (overwritten)
+        :param target_type: VIGEM_TARGET_TYPE of the recorded gamepad
+        :param index_interval: time between two entries of the index, in seconds (None = no index)
+        """
+        self.path = path
+        self.target_type = target_type
+        self.report_size = ctypes.sizeof(report_type(target_type))
+        self.nb_records = 0
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, target_type, self.report_size, 0))
+        self._index = None
+        if index_interval is not None:
+            self._interval_ns = max(1, round(index_interval * 1e9))
+            self._next_entry = None  # timestamp from which the next record gets an index entry
+            self._index = open(index_path(path), 'wb')
+            self._index.write(INDEX_HEADER.pack(INDEX_MAGIC, VERSION, 0, self._interval_ns))
+
+    def write(self, report, timestamp=None):
+        """
+        :param report: a XUSB_REPORT or DS4_REPORT, or its bytes
+        :param timestamp: time of the report in ns (None = perf_counter_ns())
+        """
+        data = bytes(report)
+        if len(data) != self.report_size:
+            raise ValueError(f"Expected a report of {self.report_size} bytes, got {len(data)} bytes.")
+        if timestamp is None:
+            timestamp = perf_counter_ns()
+        if self._index is not None and (self._next_entry is None or timestamp >= self._next_entry):
+            offset = HEADER.size + self.nb_records * (TIMESTAMP.size + self.report_size)
+            self._index.write(np.array((timestamp, self.nb_records, offset), dtype=INDEX_DTYPE).tobytes())
+            self._next_entry = timestamp + self._interval_ns
+        self._file.write(TIMESTAMP.pack(timestamp) + data)
+        self.nb_records += 1
+
+    def write_frames(self, frames):
+        """
+        :param frames: (timestamp, report bytes) pairs, e.g. LoopbackBackend.frames
+        """
+        for timestamp, data in frames:
+            self.write(data, timestamp)
+
+    def flush(self):
+        self._file.flush()
+        if self._index is not None:
+            self._index.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if self._index is not None and not self._index.closed:
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RecordingBackend(Backend):
+    """
+    Wraps a backend and records the reports it successfully writes in a trace file
+    """
+
+    def __init__(self, backend, path, index_interval=0.1):
+        """
+        :param backend: the wrapped backend, as accepted by VX360Gamepad(backend=...)
+        :param path: path of the trace file (overwritten), created by create()
+        :param index_interval: see TraceWriter
+        """
+        self.backend = get_backend(backend)
+        self.path = path
+        self.index_interval = index_interval
+        self.writer = None
+        self.SUCCESS = self.backend.SUCCESS
+
+    def create(self, target_type):
+        self.backend.create(target_type)
+        self.writer = TraceWriter(self.path, target_type, self.index_interval)
+
+    def pack(self, report):
+        return bytes(report), self.backend.pack(report)
+
+    def write(self, data):
+        report, packed = data
+        err = self.backend.write(packed)
+        if err == self.SUCCESS:
+            self.writer.write(report)
+        return err
+
+    def written(self, data):
+        return self.backend.written(data[1])
+
+    def error(self, code):
+        return self.backend.error(code)
+
+    def error_name(self, code):
+        return self.backend.error_name(code)
+
+    def close(self):
+        self.backend.close()
+        if self.writer is not None:
+            self.writer.close()
+
+    def is_ready(self):
+        return self.backend.is_ready()
+
+    def register_notification(self, callback_function):
+        self.backend.register_notification(callback_function)
+
+    def unregister_notification(self):
+        self.backend.unregister_notification()
+
+    def submit_extended(self, extended_report):
+        return self.backend.submit_extended(extended_report)
+
+    def replug(self):
+        self.backend.replug()
+
+    def get_vid(self):
+        return self.backend.get_vid()
+
+    def get_pid(self):
+        return self.backend.get_pid()
+
+    def set_vid(self, vid):
+        self.backend.set_vid(vid)
+
+    def set_pid(self, pid):
+        self.backend.set_pid(pid)
+
+    def get_index(self):
+        return self.backend.get_index()
+
+    def get_type(self):
+        return self.backend.get_type()
+
+
+class Trace:
+    """
+    Read-only, memory-mapped trace file
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of a trace file written by a TraceWriter
+        """
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            f.seek(0, 2)
+            file_size = f.tell()
+        if len(header) < HEADER.size:
+            raise ValueError(f"{path} is not a vgamepad trace.")
+        magic, version, target_type, report_size, _ = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a vgamepad trace (version {VERSION}).")
+        self.path = path
+        self.target_type = vcom.VIGEM_TARGET_TYPE(target_type)
+        self.report_type = report_type(self.target_type)
+        self.dtype = record_dtype(self.target_type)
+        if report_size != ctypes.sizeof(self.report_type):
+            raise ValueError(f"{path} has reports of {report_size} bytes instead of {ctypes.sizeof(self.report_type)}.")
+        nb_records = (file_size - HEADER.size) // self.dtype.itemsize  # an incomplete last record is ignored
+        if nb_records:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=HEADER.size, shape=(nb_records, ))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+        self.index = load_index(path)  # None if the trace has no index
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        return self.records['timestamp']
+
+    def report(self, i):
+        """
+        :return: the i-th report, as a XUSB_REPORT or DS4_REPORT
+        """
+        return self.report_type.from_buffer_copy(self.records[i].tobytes(), TIMESTAMP.size)
+
+    def seek(self, timestamp):
+        """
+        Finds the record in effect at a time, in O(log n): with the index, the search only reads
+        the records of one index interval
+
+        :param timestamp: time in ns
+        :return: number of the last record whose timestamp is lower or equal, -1 if there is none
+        """
+        start, stop = 0, len(self)
+        if self.index is not None and len(self.index):
+            entry = int(np.searchsorted(self.index['timestamp'], timestamp, 'right')) - 1
+            if entry < 0:
+                return -1
+            start = int(self.index['record'][entry])
+            if entry + 1 < len(self.index):
+                stop = min(stop, int(self.index['record'][entry + 1]))
+        return start + int(np.searchsorted(self.timestamps[start:stop], timestamp, 'right')) - 1
+
+    def report_at(self, timestamp):
+        """
+        :param timestamp: time in ns
+        :return: the report in effect at this time (XUSB_REPORT or DS4_REPORT), None before the first record
+        """
+        i = self.seek(timestamp)
+        return None if i < 0 else self.report(i)
+
+    def buttons(self):
+        """
+        :return: dict {button: column of the report holding its bit}, for the XUSB_BUTTON
+            (including the directional pad), or the DS4_BUTTONS and DS4_SPECIAL_BUTTONS
+        """
+        if self.report_type is vcom.XUSB_REPORT:
+            return {button: 'wButtons' for button in vcom.XUSB_BUTTON}
+        buttons = {button: 'wButtons' for button in vcom.DS4_BUTTONS}
+        buttons.update({button: 'bSpecial' for button in vcom.DS4_SPECIAL_BUTTONS})
+        return buttons
+
+    def _chunks(self, field):
+        """
+        Yields (previous value, chunk) for a column, the previous value being the last value of the previous chunk
+        (the first value of the column for the first chunk)
+        """
+        column = self.records[field]
+        previous = column[:1]
+        for start in range(0, len(column), CHUNK):
+            chunk = np.asarray(column[start:start + CHUNK])
+            yield np.concatenate((previous, chunk[:-1])), chunk
+            previous = chunk[-1:]
+
+    def press_counts(self):
+        """
+        :return: dict {button: number of presses}, a button held in the first record counting as a press
+        """
+        buttons = self.buttons()
+        counts = dict.fromkeys(buttons, 0)
+        for field in set(buttons.values()):
+            flags = [button for button, f in buttons.items() if f == field]
+            first = True
+            for previous, chunk in self._chunks(field):
+                pressed = chunk & ~previous
+                if first:
+                    pressed[0] = chunk[0]
+                    first = False
+                for button in flags:
+                    counts[button] += int(np.count_nonzero(pressed & button))
+        return counts
+
+    def hold_durations(self, button):
+        """
+        :param button: a XUSB_BUTTON, DS4_BUTTONS or DS4_SPECIAL_BUTTONS
+        :return: array of the durations of the presses of the button in ns, from the record where it is pressed
+            to the record where it is released (a press not released at the end of the trace is ignored)
+        """
+        field = self.buttons()[button]
+        starts = []
+        stops = []
+        offset = 0
+        first = True
+        for previous, chunk in self._chunks(field):
+            held = (chunk & button) != 0
+            was_held = (previous & button) != 0
+            if first:
+                was_held[0] = False
+                first = False
+            starts.append(np.flatnonzero(held & ~was_held) + offset)
+            stops.append(np.flatnonzero(~held & was_held) + offset)
+            offset += len(chunk)
+        starts = np.concatenate(starts) if starts else np.zeros(0, dtype=np.intp)
+        stops = np.concatenate(stops) if stops else np.zeros(0, dtype=np.intp)
+        timestamps = self.timestamps
+        return np.asarray(timestamps[stops]) - np.asarray(timestamps[starts[:len(stops)]])
+
+    def dpad(self):
+        """
+        Yields the directional pad states, as arrays of at most CHUNK records
+
+        The states are bitmasks of the XUSB_GAMEPAD_DPAD_* buttons (Xbox 360), or DS4_DPAD_DIRECTIONS values
+        (DualShock 4). Use np.concatenate(list(trace.dpad())) to get them all at once.
+        """
+        column = self.records['wButtons']
+        for start in range(0, len(column), CHUNK):
+            yield np.asarray(column[start:start + CHUNK]) & 0xF
+
+    def stick_histogram(self, stick='left', bins=32):
+        """
+        :param stick: 'left' or 'right'
+        :param bins: number of bins per axis
+        :return: (histogram, x edges, y edges), histogram[i, j] being the number of records with X in bin i
+            and Y in bin j, over the full range of the axes
+        """
+        side = {'left': 'L', 'right': 'R'}[stick]
+        if self.report_type is vcom.XUSB_REPORT:
+            x_field, y_field, value_range = f'sThumb{side}X', f'sThumb{side}Y', (-32768, 32768)
+        else:
+            x_field, y_field, value_range = f'bThumb{side}X', f'bThumb{side}Y', (0, 256)
+        edges = np.linspace(value_range[0], value_range[1], bins + 1)
+        histogram = np.zeros((bins, bins), dtype=np.int64)
+        x_column, y_column = self.records[x_field], self.records[y_field]
+        for start in range(0, len(self), CHUNK):
+            h, _, _ = np.histogram2d(x_column[start:start + CHUNK], y_column[start:start + CHUNK], bins=(edges, edges))
+            histogram += h.astype(np.int64)
+        return histogram, edges, edges
+
+    def interval_stats(self):
+        """
+        The statistics are computed chunk by chunk. p50 and p99 are estimated from a histogram with
+        INTERVAL_BUCKETS logarithmic buckets per power of two (relative error below 1.1 %).
+
+        :return: dict of statistics of the time between consecutive records, in ns
+            ('count', 'min', 'mean', 'std', 'p50', 'p99', 'max'), None if the trace has less than 2 records
+        """
+        if len(self) < 2:
+            return None
+        count = 0
+        mean = 0.0
+        m2 = 0.0  # sum of the squared differences to the mean
+        minimum = maximum = None
+        histogram = np.zeros(64 * INTERVAL_BUCKETS + 1, dtype=np.int64)  # bucket 0: intervals <= 0
+        first = True
+        for previous, chunk in self._chunks('timestamp'):
+            intervals = chunk - previous
+            if first:
+                intervals = intervals[1:]  # the first record has no previous record
+                first = False
+                if not len(intervals):
+                    continue
+            n = len(intervals)
+            chunk_mean = float(intervals.mean())
+            chunk_m2 = float(np.square(intervals - chunk_mean).sum())
+            delta = chunk_mean - mean
+            total = count + n
+            mean += delta * n / total
+            m2 += chunk_m2 + delta * delta * count * n / total  # parallel variance (Chan et al.)
+            count = total
+            low, high = int(intervals.min()), int(intervals.max())
+            minimum = low if minimum is None else min(minimum, low)
+            maximum = high if maximum is None else max(maximum, high)
+            positive = np.maximum(intervals, 1)
+            buckets = np.where(intervals > 0, 1 + np.floor(np.log2(positive) * INTERVAL_BUCKETS).astype(np.int64), 0)
+            histogram += np.bincount(buckets, minlength=len(histogram))
+        cumulated = np.cumsum(histogram)
+
+        def percentile(q):
+            bucket = int(np.searchsorted(cumulated, int(q / 100 * (count - 1)), 'right'))
+            value = 0.0 if bucket == 0 else 2 ** ((bucket - 0.5) / INTERVAL_BUCKETS)  # middle of the bucket
+            return float(min(max(value, minimum), maximum))
+
+        return {
+            'count': count,
+            'min': minimum,
+            'mean': mean,
+            'std': (m2 / count) ** 0.5,
+            'p50': percentile(50),
+            'p99': percentile(99),
+            'max': maximum,
+        }
+
+    def close(self):
+        """
+        Releases the mapping of the trace (unmapped once the arrays taken from self.records are released as well)
+        """
+        self.records = np.zeros(0, dtype=self.dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_index(path):
+    """
+    :param path: path of a trace file
+    :return: the entries of its index as an array of INDEX_DTYPE, None if there is no valid index
+    """
+    try:
+        with open(index_path(path), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < INDEX_HEADER.size or INDEX_HEADER.unpack_from(data)[:2] != (INDEX_MAGIC, VERSION):
+        return None
+    nb_entries = (len(data) - INDEX_HEADER.size) // INDEX_DTYPE.itemsize
+    return np.frombuffer(data, INDEX_DTYPE, nb_entries, INDEX_HEADER.size)
+
+
+def build_index(path, index_interval=0.1):
+    """
+    Writes the index of an existing trace file (e.g. recorded with index_interval=None)
+
+    :param path: path of the trace file
+    :param index_interval: time between two entries of the index, in seconds
+    """
+    interval_ns = max(1, round(index_interval * 1e9))
+    with Trace(path) as trace:
+        timestamps = trace.timestamps
+        record_size = trace.dtype.itemsize
+        entries = []
+        i = 0
+        while i < len(timestamps):
+            entries.append((int(timestamps[i]), i, HEADER.size + i * record_size))
+            i += int(np.searchsorted(timestamps[i:i + CHUNK], timestamps[i] + interval_ns, 'left'))
+    tmp = index_path(path) + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, VERSION, 0, interval_ns))
+        f.write(np.array(entries, dtype=INDEX_DTYPE).tobytes())
+    os.replace(tmp, index_path(path))
+
+
+def replay(gamepad, trace, start=None, stop=None, speed=1.0):
+    """
+    Replays a segment of a trace on a gamepad, with the timing of the recording (blocks during the segment)
+
+    The reports are copied in gamepad.report. The gamepad first gets the report in effect
+    at the start of the segment, found with seek().
+
+    :param gamepad: a gamepad of the type of the trace
+    :param trace: a Trace
+    :param start: time of the start of the segment in ns (None = first record)
+    :param stop: time of the end of the segment in ns, included (None = last record)
+    :param speed: replay speed (2.0 = twice as fast)
+    :return: the number of sent reports
+    """
+    if len(trace) == 0:
+        return 0
+    timestamps = trace.timestamps
+    if start is None:
+        start = int(timestamps[0])
+    first = max(trace.seek(start), 0)
+    last = len(trace) - 1 if stop is None else trace.seek(stop)
+    if last < first:
+        return 0
+    if gamepad.target_type() != trace.target_type:
+        raise ValueError("The trace was not recorded for this type of gamepad.")
+    size = ctypes.sizeof(gamepad.report)
+    record_size = trace.dtype.itemsize
+    t0 = perf_counter_ns()
+    nb_reports = 0
+    for chunk_start in range(first, last + 1, CHUNK):
+        chunk = trace.records[chunk_start:min(chunk_start + CHUNK, last + 1)]
+        data = chunk.tobytes()
+        times = np.asarray(chunk['timestamp'])
+        for j in range(len(chunk)):
+            delay = (t0 + (max(int(times[j]), start) - start) / speed - perf_counter_ns()) / 1e9
+            if delay > 0:
+                sleep(delay)
+            frame = gamepad._frame()
+            ctypes.memmove(ctypes.addressof(frame), data[j * record_size + TIMESTAMP.size:(j + 1) * record_size], size)
+            gamepad._update_report(frame)
+            nb_reports += 1
+    return nb_reports
@@ -0,0 +1,208 @@
+"""
+Smooth analog trajectories for joysticks and triggers
+
+A trajectory gives the position of a control for t in [0, 1]: a (x, y) point for joysticks
+and a value for triggers, in the ranges of the *_float setters of the gamepads.
+Its samples are computed lazily, at the rate of the updates:
+    play(gamepad, {'left_joystick': Line((0.0, 0.0), (1.0, 0.0), easing=ease_in_out),
+                   'right_trigger': Line(0.0, 1.0)}, duration=0.2)
+Trajectories can also be appended to a Macro (see add_to_macro()).
+"""
+
+import math
+from abc import ABC, abstractmethod
+from time import perf_counter, sleep
+
+from vgamepad.macro import _Scratch
+
+
+def linear(t):
+    return t
+
+
+def ease_in(t):
+    return t * t * t
+
+
+def ease_out(t):
+    t = 1.0 - t
+    return 1.0 - t * t * t
+
+
+def ease_in_out(t):
+    return t * t * (3.0 - 2.0 * t)  # smoothstep
+
+
+def _as_point(value):
+    return tuple(value) if isinstance(value, (tuple, list)) else (value, )
+
+
+class Trajectory(ABC):
+    """
+    Position of a control as a function of t in [0, 1]
+    """
+
+    def __init__(self, easing=linear, scalar=False):
+        """
+        :param easing: function mapping [0, 1] to [0, 1], applied to t (e.g. linear, ease_in_out)
+        :param scalar: True if positions are values (triggers) instead of (x, y) points (joysticks)
+        """
+        self.easing = easing
+        self.scalar = scalar
+
+    @abstractmethod
+    def point(self, s):
+        """
+        :param s: eased time in [0, 1]
+        :return: the position as a tuple of coordinates
+        """
+        pass
+
+    def at(self, t):
+        """
+        :param t: time in [0, 1]
+        :return: the position of the control, a (x, y) point or a value
+        """
+        p = self.point(self.easing(t))
+        return p[0] if self.scalar else p
+
+    def samples(self, nb_samples):
+        """
+        Lazily computes positions at regular times from t = 0 to t = 1 included
+
+        :param nb_samples: number of positions (at least 2)
+        """
+        last = nb_samples - 1
+        for i in range(nb_samples):
+            yield self.at(i / last)
+
+
+class Line(Trajectory):
+    """
+    Straight line from a start to an end position
+    """
+
+    def __init__(self, start, end, easing=linear):
+        """
+        :param start: start position, (x, y) point or value
+        :param end: end position, (x, y) point or value
+        """
+        super().__init__(easing, scalar=not isinstance(start, (tuple, list)))
+        self.start = _as_point(start)
+        self.end = _as_point(end)
+
+    def point(self, s):
+        return tuple(a + (b - a) * s for a, b in zip(self.start, self.end))
+
+
+class Bezier(Trajectory):
+    """
+    Bezier curve (quadratic with 3 control points, cubic with 4, etc.)
+    """
+
+    def __init__(self, *control_points, easing=linear):
+        """
+        :param control_points: positions, (x, y) points or values (the curve goes through the first and the last)
+        """
+        if len(control_points) < 2:
+            raise ValueError("A Bezier curve needs at least 2 control points.")
+        super().__init__(easing, scalar=not isinstance(control_points[0], (tuple, list)))
+        self.control_points = [_as_point(p) for p in control_points]
+
+    def point(self, s):
+        # De Casteljau's algorithm
+        points = self.control_points
+        while len(points) > 1:
+            points = [tuple(a + (b - a) * s for a, b in zip(p, q)) for p, q in zip(points, points[1:])]
+        return points[0]
+
+
+class Circle(Trajectory):
+    """
+    Arc of circle (joysticks only)
+    """
+
+    def __init__(self, center=(0.0, 0.0), radius=1.0, start_angle=0.0, end_angle=2.0 * math.pi, easing=linear):
+        """
+        :param center: (x, y) center
+        :param radius: radius
+        :param start_angle: angle of the start position, in radians (0 = right, pi / 2 = up)
+        :param end_angle: angle of the end position, in radians (larger than start_angle = counterclockwise)
+        """
+        super().__init__(easing)
+        self.center = center
+        self.radius = radius
+        self.start_angle = start_angle
+        self.end_angle = end_angle
+
+    def point(self, s):
+        angle = self.start_angle + (self.end_angle - self.start_angle) * s
+        return self.center[0] + self.radius * math.cos(angle), self.center[1] + self.radius * math.sin(angle)
+
+
+def _check(moves):
+    """
+    Raises ValueError if a trajectory does not fit its control, before any move
+    """
+    for control, trajectory in moves.items():
+        if control not in ('left_joystick', 'right_joystick', 'left_trigger', 'right_trigger'):
+            raise ValueError(f"Unknown control: {control}.")
+        if trajectory.scalar != control.endswith('trigger'):
+            positions = 'values' if trajectory.scalar else '(x, y) points'
+            raise ValueError(f"{control} cannot follow {type(trajectory).__name__}, whose positions are {positions}.")
+
+
+def _arguments(control, trajectory, nb_samples):
+    """
+    Lazily computes the arguments of the *_float setter of a control, clamped to its range
+    """
+    low = 0.0 if control.endswith('trigger') else -1.0
+    for position in trajectory.samples(nb_samples):
+        if trajectory.scalar:
+            yield min(max(position, low), 1.0),
+        else:
+            yield tuple(min(max(c, low), 1.0) for c in position)
+
+
+def play(gamepad, moves, duration, rate=125.0):
+    """
+    Moves controls of a gamepad along trajectories (blocks for duration seconds)
+
+    :param gamepad: the gamepad
+    :param moves: dict {control: Trajectory}, control being 'left_joystick', 'right_joystick', 'left_trigger'
+        or 'right_trigger' (positions are clamped to the range of the control)
+    :param duration: duration of the moves, in seconds
+    :param rate: number of updates per second
+    """
+    _check(moves)
+    nb_samples = max(1, round(duration * rate)) + 1
+    moves = [(control + '_float', _arguments(control, trajectory, nb_samples)) for control, trajectory in moves.items()]
+    start = perf_counter()
+    for i in range(nb_samples):
+        frame = _Scratch(gamepad._frame(), type(gamepad))  # the setters only modify the report of the frame
+        for setter, arguments in moves:
+            getattr(frame, setter)(*next(arguments))
+        delay = start + i / rate - perf_counter()
+        if delay > 0:
+            sleep(delay)
+        gamepad._update_report(frame.report)
+
+
+def add_to_macro(macro, moves, frames):
+    """
+    Appends moves along trajectories to a macro, from its current frame
+
+    :param macro: a Macro (see vgamepad.macro)
+    :param moves: dict {control: Trajectory} (see play())
+    :param frames: duration of the moves, in frames of the macro
+    :return: the macro, whose current frame is the last frame of the moves
+    """
+    _check(moves)
+    nb_samples = max(1, frames) + 1
+    moves = [(control + '_float', _arguments(control, trajectory, nb_samples)) for control, trajectory in moves.items()]
+    for i in range(nb_samples):
+        if i > 0:
+            macro.wait(1)
+        for setter, arguments in moves:
+            macro.call(setter, *next(arguments))
+    return macro
@@ -0,0 +1,28 @@
+"""
+Internal helpers shared by the Windows and Linux APIs
+"""
+
+import time
+
+
+def wait_until(predicate, timeout, first_delay=0.0005, max_delay=0.01):
+    """
+    Polls predicate() with exponential backoff until it returns True
+
+    :param predicate: function without arguments returning a bool
+    :param timeout: maximum time to wait in seconds (None = wait forever)
+    :param first_delay: first delay between two polls in seconds
+    :param max_delay: maximum delay between two polls in seconds
+    :return: True if predicate() returned True, False if the timeout elapsed
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = first_delay
+    while not predicate():
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            delay = min(delay, remaining)
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+    return True
@@ -0,0 +1,180 @@
+"""
+Actions of Gymnasium-style vector environments, one gamepad per environment (requires NumPy)
+
+A VectorGamepads converts a batch of actions (one row per environment) into the reports of all the gamepads
+with a few vectorized operations on a PadStore (see vgamepad.store), and sends them with one flush():
+    pads = VectorGamepads(VX360Gamepad, nb_envs=16)
+    pads.action_space  # batched Dict space (requires gymnasium)
+    pads.step(pads.action_space.sample())
+
+Actions are dicts of arrays, mirroring the reports:
+    'buttons': MultiBinary, one column per XUSB_BUTTON (Xbox 360), or per DS4_BUTTONS then DS4_SPECIAL_BUTTONS
+    'joysticks': Box in [-1, 1], columns left X, left Y, right X, right Y
+    'triggers': Box in [0, 1], columns left, right
+    'dpad': Discrete, a DS4_DPAD_DIRECTIONS value (DualShock 4 only)
+Analog values are converted as by the *_float setters of the gamepads, after clipping to their range.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+import vgamepad.win.vigem_commons as vcom
+from vgamepad.store import BatchBackend, PadStore, PerRowBackend
+
+
+JOYSTICK_FIELDS = {
+    vcom.XUSB_REPORT: ('sThumbLX', 'sThumbLY', 'sThumbRX', 'sThumbRY'),
+    vcom.DS4_REPORT: ('bThumbLX', 'bThumbLY', 'bThumbRX', 'bThumbRY'),
+}
+TRIGGER_FIELDS = {
+    vcom.XUSB_REPORT: ('bLeftTrigger', 'bRightTrigger'),
+    vcom.DS4_REPORT: ('bTriggerL', 'bTriggerR'),
+}
+
+
+class VectorGamepads:
+    """
+    Gamepads of a vector environment, driven by batches of actions
+    """
+
+    def __init__(self, gamepad_class, nb_envs, backend=None):
+        """
+        :param gamepad_class: VX360Gamepad or VDS4Gamepad
+        :param nb_envs: number of environments (one gamepad each)
+        :param backend: a BatchBackend for all the gamepads, or the backend of each gamepad,
+            as accepted by PerRowBackend (None = default backend of the platform)
+        """
+        if not isinstance(backend, BatchBackend):
+            backend = PerRowBackend(backend)
+        self.store = PadStore(gamepad_class, nb_envs, backend)
+        self.nb_envs = nb_envs
+        self.ds4 = self.store.report_type is vcom.DS4_REPORT
+        if self.ds4:
+            self.buttons = list(vcom.DS4_BUTTONS) + list(vcom.DS4_SPECIAL_BUTTONS)
+            self._nb_main = len(vcom.DS4_BUTTONS)  # columns of buttons in wButtons, the others are in bSpecial
+        else:
+            self.buttons = list(vcom.XUSB_BUTTON)
+            self._nb_main = len(self.buttons)
+        self._flags = np.array([int(b) for b in self.buttons], dtype=np.uint16)
+        self._executor = None
+        self._future = None
+
+    @property
+    def single_action_space(self):
+        """
+        :return: the gymnasium action space of one environment
+        """
+        from gymnasium import spaces
+        action_space = {
+            'buttons': spaces.MultiBinary(len(self.buttons)),
+            'joysticks': spaces.Box(-1.0, 1.0, (4, ), np.float32),
+            'triggers': spaces.Box(0.0, 1.0, (2, ), np.float32),
+        }
+        if self.ds4:
+            action_space['dpad'] = spaces.Discrete(len(vcom.DS4_DPAD_DIRECTIONS))
+        return spaces.Dict(action_space)
+
+    @property
+    def action_space(self):
+        """
+        :return: the gymnasium action space of the batch of environments
+        """
+        from gymnasium.vector.utils import batch_space
+        return batch_space(self.single_action_space, self.nb_envs)
+
+    def apply(self, actions):
+        """
+        Sets the reports of all the gamepads from a batch of actions (not sent yet, see flush())
+
+        :param actions: dict of arrays with one row per environment (see the module documentation);
+            missing keys leave the corresponding fields unchanged
+        """
+        reports = self.store.reports
+        report_type = self.store.report_type
+        buttons = actions.get('buttons')
+        if buttons is not None:
+            buttons = np.asarray(buttons).astype(bool).astype(np.uint16)
+            w_buttons = buttons[:, :self._nb_main] @ self._flags[:self._nb_main]
+            if self.ds4:
+                w_buttons |= reports['wButtons'] & 0xF  # keeps the directional pad
+                reports['bSpecial'] = buttons[:, self._nb_main:] @ self._flags[self._nb_main:]
+            reports['wButtons'] = w_buttons
+        if self.ds4 and actions.get('dpad') is not None:
+            reports['wButtons'] = (reports['wButtons'] & ~np.uint16(0xF)) | np.asarray(actions['dpad']).astype(np.uint16)
+        joysticks = actions.get('joysticks')
+        if joysticks is not None:
+            joysticks = np.clip(np.asarray(joysticks, dtype=np.float64), -1.0, 1.0)
+            if self.ds4:
+                values = (128 + np.rint(joysticks * 127)).astype(np.uint8)
+            else:
+                values = np.rint(joysticks * 32767).astype(np.int16)
+            for i, field in enumerate(JOYSTICK_FIELDS[report_type]):
+                reports[field] = values[:, i]
+        triggers = actions.get('triggers')
+        if triggers is not None:
+            values = np.rint(np.clip(np.asarray(triggers, dtype=np.float64), 0.0, 1.0) * 255).astype(np.uint8)
+            for i, field in enumerate(TRIGGER_FIELDS[report_type]):
+                reports[field] = values[:, i]
+        self.store.mark_dirty()
+
+    def flush(self):
+        """
+        Sends the reports of the gamepads
+
+        :return: the number of sent reports
+        """
+        return self.store.flush()
+
+    def step(self, actions):
+        """
+        Applies a batch of actions and sends the reports
+
+        :param actions: see apply()
+        """
+        self.apply(actions)
+        self.flush()
+
+    def step_async(self, actions):
+        """
+        Applies a batch of actions and sends the reports in a background thread (see step_wait())
+
+        :param actions: see apply() (the arrays must not be modified before step_wait())
+        """
+        if self._future is not None:
+            raise RuntimeError("The previous step_async() is not awaited, see step_wait().")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._future = self._executor.submit(self.step, actions)
+
+    def step_wait(self, timeout=None):
+        """
+        Waits for the end of the last step_async(), and raises its exception if any
+
+        :param timeout: maximum time to wait in seconds (None = wait forever)
+        """
+        future = self._future
+        if future is None:
+            return
+        if not wait((future, ), timeout).done:
+            raise TimeoutError("The step is still running.")
+        self._future = None
+        future.result()
+
+    def close(self):
+        """
+        Waits for the running step and closes the gamepads
+        """
+        try:
+            self.step_wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,624 @@
+"""
+VGamepad API (all platforms)
+
+The gamepads build their report here, and a backend (see vgamepad.backend) sends it to the virtual device.
+"""
+
+from abc import ABC, abstractmethod
+from inspect import signature  # Check if user defined callback function is legal
+
+import vgamepad.win.vigem_commons as vcom
+import vgamepad.registry as registry
+import vgamepad.instrument as instrument
+import vgamepad.metrics as metrics
+from vgamepad.backend import get_backend
+from vgamepad.coalesce import Coalescer
+from vgamepad.lockstep import Lockstep
+from vgamepad.util import wait_until
+
+
+def dummy_callback(client, target, large_motor, small_motor, led_number, user_data):
+    """
+    Pattern for callback functions to be registered as notifications
+
+    :param client: vigem bus ID
+    :param target: vigem device ID
+    :param large_motor: integer in [0, 255] representing the state of the large motor
+    :param small_motor: integer in [0, 255] representing the state of the small motor
+    :param led_number: integer in [0, 255] representing the state of the LED ring
+    :param user_data: placeholder, do not use
+    """
+    pass
+
+
+class VGamepad(ABC):
+
+    __slots__ = ('backend', 'report', 'front', 'counters', 'skip_unchanged', 'supervisor', 'coalescer', 'lockstep',
+                 '_sent_state', '_closed', '__weakref__')
+
+    def __init__(self, backend=None):
+        """
+        :param backend: None (default backend of the platform), name of a registered backend (e.g. 'loopback'),
+            or Backend (see vgamepad.backend)
+        """
+        self.backend = get_backend(backend)
+        self.counters = metrics.Counters()
+        self.skip_unchanged = False  # when True, update() does nothing if the report has not changed
+        self.supervisor = None  # see vgamepad.win.supervisor
+        self.coalescer = None  # see enable_coalescing()
+        self.lockstep = None  # see enable_lockstep()
+        self._sent_state = None
+        self.report = self.get_default_report()
+        self.front = None  # last committed frame, see commit()
+        self._closed = True
+        self.backend.create(self.target_type())
+        self._closed = False
+        registry.register(self)
+        self.update()
+
+    @abstractmethod
+    def target_type(self):
+        """
+        :return: the VIGEM_TARGET_TYPE of the gamepad
+        """
+        pass
+
+    @abstractmethod
+    def get_default_report(self):
+        """
+        :return: the report of the gamepad in its default state
+        """
+        pass
+
+    def reset(self):
+        """
+        Resets the report to the default state, and drops the committed frame (see commit())
+        """
+        self.report = self.get_default_report()
+        self.front = None
+
+    def close(self):
+        """
+        Destroys the virtual device (no effect if already closed)
+        """
+        if not self._closed:
+            self.disable_coalescing()
+            self.disable_lockstep()
+            self._closed = True
+            registry.unregister(self)
+            metrics.retire(self.counters)
+            self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, '_closed', True):  # not set if __init__ failed
+            self.close()
+
+    def get_vid(self):
+        """
+        :return: the vendor ID of the virtual device
+        """
+        return self.backend.get_vid()
+
+    def get_pid(self):
+        """
+        :return: the product ID of the virtual device
+        """
+        return self.backend.get_pid()
+
+    def set_vid(self, vid):
+        """
+        :param: the new vendor ID of the virtual device
+        """
+        self.backend.set_vid(vid)
+
+    def set_pid(self, pid):
+        """
+        :param: the new product ID of the virtual device
+        """
+        self.backend.set_pid(pid)
+
+    def get_index(self):
+        """
+        :return: the internally used index of the target device
+        """
+        return self.backend.get_index()
+
+    def get_type(self):
+        """
+        :return: the type of the object (e.g. VIGEM_TARGET_TYPE.Xbox360Wired)
+        """
+        return self.backend.get_type()
+
+    def is_ready(self):
+        """
+        :return: True if the device is visible to other applications (e.g. games, SDL)
+        """
+        return self.backend.is_ready()
+
+    def wait_ready(self, timeout=1.0):
+        """
+        Waits until the device is visible to other applications (e.g. games, SDL)
+
+        :param timeout: maximum time to wait in seconds (None = wait forever)
+        :return: True if the device is ready, False if the timeout elapsed
+        """
+        return wait_until(self.is_ready, timeout)
+
+    def stats(self):
+        """
+        :return: snapshot of the activity counters of the gamepad (see vgamepad.metrics)
+        """
+        return self.counters.snapshot()
+
+    def update(self, report=None):
+        """
+        Sends the current report (i.e. commands) to the virtual device
+
+        Raises an exception if the backend returns an error (see try_update() for a non-raising version)
+
+        :param report: report to send instead of the current report (which is left unchanged)
+        """
+        err = self.try_update(report)
+        if err != self.backend.SUCCESS:
+            if self.supervisor is not None and self.supervisor.recover(self, err):
+                return
+            raise self.backend.error(err)
+
+    def try_update(self, report=None):
+        """
+        Sends the current report (i.e. commands) to the virtual device, without raising on errors
+
+        Useful to retry or back off on transient errors in high-frequency loops
+
+        :param report: report to send instead of the current report (which is left unchanged)
+        :return: the error code of the backend (e.g. VIGEM_ERROR_NONE on Windows, 0 on Linux, on success)
+        """
+        if instrument.ENABLED:
+            err = instrument.timed_update(self, report)
+            return self.backend.SUCCESS if err is None else err
+        if report is None:
+            report = self.report if self.front is None else self.front
+        if self._skip(report):
+            return self.backend.SUCCESS
+        return self._write(self.backend.pack(report))
+
+    def commit(self):
+        """
+        Publishes a copy of the current report as the frame sent by update() and try_update() (double buffering)
+
+        Once a frame is committed, update() sends the last committed frame instead of the current report,
+        which becomes a back buffer that setters can modify from another thread without tearing the sent frames.
+        The frame is swapped in by a single reference assignment, without lock.
+        Call uncommit() or reset() to send the current report again.
+        """
+        self.front = type(self.report).from_buffer_copy(self.report)
+
+    def uncommit(self):
+        """
+        Makes update() send the current report again (see commit())
+        """
+        self.front = None
+
+    def _frame(self):
+        """
+        Used by the modules that modify the report in place (e.g. MacroPlayer, InputMerger), with _update_report()
+
+        :return: the report to modify: the current report, or a private copy of the committed frame if a frame
+            is committed (see commit()), as the current report may be modified by another thread meanwhile
+        """
+        front = self.front
+        return self.report if front is None else type(front).from_buffer_copy(front)
+
+    def _update_report(self, frame=None):
+        """
+        Sends a report modified in place
+
+        :param frame: report returned by _frame() and modified since (None = the current report).
+            A copy of the committed frame is swapped in as the new committed frame, replacing a frame
+            committed meanwhile.
+        """
+        if frame is not None and frame is not self.report:
+            self.front = frame
+        self.update()
+
+    def enable_coalescing(self, rate=250.0, max_pending=64):
+        """
+        Enables submit(): submitted frames are sent by a background thread, at most at the given rate
+
+        Waiting frames are replaced by newer frames with the same buttons (see vgamepad.coalesce).
+
+        :param rate: maximum number of frames sent per second
+        :param max_pending: maximum number of frames waiting to be sent (submit() waits when reached)
+        """
+        self.disable_coalescing()
+        self.coalescer = Coalescer(self, rate, max_pending)
+
+    def disable_coalescing(self):
+        """
+        Sends the waiting frames and disables submit() (no effect if coalescing is not enabled)
+        """
+        if self.coalescer is not None:
+            self.coalescer.close()
+            self.coalescer = None
+
+    def submit(self, frame=None, timeout=None):
+        """
+        Submits a frame to be sent by the coalescing thread (see enable_coalescing())
+
+        :param frame: the report to send (copied), None for the current report
+        :param timeout: maximum time to wait while the maximum number of frames is waiting, in seconds
+            (None = wait forever)
+        :return: True if the frame is submitted, False if the timeout elapsed
+        """
+        if self.coalescer is None:
+            raise RuntimeError("Coalescing is not enabled, see enable_coalescing().")
+        return self.coalescer.submit(self.report if frame is None else frame, timeout)
+
+    def enable_lockstep(self, depth=8):
+        """
+        Enables schedule() and step(): the report changes only when the emulator steps to a new frame
+
+        See vgamepad.lockstep. update() should not be called by other means meanwhile.
+
+        :param depth: maximum number of frames scheduled ahead
+        """
+        self.disable_lockstep()
+        self.lockstep = Lockstep(self, depth)
+
+    def disable_lockstep(self):
+        """
+        Drops the scheduled frames and disables schedule() and step() (no effect if lockstep is not enabled)
+        """
+        if self.lockstep is not None:
+            self.lockstep.close()
+            self.lockstep = None
+
+    def schedule(self, frame_no, frame=None, timeout=None):
+        """
+        Schedules a frame to be sent by step(frame_no) (see enable_lockstep())
+
+        :param frame_no: number of the frame, larger than the previously stepped and scheduled frames
+        :param frame: the report to send (copied), None for the current report
+        :param timeout: maximum time to wait while the maximum number of frames is scheduled, in seconds
+            (None = wait forever)
+        :return: True if the frame is scheduled, False if the timeout elapsed
+        """
+        if self.lockstep is None:
+            raise RuntimeError("Lockstep is not enabled, see enable_lockstep().")
+        return self.lockstep.schedule(frame_no, self.report if frame is None else frame, timeout)
+
+    def step(self, frame_no):
+        """
+        Sends the frame scheduled for frame_no, from the calling thread (see enable_lockstep())
+
+        :param frame_no: number of the frame that starts
+        :return: True if a frame was sent, False if the previous frame is kept
+        """
+        if self.lockstep is None:
+            raise RuntimeError("Lockstep is not enabled, see enable_lockstep().")
+        return self.lockstep.step(frame_no)
+
+    def replug(self):
+        """
+        Plugs a new virtual device in place of the current one and sends the current report
+
+        The VID/PID and the notification callback are kept.
+        Used to recover when the device or its connection is lost (e.g. after VBus.reconnect() on Windows).
+        """
+        self.backend.replug()
+        self._sent_state = None
+        err = self._write(self.backend.pack(self.report if self.front is None else self.front))
+        if err != self.backend.SUCCESS:
+            raise self.backend.error(err)
+
+    def register_notification(self, callback_function):
+        """
+        Registers a callback function that can handle force feedback, leds, etc.
+
+        :param: a function of the form: my_func(client, target, large_motor, small_motor, led_number, user_data)
+        """
+        if not signature(callback_function) == signature(dummy_callback):
+            raise TypeError("Needed callback function signature: {}, but got: {}".format(signature(dummy_callback), signature(callback_function)))
+        counters = self.counters  # no reference to self, which holds the callback
+
+        def notification(client, target, large_motor, small_motor, led_number, user_data):
+            counters.notifications += 1
+            callback_function(client, target, large_motor, small_motor, led_number, user_data)
+
+        self.backend.register_notification(notification)
+
+    def unregister_notification(self):
+        """
+        Unregisters a previously registered callback function.
+        """
+        self.backend.unregister_notification()
+
+    def _read(self, report=None):
+        if report is None:
+            return self.report if self.front is None else self.front
+        return report
+
+    def _skip(self, report):
+        self.counters.updates += 1
+        if self.skip_unchanged:
+            state = bytes(report)
+            if state == self._sent_state:
+                self.counters.skipped += 1
+                return True
+            self._sent_state = state
+        return False
+
+    def _pack(self, report):
+        return self.backend.pack(report)
+
+    def _write(self, data):
+        backend = self.backend
+        err = backend.write(data)
+        if err != backend.SUCCESS:
+            self._sent_state = None
+            self.counters.error(backend.error_name(err))
+        else:
+            writes, nb_bytes = backend.written(data)
+            self.counters.writes += writes
+            self.counters.bytes += nb_bytes
+        return err
+
+
+class VX360Gamepad(VGamepad):
+    """
+    Virtual XBox360 gamepad
+    """
+
+    __slots__ = ()
+
+    def target_type(self):
+        return vcom.VIGEM_TARGET_TYPE.Xbox360Wired
+
+    def get_default_report(self):
+        return vcom.XUSB_REPORT(
+            wButtons=0,
+            bLeftTrigger=0,
+            bRightTrigger=0,
+            sThumbLX=0,
+            sThumbLY=0,
+            sThumbRX=0,
+            sThumbRY=0)
+
+    def press_button(self, button):
+        """
+        Presses a button (no effect if already pressed)
+        All possible buttons are in XUSB_BUTTON
+        Note: The GUIDE button is not available on Linux
+
+        :param: a XUSB_BUTTON field, e.g. XUSB_BUTTON.XUSB_GAMEPAD_X
+        """
+        self.report.wButtons = self.report.wButtons | button
+
+    def release_button(self, button):
+        """
+        Releases a button (no effect if already released)
+        All possible buttons are in XUSB_BUTTON
+
+        :param: a XUSB_BUTTON field, e.g. XUSB_BUTTON.XUSB_GAMEPAD_X
+        """
+        self.report.wButtons = self.report.wButtons & ~button
+
+    def left_trigger(self, value):
+        """
+        Sets the value of the left trigger
+
+        :param: integer between 0 and 255 (0 = trigger released)
+        """
+        self.report.bLeftTrigger = value
+
+    def right_trigger(self, value):
+        """
+        Sets the value of the right trigger
+
+        :param: integer between 0 and 255 (0 = trigger released)
+        """
+        self.report.bRightTrigger = value
+
+    def left_trigger_float(self, value_float):
+        """
+        Sets the value of the left trigger
+
+        :param: float between 0.0 and 1.0 (0.0 = trigger released)
+        """
+        self.left_trigger(round(value_float * 255))
+
+    def right_trigger_float(self, value_float):
+        """
+        Sets the value of the right trigger
+
+        :param: float between 0.0 and 1.0 (0.0 = trigger released)
+        """
+        self.right_trigger(round(value_float * 255))
+
+    def left_joystick(self, x_value, y_value):
+        """
+        Sets the values of the X and Y axis for the left joystick
+
+        :param: integer between -32768 and 32767 (0 = neutral position)
+        """
+        self.report.sThumbLX = x_value
+        self.report.sThumbLY = y_value
+
+    def right_joystick(self, x_value, y_value):
+        """
+        Sets the values of the X and Y axis for the right joystick
+
+        :param: integer between -32768 and 32767 (0 = neutral position)
+        """
+        self.report.sThumbRX = x_value
+        self.report.sThumbRY = y_value
+
+    def left_joystick_float(self, x_value_float, y_value_float):
+        """
+        Sets the values of the X and Y axis for the left joystick
+
+        :param: float between -1.0 and 1.0 (0 = neutral position)
+        """
+        self.left_joystick(round(x_value_float * 32767), round(y_value_float * 32767))
+
+    def right_joystick_float(self, x_value_float, y_value_float):
+        """
+        Sets the values of the X and Y axis for the right joystick
+
+        :param: float between -1.0 and 1.0 (0 = neutral position)
+        """
+        self.right_joystick(round(x_value_float * 32767), round(y_value_float * 32767))
+
+
+class VDS4Gamepad(VGamepad):
+    """
+    Virtual DualShock 4 gamepad
+    """
+
+    __slots__ = ()
+
+    def target_type(self):
+        return vcom.VIGEM_TARGET_TYPE.DualShock4Wired
+
+    def get_default_report(self):
+        rep = vcom.DS4_REPORT(
+            bThumbLX=0,
+            bThumbLY=0,
+            bThumbRX=0,
+            bThumbRY=0,
+            wButtons=0,
+            bSpecial=0,
+            bTriggerL=0,
+            bTriggerR=0)
+        vcom.DS4_REPORT_INIT(rep)
+        return rep
+
+    def press_button(self, button):
+        """
+        Presses a button (no effect if already pressed)
+        All possible buttons are in DS4_BUTTONS
+
+        :param: a DS4_BUTTONS field, e.g. DS4_BUTTONS.DS4_BUTTON_TRIANGLE
+        """
+        self.report.wButtons = self.report.wButtons | button
+
+    def release_button(self, button):
+        """
+        Releases a button (no effect if already released)
+        All possible buttons are in DS4_BUTTONS
+
+        :param: a DS4_BUTTONS field, e.g. DS4_BUTTONS.DS4_BUTTON_TRIANGLE
+        """
+        self.report.wButtons = self.report.wButtons & ~button
+
+    def press_special_button(self, special_button):
+        """
+        Presses a special button (no effect if already pressed)
+        All possible buttons are in DS4_SPECIAL_BUTTONS
+
+        :param: a DS4_SPECIAL_BUTTONS field, e.g. DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_TOUCHPAD
+        """
+        self.report.bSpecial = self.report.bSpecial | special_button
+
+    def release_special_button(self, special_button):
+        """
+        Releases a special button (no effect if already released)
+        All possible buttons are in DS4_SPECIAL_BUTTONS
+
+        :param: a DS4_SPECIAL_BUTTONS field, e.g. DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_TOUCHPAD
+        """
+        self.report.bSpecial = self.report.bSpecial & ~special_button
+
+    def left_trigger(self, value):
+        """
+        Sets the value of the left trigger
+
+        :param: integer between 0 and 255 (0 = trigger released)
+        """
+        self.report.bTriggerL = value
+
+    def right_trigger(self, value):
+        """
+        Sets the value of the right trigger
+
+        :param: integer between 0 and 255 (0 = trigger released)
+        """
+        self.report.bTriggerR = value
+
+    def left_trigger_float(self, value_float):
+        """
+        Sets the value of the left trigger
+
+        :param: float between 0.0 and 1.0 (0.0 = trigger released)
+        """
+        self.left_trigger(round(value_float * 255))
+
+    def right_trigger_float(self, value_float):
+        """
+        Sets the value of the right trigger
+
+        :param: float between 0.0 and 1.0 (0.0 = trigger released)
+        """
+        self.right_trigger(round(value_float * 255))
+
+    def left_joystick(self, x_value, y_value):
+        """
+        Sets the values of the X and Y axis for the left joystick
+
+        :param: integer between 0 and 255 (128 = neutral position)
+        """
+        self.report.bThumbLX = x_value
+        self.report.bThumbLY = y_value
+
+    def right_joystick(self, x_value, y_value):
+        """
+        Sets the values of the X and Y axis for the right joystick
+
+        :param: integer between 0 and 255 (128 = neutral position)
+        """
+        self.report.bThumbRX = x_value
+        self.report.bThumbRY = y_value
+
+    def left_joystick_float(self, x_value_float, y_value_float):
+        """
+        Sets the values of the X and Y axis for the left joystick
+
+        :param: float between -1.0 and 1.0 (0 = neutral position)
+        """
+        self.left_joystick(128 + round(x_value_float * 127), 128 + round(y_value_float * 127))
+
+    def right_joystick_float(self, x_value_float, y_value_float):
+        """
+        Sets the values of the X and Y axis for the right joystick
+
+        :param: float between -1.0 and 1.0 (0 = neutral position)
+        """
+        self.right_joystick(128 + round(x_value_float * 127), 128 + round(y_value_float * 127))
+
+    def directional_pad(self, direction):
+        """
+        Sets the direction of the directional pad (hat)
+        All possible directions are in DS4_DPAD_DIRECTIONS
+
+        :param: a DS4_DPAD_DIRECTIONS field, e.g. DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_NORTHWEST
+        """
+        vcom.DS4_SET_DPAD(self.report, direction)
+
+    def update_extended_report(self, extended_report):
+        """
+        Enables using DS4_REPORT_EX instead of DS4_REPORT (advanced users only)
+        If you don't know what this is about, you can safely ignore this function
+
+        :param: a DS4_REPORT_EX
+        """
+        self._sent_state = None  # the next update() must overwrite the extended report
+        err = self.backend.submit_extended(extended_report)
+        if err != self.backend.SUCCESS:
+            self.counters.error(self.backend.error_name(err))
+            raise self.backend.error(err)
@@ -0,0 +1,110 @@
+"""
+Automatic recovery from ViGEmBus failures (Windows)
+
+When update() fails because the bus connection or the target device is lost, a supervised gamepad
+reconnects the bus if needed, plugs its target device in again and sends its last report,
+instead of raising. A reconnection plugs in again all the gamepads of the bus, supervised or not.
+
+Usage:
+    supervisor = Supervisor(health_callback=print)
+    gamepad = VX360Gamepad(backend='vigem')
+    supervisor.supervise(gamepad)
+"""
+
+import threading
+import time
+
+import vgamepad.win.vigem_commons as vcom
+import vgamepad.registry as registry
+import vgamepad.win.virtual_gamepad as vwin
+from vgamepad.win.virtual_gamepad import VIGEM_ERROR_NONE, VigemError, error_name
+
+
+# Errors after which the bus connection must be re-established
+BUS_ERRORS = frozenset({
+    int(vcom.VIGEM_ERRORS.VIGEM_ERROR_BUS_NOT_FOUND),
+    int(vcom.VIGEM_ERRORS.VIGEM_ERROR_BUS_ACCESS_FAILED),
+    int(vcom.VIGEM_ERRORS.VIGEM_ERROR_BUS_INVALID_HANDLE),
+})
+
+# Errors after which the target device must be plugged in again
+TARGET_ERRORS = frozenset({
+    int(vcom.VIGEM_ERRORS.VIGEM_ERROR_TARGET_NOT_PLUGGED_IN),
+})
+
+
+class Supervisor:
+    """
+    Recovers supervised gamepads from bus and target failures, with bounded exponential backoff
+    """
+
+    def __init__(self, max_attempts=5, first_delay=0.05, max_delay=2.0, health_callback=None, vbus=None):
+        """
+        :param max_attempts: maximum number of recovery attempts per failure
+        :param first_delay: delay before the second attempt, in seconds (doubled at each attempt)
+        :param max_delay: maximum delay between two attempts, in seconds
+        :param health_callback: function of the form my_func(event, gamepad, error_name), called with
+            event = 'failure' when a recoverable error is detected,
+            'retry' when an attempt fails, 'recovered' on success, and 'lost' when all attempts failed
+        :param vbus: the VBus of the supervised gamepads (None = the global VBUS)
+        """
+        self.max_attempts = max_attempts
+        self.first_delay = first_delay
+        self.max_delay = max_delay
+        self.health_callback = health_callback
+        self.vbus = vwin.VBUS if vbus is None else vbus
+        self._lock = threading.Lock()  # one recovery at a time
+
+    def supervise(self, gamepad):
+        """
+        :param gamepad: a gamepad to recover automatically when its update() fails
+        """
+        gamepad.supervisor = self
+
+    def _notify(self, event, gamepad, err):
+        if self.health_callback is not None:
+            self.health_callback(event, gamepad, error_name(err))
+
+    def _bus_gamepads(self):
+        """
+        :return: the live gamepads plugged into the VBus, supervised or not (they all lose their target on reconnect)
+        """
+        return [g for g in registry.live_gamepads() if getattr(g.backend, 'vbus', None) is self.vbus]
+
+    def recover(self, gamepad, err):
+        """
+        Tries to recover a gamepad whose update() failed (called by update())
+
+        :param gamepad: the failed gamepad
+        :param err: the ViGEm error code returned by the failed update
+        :return: True if the gamepad is recovered and its report was sent, False otherwise
+        """
+        if err not in BUS_ERRORS and err not in TARGET_ERRORS:
+            return False
+        self._notify('failure', gamepad, err)
+        failure = err
+        with self._lock:
+            # Another thread may have recovered the bus while we were waiting for the lock
+            if gamepad.try_update() == VIGEM_ERROR_NONE:
+                self._notify('recovered', gamepad, failure)
+                return True
+            delay = self.first_delay
+            for attempt in range(self.max_attempts):
+                if attempt > 0:
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.max_delay)
+                try:
+                    if err in BUS_ERRORS:
+                        self.vbus.reconnect()  # frees the previous bus, still used by all the gamepads of the bus
+                        for g in self._bus_gamepads():
+                            if g is not gamepad:
+                                g.replug()
+                    gamepad.replug()
+                except VigemError as e:
+                    err = e.code
+                    self._notify('retry', gamepad, err)
+                    continue
+                self._notify('recovered', gamepad, failure)
+                return True
+            self._notify('lost', gamepad, err)
+            return False
@@ -1,419 +1,262 @@
 """
 VGamepad API (Windows)
+
+ViGEmBus backend of the gamepads defined in vgamepad.virtual_gamepad
 """
 
 import vgamepad.win.vigem_commons as vcom
 import vgamepad.win.vigem_client as vcli
+import vgamepad.registry as registry
 import ctypes
 from ctypes import CFUNCTYPE, c_void_p, c_ubyte
-from abc import ABC, abstractmethod
-from inspect import signature  # Check if user defined callback function is legal
+from vgamepad.backend import Backend, register_backend
+from vgamepad.virtual_gamepad import VX360Gamepad, VDS4Gamepad, dummy_callback  # for backward compatibility
 
 
-def check_err(err):
-    if err != vcom.VIGEM_ERRORS.VIGEM_ERROR_NONE:
-        raise Exception(vcom.VIGEM_ERRORS(err).name)
+VIGEM_ERROR_NONE = int(vcom.VIGEM_ERRORS.VIGEM_ERROR_NONE)  # plain int: fast comparison on the hot path
 
 
-def dummy_callback(client, target, large_motor, small_motor, led_number, user_data):
+class VigemError(Exception):
     """
-    Pattern for callback functions to be registered as notifications
-
-    :param client: vigem bus ID
-    :param target: vigem device ID
-    :param large_motor: integer in [0, 255] representing the state of the large motor
-    :param small_motor: integer in [0, 255] representing the state of the small motor
-    :param led_number: integer in [0, 255] representing the state of the LED ring
-    :param user_data: placeholder, do not use
+    Error code returned by the ViGEm client
     """
-    pass
+    def __init__(self, code):
+        self.code = code
+        super().__init__(error_name(code))
 
 
-class VBus:
+class VigemBusLostError(VigemError):
     """
-    Virtual USB bus (ViGEmBus)
+    The connection to ViGEmBus is lost (e.g. the driver was stopped or reinstalled)
     """
-    def __init__(self):
-        self._busp = vcli.vigem_alloc()
-        check_err(vcli.vigem_connect(self._busp))
-
-    def get_busp(self):
-        return self._busp
-
-    def __del__(self):
-        vcli.vigem_disconnect(self._busp)
-        vcli.vigem_free(self._busp)
+    pass
 
 
-# We instantiate a single global VBus for all controllers
-VBUS = VBus()
+class VigemNoFreeSlotError(VigemError):
+    """
+    ViGEmBus cannot host more target devices
+    """
+    pass
 
 
-class VGamepad(ABC):
-    def __init__(self):
-        self.vbus = VBUS
-        self._busp = self.vbus.get_busp()
-        self._devicep = self.target_alloc()
-        self.CMPFUNC = CFUNCTYPE(None, c_void_p, c_void_p, c_ubyte, c_ubyte, c_ubyte, c_void_p)
-        self.cmp_func = None
-        vcli.vigem_target_add(self._busp, self._devicep)
-        assert vcli.vigem_target_is_attached(self._devicep), "The virtual device could not connect to ViGEmBus."
+class VigemTargetNotPluggedInError(VigemError):
+    """
+    The target device is not (or not anymore) plugged into ViGEmBus
+    """
+    pass
 
-    def __del__(self):
-        vcli.vigem_target_remove(self._busp, self._devicep)
-        vcli.vigem_target_free(self._devicep)
 
-    def get_vid(self):
-        """
-        :return: the vendor ID of the virtual device
-        """
-        return vcli.vigem_target_get_vid(self._devicep)
+VIGEM_ERROR_TYPES = {
+    int(vcom.VIGEM_ERRORS.VIGEM_ERROR_BUS_NOT_FOUND): VigemBusLostError,
+    int(vcom.VIGEM_ERRORS.VIGEM_ERROR_BUS_ACCESS_FAILED): VigemBusLostError,
+    int(vcom.VIGEM_ERRORS.VIGEM_ERROR_BUS_INVALID_HANDLE): VigemBusLostError,
+    int(vcom.VIGEM_ERRORS.VIGEM_ERROR_NO_FREE_SLOT): VigemNoFreeSlotError,
+    int(vcom.VIGEM_ERRORS.VIGEM_ERROR_TARGET_NOT_PLUGGED_IN): VigemTargetNotPluggedInError,
+}
 
-    def get_pid(self):
-        """
-        :return: the product ID of the virtual device
-        """
-        return vcli.vigem_target_get_pid(self._devicep)
 
-    def set_vid(self, vid):
-        """
-        :param: the new vendor ID of the virtual device
-        """
-        vcli.vigem_target_set_vid(self._devicep, vid)
+def error_name(err):
+    """
+    :param err: a ViGEm error code
+    :return: the name of the error (e.g. VIGEM_ERROR_NO_FREE_SLOT), or its hexadecimal value if unknown
+    """
+    try:
+        return vcom.VIGEM_ERRORS(err).name
+    except ValueError:
+        return hex(err)
 
-    def set_pid(self, pid):
-        """
-        :param: the new product ID of the virtual device
-        """
-        vcli.vigem_target_set_pid(self._devicep, pid)
 
-    def get_index(self):
-        """
-        :return: the internally used index of the target device
-        """
-        return vcli.vigem_target_get_index(self._devicep)
+def vigem_error(err):
+    """
+    :param err: a ViGEm error code other than VIGEM_ERROR_NONE
+    :return: the exception matching the error code (a VigemError)
+    """
+    return VIGEM_ERROR_TYPES.get(err, VigemError)(err)
 
-    def get_type(self):
-        """
-        :return: the type of the object (e.g. VIGEM_TARGET_TYPE.Xbox360Wired)
-        """
-        return vcli.vigem_target_get_type(self._devicep)
 
-    @abstractmethod
-    def target_alloc(self):
-        """
-        :return: the pointer to an allocated ViGEm device (e.g. vcli.vigem_target_x360_alloc())
-        """
-        pass
+def check_err(err):
+    if err != VIGEM_ERROR_NONE:
+        raise vigem_error(err)
 
 
-class VX360Gamepad(VGamepad):
+class VBus:
     """
-    Virtual XBox360 gamepad
+    Virtual USB bus (ViGEmBus)
     """
     def __init__(self):
-        super().__init__()
-        self.report = self.get_default_report()
-        self.update()
-
-    def get_default_report(self):
-        return vcom.XUSB_REPORT(
-            wButtons=0,
-            bLeftTrigger=0,
-            bRightTrigger=0,
-            sThumbLX=0,
-            sThumbLY=0,
-            sThumbRX=0,
-            sThumbRY=0)
-
-    def reset(self):
-        """
-        Resets the report to the default state
-        """
-        self.report = self.get_default_report()
-
-    def press_button(self, button):
-        """
-        Presses a button (no effect if already pressed)
-        All possible buttons are in XUSB_BUTTON
-
-        :param: a XUSB_BUTTON field, e.g. XUSB_BUTTON.XUSB_GAMEPAD_X
-        """
-        self.report.wButtons = self.report.wButtons | button
-
-    def release_button(self, button):
-        """
-        Releases a button (no effect if already released)
-        All possible buttons are in XUSB_BUTTON
-
-        :param: a XUSB_BUTTON field, e.g. XUSB_BUTTON.XUSB_GAMEPAD_X
-        """
-        self.report.wButtons = self.report.wButtons & ~button
-
-    def left_trigger(self, value):
-        """
-        Sets the value of the left trigger
-
-        :param: integer between 0 and 255 (0 = trigger released)
-        """
-        self.report.bLeftTrigger = value
-
-    def right_trigger(self, value):
-        """
-        Sets the value of the right trigger
-
-        :param: integer between 0 and 255 (0 = trigger released)
-        """
-        self.report.bRightTrigger = value
-
-    def left_trigger_float(self, value_float):
-        """
-        Sets the value of the left trigger
-
-        :param: float between 0.0 and 1.0 (0.0 = trigger released)
-        """
-        self.left_trigger(round(value_float * 255))
-
-    def right_trigger_float(self, value_float):
-        """
-        Sets the value of the right trigger
-
-        :param: float between 0.0 and 1.0 (0.0 = trigger released)
-        """
-        self.right_trigger(round(value_float * 255))
-
-    def left_joystick(self, x_value, y_value):
-        """
-        Sets the values of the X and Y axis for the left joystick
-
-        :param: integer between -32768 and 32767 (0 = neutral position)
-        """
-        self.report.sThumbLX = x_value
-        self.report.sThumbLY = y_value
-
-    def right_joystick(self, x_value, y_value):
-        """
-        Sets the values of the X and Y axis for the right joystick
+        self._busp = vcli.vigem_alloc()
+        check_err(vcli.vigem_connect(self._busp))
 
-        :param: integer between -32768 and 32767 (0 = neutral position)
-        """
-        self.report.sThumbRX = x_value
-        self.report.sThumbRY = y_value
+    def get_busp(self):
+        return self._busp
 
-    def left_joystick_float(self, x_value_float, y_value_float):
+    def reconnect(self):
         """
-        Sets the values of the X and Y axis for the left joystick
+        Drops the current connection to ViGEmBus and connects again
 
-        :param: float between -1.0 and 1.0 (0 = neutral position)
+        All target devices of the previous connection are destroyed by the driver,
+        gamepads must be plugged in again with VGamepad.replug()
         """
-        self.left_joystick(round(x_value_float * 32767), round(y_value_float * 32767))
+        self.close()
+        busp = vcli.vigem_alloc()
+        err = vcli.vigem_connect(busp)
+        if err != VIGEM_ERROR_NONE:
+            vcli.vigem_free(busp)
+            raise vigem_error(err)
+        self._busp = busp
 
-    def right_joystick_float(self, x_value_float, y_value_float):
+    def close(self):
         """
-        Sets the values of the X and Y axis for the right joystick
-
-        :param: float between -1.0 and 1.0 (0 = neutral position)
+        Disconnects from ViGEmBus (no effect if already closed)
         """
-        self.right_joystick(round(x_value_float * 32767), round(y_value_float * 32767))
+        if self._busp is not None:
+            vcli.vigem_disconnect(self._busp)
+            vcli.vigem_free(self._busp)
+            self._busp = None
 
-    def update(self):
-        """
-        Sends the current report (i.e. commands) to the virtual device
-        """
-        check_err(vcli.vigem_target_x360_update(self._busp, self._devicep, self.report))
+    def __enter__(self):
+        return self
 
-    def register_notification(self, callback_function):
-        """
-        Registers a callback function that can handle force feedback, leds, etc.
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-        :param: a function of the form: my_func(client, target, large_motor, small_motor, led_number, user_data)
-        """
-        if not signature(callback_function) == signature(dummy_callback):
-            raise TypeError("Needed callback function signature: {}, but got: {}".format(signature(dummy_callback), signature(callback_function)))
-        self.cmp_func = self.CMPFUNC(callback_function)  # keep its reference, otherwise the program will crash when a callback is made.
-        check_err(vcli.vigem_target_x360_register_notification(self._busp, self._devicep, self.cmp_func, None))
+    def __del__(self):
+        self.close()
 
-    def unregister_notification(self):
-        """
-        Unregisters a previously registered callback function.
-        """
-        vcli.vigem_target_x360_unregister_notification(self._devicep)
 
-    def target_alloc(self):
-        return vcli.vigem_target_x360_alloc()
+# We instantiate a single global VBus for all controllers
+VBUS = VBus()
+registry.register_finalizer(VBUS.close)  # disconnect only after all gamepads are closed
 
 
-class VDS4Gamepad(VGamepad):
+class ViGEmBackend(Backend):
     """
-    Virtual DualShock 4 gamepad
+    Virtual device plugged into ViGEmBus
     """
 
-    def __init__(self):
-        super().__init__()
-        self.report = self.get_default_report()
-        self.update()
-
-    def get_default_report(self):
-        rep = vcom.DS4_REPORT(
-            bThumbLX=0,
-            bThumbLY=0,
-            bThumbRX=0,
-            bThumbRY=0,
-            wButtons=0,
-            bSpecial=0,
-            bTriggerL=0,
-            bTriggerR=0)
-        vcom.DS4_REPORT_INIT(rep)
-        return rep
-
-    def reset(self):
-        """
-        Resets the report to the default state
-        """
-        self.report = self.get_default_report()
+    SUCCESS = VIGEM_ERROR_NONE
 
-    def press_button(self, button):
-        """
-        Presses a button (no effect if already pressed)
-        All possible buttons are in DS4_BUTTONS
+    # ctypes prototype of notification callbacks, shared by all targets
+    CMPFUNC = CFUNCTYPE(None, c_void_p, c_void_p, c_ubyte, c_ubyte, c_ubyte, c_void_p)
 
-        :param: a DS4_BUTTONS field, e.g. DS4_BUTTONS.DS4_BUTTON_TRIANGLE
+    def __init__(self, vbus=None):
         """
-        self.report.wButtons = self.report.wButtons | button
-
-    def release_button(self, button):
-        """
-        Releases a button (no effect if already released)
-        All possible buttons are in DS4_BUTTONS
-
-        :param: a DS4_BUTTONS field, e.g. DS4_BUTTONS.DS4_BUTTON_TRIANGLE
-        """
-        self.report.wButtons = self.report.wButtons & ~button
-
-    def press_special_button(self, special_button):
-        """
-        Presses a special button (no effect if already pressed)
-        All possible buttons are in DS4_SPECIAL_BUTTONS
-
-        :param: a DS4_SPECIAL_BUTTONS field, e.g. DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_TOUCHPAD
-        """
-        self.report.bSpecial = self.report.bSpecial | special_button
-
-    def release_special_button(self, special_button):
+        :param vbus: the VBus to plug the device into (None = the global VBUS)
         """
-        Releases a special button (no effect if already released)
-        All possible buttons are in DS4_SPECIAL_BUTTONS
-
-        :param: a DS4_SPECIAL_BUTTONS field, e.g. DS4_SPECIAL_BUTTONS.DS4_SPECIAL_BUTTON_TOUCHPAD
-        """
-        self.report.bSpecial = self.report.bSpecial & ~special_button
-
-    def left_trigger(self, value):
-        """
-        Sets the value of the left trigger
-
-        :param: integer between 0 and 255 (0 = trigger released)
-        """
-        self.report.bTriggerL = value
+        self.vbus = VBUS if vbus is None else vbus
+        self._busp = None
+        self._devicep = None
+        self.target_type = None
+        self.cmp_func = None
+        self._notifying = False  # True while cmp_func is registered
+        self._update = None
 
-    def right_trigger(self, value):
+    def target_alloc(self):
         """
-        Sets the value of the right trigger
-
-        :param: integer between 0 and 255 (0 = trigger released)
+        :return: the pointer to an allocated ViGEm device (e.g. vcli.vigem_target_x360_alloc())
         """
-        self.report.bTriggerR = value
+        if self.target_type == vcom.VIGEM_TARGET_TYPE.Xbox360Wired:
+            return vcli.vigem_target_x360_alloc()
+        return vcli.vigem_target_ds4_alloc()
 
-    def left_trigger_float(self, value_float):
-        """
-        Sets the value of the left trigger
+    def create(self, target_type):
+        self.target_type = target_type
+        if target_type == vcom.VIGEM_TARGET_TYPE.Xbox360Wired:
+            self._update = vcli.vigem_target_x360_update
+        else:
+            self._update = vcli.vigem_target_ds4_update
+        self._busp = self.vbus.get_busp()
+        self._devicep = self.target_alloc()
+        err = vcli.vigem_target_add(self._busp, self._devicep)
+        if err != VIGEM_ERROR_NONE:
+            vcli.vigem_target_free(self._devicep)
+            self._devicep = None
+            raise vigem_error(err)
+        assert vcli.vigem_target_is_attached(self._devicep), "The virtual device could not connect to ViGEmBus."
 
-        :param: float between 0.0 and 1.0 (0.0 = trigger released)
-        """
-        self.left_trigger(round(value_float * 255))
+    def pack(self, report):
+        return report  # ViGEm takes the report as is
 
-    def right_trigger_float(self, value_float):
-        """
-        Sets the value of the right trigger
+    def write(self, report):
+        return self._update(self._busp, self._devicep, report)
 
-        :param: float between 0.0 and 1.0 (0.0 = trigger released)
-        """
-        self.right_trigger(round(value_float * 255))
+    def written(self, report):
+        return 1, ctypes.sizeof(report)
 
-    def left_joystick(self, x_value, y_value):
-        """
-        Sets the values of the X and Y axis for the left joystick
+    def error(self, code):
+        return vigem_error(code)
 
-        :param: integer between 0 and 255 (128 = neutral position)
-        """
-        self.report.bThumbLX = x_value
-        self.report.bThumbLY = y_value
+    def error_name(self, code):
+        return error_name(code)
 
-    def right_joystick(self, x_value, y_value):
-        """
-        Sets the values of the X and Y axis for the right joystick
+    def submit_extended(self, extended_report):
+        return vcli.vigem_target_ds4_update_ex_ptr(self._busp, self._devicep, ctypes.byref(extended_report))
 
-        :param: integer between 0 and 255 (128 = neutral position)
-        """
-        self.report.bThumbRX = x_value
-        self.report.bThumbRY = y_value
+    def close(self):
+        devicep = self._devicep
+        if devicep is not None:
+            if self._busp == self.vbus.get_busp():  # otherwise the connection is gone, and the target with it
+                vcli.vigem_target_remove(self._busp, devicep)
+            vcli.vigem_target_free(devicep)
+            self._devicep = None
+            self.cmp_func = None  # the callback cannot be called anymore
 
-    def left_joystick_float(self, x_value_float, y_value_float):
-        """
-        Sets the values of the X and Y axis for the left joystick
+    def __del__(self):
+        self.close()
+
+    def replug(self):
+        old_devicep = self._devicep
+        vid = vcli.vigem_target_get_vid(old_devicep)
+        pid = vcli.vigem_target_get_pid(old_devicep)
+        if self._busp == self.vbus.get_busp():
+            vcli.vigem_target_remove(self._busp, old_devicep)  # fails harmlessly if not plugged in
+        vcli.vigem_target_free(old_devicep)
+        self._busp = self.vbus.get_busp()
+        self._devicep = self.target_alloc()
+        vcli.vigem_target_set_vid(self._devicep, vid)
+        vcli.vigem_target_set_pid(self._devicep, pid)
+        # If anything fails below, the new target stays allocated but unplugged, so that replug() can be retried
+        check_err(vcli.vigem_target_add(self._busp, self._devicep))
+        if self._notifying:
+            check_err(self._register_notification())
 
-        :param: float between -1.0 and 1.0 (0 = neutral position)
-        """
-        self.left_joystick(128 + round(x_value_float * 127), 128 + round(y_value_float * 127))
+    def is_ready(self):
+        return self._devicep is not None and bool(vcli.vigem_target_is_attached(self._devicep))
 
-    def right_joystick_float(self, x_value_float, y_value_float):
-        """
-        Sets the values of the X and Y axis for the right joystick
+    def register_notification(self, callback_function):
+        self.cmp_func = self.CMPFUNC(callback_function)  # keep its reference, otherwise the program will crash when a callback is made.
+        check_err(self._register_notification())
+        self._notifying = True
 
-        :param: float between -1.0 and 1.0 (0 = neutral position)
-        """
-        self.right_joystick(128 + round(x_value_float * 127), 128 + round(y_value_float * 127))
+    def _register_notification(self):
+        if self.target_type == vcom.VIGEM_TARGET_TYPE.Xbox360Wired:
+            return vcli.vigem_target_x360_register_notification(self._busp, self._devicep, self.cmp_func, None)
+        return vcli.vigem_target_ds4_register_notification(self._busp, self._devicep, self.cmp_func, None)
 
-    def directional_pad(self, direction):
-        """
-        Sets the direction of the directional pad (hat)
-        All possible directions are in DS4_DPAD_DIRECTIONS
+    def unregister_notification(self):
+        if self.target_type == vcom.VIGEM_TARGET_TYPE.Xbox360Wired:
+            vcli.vigem_target_x360_unregister_notification(self._devicep)
+        else:
+            vcli.vigem_target_ds4_unregister_notification(self._devicep)
+        self._notifying = False
 
-        :param: a DS4_DPAD_DIRECTIONS field, e.g. DS4_DPAD_DIRECTIONS.DS4_BUTTON_DPAD_NORTHWEST
-        """
-        vcom.DS4_SET_DPAD(self.report, direction)
+    def get_vid(self):
+        return vcli.vigem_target_get_vid(self._devicep)
 
-    def update(self):
-        """
-        Sends the current report (i.e. commands) to the virtual device
-        """
-        check_err(vcli.vigem_target_ds4_update(self._busp, self._devicep, self.report))
+    def get_pid(self):
+        return vcli.vigem_target_get_pid(self._devicep)
 
-    def update_extended_report(self, extended_report):
-        """
-        Enables using DS4_REPORT_EX instead of DS4_REPORT (advanced users only)
-        If you don't know what this is about, you can safely ignore this function
+    def set_vid(self, vid):
+        vcli.vigem_target_set_vid(self._devicep, vid)
 
-        :param: a DS4_REPORT_EX
-        """
-        check_err(vcli.vigem_target_ds4_update_ex_ptr(self._busp, self._devicep, ctypes.byref(extended_report)))
+    def set_pid(self, pid):
+        vcli.vigem_target_set_pid(self._devicep, pid)
 
-    def register_notification(self, callback_function):
-        """
-        Registers a callback function that can handle force feedback, leds, etc.
+    def get_index(self):
+        return vcli.vigem_target_get_index(self._devicep)
 
-        :param: a function of the form: my_func(client, target, large_motor, small_motor, led_number, user_data)
-        """
-        if not signature(callback_function) == signature(dummy_callback):
-            raise TypeError("Needed callback function signature: {}, but got: {}".format(signature(dummy_callback), signature(callback_function)))
-        self.cmp_func = self.CMPFUNC(callback_function)
-        check_err(vcli.vigem_target_ds4_register_notification(self._busp, self._devicep, self.cmp_func, None))
+    def get_type(self):
+        return vcli.vigem_target_get_type(self._devicep)
 
-    def unregister_notification(self):
-        """
-        Unregisters a previously registered callback function.
-        """
-        vcli.vigem_target_ds4_unregister_notification(self._devicep)
 
-    def target_alloc(self):
-        return vcli.vigem_target_ds4_alloc()
+register_backend('vigem', ViGEmBackend)